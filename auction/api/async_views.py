@@ -0,0 +1,216 @@
+"""
+Async versions of read-heavy endpoints.
+
+DRF views are synchronous, so under ASGI every request is run in a thread.
+These views are native coroutines which query the database with the async
+ORM API and return the same output as the corresponding DRF views.
+Authentication and permission classes of DRF are reused, they are run in
+a single sync_to_async call because they may query the database.
+Views with get_etag answer conditional requests before querying rows.
+Handlers return data rendered as JSON or a ready response.
+"""
+from asgiref.sync import sync_to_async
+from django.http import Http404, HttpResponse
+from django.http.response import HttpResponseBase
+from django.views import View
+from rest_framework import exceptions, status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.views import exception_handler
+
+from auction.core import models
+from auction.core.constants import LotStatuses
+from . import conditional, filters, projections
+from .cache import lot_list_cache, lot_summary_cache
+from .events import release_connection, stream_events
+from .streaming import AsyncStreamingHttpResponse, is_asgi_request
+
+
+class AsyncAPIView(View):
+    authentication_classes = api_settings.DEFAULT_AUTHENTICATION_CLASSES
+    permission_classes = api_settings.DEFAULT_PERMISSION_CLASSES
+    pagination_class = api_settings.DEFAULT_PAGINATION_CLASS
+    renderer_class = JSONRenderer
+
+    async def dispatch(self, request, *args, **kwargs):
+        request = Request(
+            request,
+            authenticators=[auth() for auth in self.authentication_classes],
+        )
+        self.request = request
+        try:
+            await sync_to_async(self.check_permissions)(request)
+            handler = getattr(self, request.method.lower(), None)
+            if request.method.lower() not in self.http_method_names or handler is None:
+                raise exceptions.MethodNotAllowed(request.method)
+            etag = await self.get_etag(request, *args, **kwargs)
+            if etag is not None and conditional.is_not_modified(request, etag):
+                return HttpResponse(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+            data = await handler(request, *args, **kwargs)
+        except (exceptions.APIException, Http404) as exc:
+            return self.handle_exception(request, exc)
+        response = data if isinstance(data, HttpResponseBase) else self.render(data)
+        if etag is not None:
+            response['ETag'] = etag
+        return response
+
+    async def get_etag(self, request, *args, **kwargs):
+        return None
+
+    def check_permissions(self, request):
+        for permission in [permission() for permission in self.permission_classes]:
+            if not permission.has_permission(request, self):
+                if request.authenticators and not request.successful_authenticator:
+                    raise exceptions.NotAuthenticated()
+                raise exceptions.PermissionDenied(
+                    detail=getattr(permission, 'message', None),
+                    code=getattr(permission, 'code', None),
+                )
+
+    def handle_exception(self, request, exc):
+        if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+            # WWW-Authenticate header for 401 responses, else coerce to 403
+            authenticators = request.authenticators
+            auth_header = authenticators and authenticators[0].authenticate_header(request)
+            if auth_header:
+                exc.auth_header = auth_header
+            else:
+                exc.status_code = status.HTTP_403_FORBIDDEN
+        response = exception_handler(exc, {'view': self, 'request': request})
+        headers = {
+            name: value for name, value in response.items() if name != 'Content-Type'
+        }
+        return self.render(response.data, response.status_code, headers=headers)
+
+    def render(self, data, status_code=status.HTTP_200_OK, headers=None):
+        renderer = self.renderer_class()
+        return HttpResponse(
+            renderer.render(data), status=status_code, headers=headers,
+            content_type=renderer.media_type,
+        )
+
+    async def paginate(self, queryset, projection):
+        paginator = self.pagination_class()
+        page = await paginator.apaginate_queryset(queryset, self.request, view=self)
+        return paginator.get_paginated_data(projection.represent_many(page))
+
+
+class PetListView(AsyncAPIView):
+    http_method_names = ['get']
+
+    async def get_etag(self, request):
+        account = request.user.useraccount
+        return conditional.make_etag('pets', account.pk, await account.aget_version())
+
+    async def get(self, request):
+        queryset = models.Pet.objects.filter(owner=request.user.useraccount)
+        return await self.paginate(
+            projections.pet.values(queryset, 'created_at'), projections.pet
+        )
+
+
+class LotListView(AsyncAPIView):
+    http_method_names = ['get']
+
+    async def get_etag(self, request):
+        self.version = await lot_list_cache.aget_version()
+        return conditional.make_etag(
+            'lots', self.version, await lot_summary_cache.aget_version()
+        )
+
+    async def get(self, request):
+        page = await lot_list_cache.aget_or_set(
+            request.build_absolute_uri(), self.get_list_data, version=self.version
+        )
+        lot_ids = [lot['id'] for lot in page['results']]
+        summaries = [
+            row async for row in projections.lot_bid_summary.values(
+                models.Lot.objects.filter(pk__in=lot_ids)
+            )
+        ] if lot_ids else []
+        return projections.add_bid_summaries(page, summaries)
+
+    async def get_list_data(self):
+        queryset = filters.LotFilter().filter_queryset(
+            self.request, models.Lot.objects.filter(status=LotStatuses.OPEN), self
+        )
+        return await self.paginate(
+            projections.lot_catalogue.values(queryset, *self.pagination_ordering),
+            projections.lot_catalogue,
+        )
+
+
+class LotBidListView(AsyncAPIView):
+    http_method_names = ['get']
+
+    async def get_etag(self, request, pk):
+        try:
+            version = await models.Lot.objects.values_list('version', flat=True).aget(pk=pk)
+        except models.Lot.DoesNotExist:
+            raise Http404
+        return conditional.make_etag('lot', pk, version)
+
+    async def get(self, request, pk):
+        bids = models.Bid.objects.filter(lot_id=pk, lot__status=LotStatuses.OPEN)
+        return await self.paginate(
+            projections.bid_short_display.values(bids, 'created_at'),
+            projections.bid_short_display,
+        )
+
+
+class BidListView(AsyncAPIView):
+    http_method_names = ['get']
+
+    async def get(self, request):
+        queryset = models.Bid.objects.filter(lot__status=LotStatuses.OPEN)
+        return await self.paginate(
+            projections.bid_long_display.values(queryset, 'created_at'),
+            projections.bid_long_display,
+        )
+
+
+class LotEventsView(AsyncAPIView):
+    """
+    Streams bid and close events of the lot as server-sent events,
+    starting after Last-Event-ID header or last_event_id parameter.
+    Without them only new events are sent. WSGI servers cannot wait without
+    occupying a worker, there published events are sent at once and
+    the client polls by reconnecting after the retry delay
+    """
+    http_method_names = ['get']
+
+    async def get(self, request, pk):
+        try:
+            lot = await models.Lot.objects.only('status', 'version').aget(pk=pk)
+        except models.Lot.DoesNotExist:
+            raise Http404
+        last_event_id = request.headers.get(
+            'Last-Event-ID', request.query_params.get('last_event_id')
+        )
+        # ids of events are versions of the lot
+        if last_event_id is None:
+            last_event_id = lot.version
+        else:
+            try:
+                last_event_id = int(last_event_id)
+            except ValueError:
+                raise exceptions.ValidationError({'last_event_id': 'A valid integer is required.'})
+
+        # 204 stops reconnecting of EventSource clients
+        if lot.is_closed and last_event_id >= lot.version:
+            return HttpResponse(status=status.HTTP_204_NO_CONTENT)
+
+        asgi = is_asgi_request(request._request)
+        events = stream_events(lot.pk, last_event_id, closed=lot.is_closed, wait=asgi)
+        if asgi:
+            await sync_to_async(release_connection)()
+            response = AsyncStreamingHttpResponse(events, content_type='text/event-stream')
+        else:
+            response = HttpResponse(
+                ''.join([part async for part in events]), content_type='text/event-stream'
+            )
+        response['Cache-Control'] = 'no-cache'
+        # disables response buffering of nginx
+        response['X-Accel-Buffering'] = 'no'
+        return response
@@ -0,0 +1,108 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework.authentication import BaseAuthentication, get_authorization_header
+from rest_framework.exceptions import AuthenticationFailed
+
+from auction.core.models import AuthToken
+
+
+class TokenCache:
+    """
+    Per-process LRU of verified tokens, entries are kept for
+    AUTH_TOKEN_CACHE_TTL seconds and never longer than the token lives
+    """
+
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, digest):
+        with self.lock:
+            entry = self.entries.get(digest)
+            if entry is None:
+                return None
+            user, valid_until = entry
+            if valid_until <= time.monotonic():
+                del self.entries[digest]
+                return None
+            self.entries.move_to_end(digest)
+        # every request gets its own copy, so cached user is never changed
+        return copy.deepcopy(user)
+
+    def set(self, digest, user, expires_at):
+        ttl = min(
+            settings.AUTH_TOKEN_CACHE_TTL,
+            (expires_at - timezone.now()).total_seconds(),
+        )
+        with self.lock:
+            self.entries[digest] = (copy.deepcopy(user), time.monotonic() + ttl)
+            self.entries.move_to_end(digest)
+            while len(self.entries) > settings.AUTH_TOKEN_CACHE_ENTRIES:
+                self.entries.popitem(last=False)
+
+    def evict(self, digests):
+        with self.lock:
+            for digest in digests:
+                self.entries.pop(digest, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+token_cache = TokenCache()
+
+
+def revoke_tokens(tokens):
+    """
+    Deletes tokens of given queryset. They are evicted from the cache of the
+    current process, other processes drop them within AUTH_TOKEN_CACHE_TTL
+    """
+    digests = list(tokens.values_list('digest', flat=True))
+    tokens.delete()
+    token_cache.evict(digests)
+
+
+class TokenAuthentication(BaseAuthentication):
+    """
+    Authenticates requests with "Authorization: Token <key>" header.
+    Tokens are compared by sha256 digest, so no password hashing is done
+    per request. Request.auth is the digest of the token
+    """
+    keyword = 'Token'
+
+    def authenticate(self, request):
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) != 2:
+            raise AuthenticationFailed('Invalid token header.')
+        try:
+            key = auth[1].decode()
+        except UnicodeError:
+            raise AuthenticationFailed('Invalid token header.')
+
+        digest = AuthToken.make_digest(key)
+        user = token_cache.get(digest)
+        if user is not None:
+            return user, digest
+
+        try:
+            token = AuthToken.objects.select_related('user__useraccount').get(digest=digest)
+        except AuthToken.DoesNotExist:
+            raise AuthenticationFailed('Invalid token.')
+        if token.is_expired:
+            raise AuthenticationFailed('Token has expired.')
+        if not token.user.is_active:
+            raise AuthenticationFailed('User inactive or deleted.')
+
+        token_cache.set(digest, token.user, token.expires_at)
+        return token.user, digest
+
+    def authenticate_header(self, request):
+        return self.keyword
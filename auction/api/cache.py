@@ -0,0 +1,197 @@
+import threading
+from collections import OrderedDict
+from hashlib import md5
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+class VersionedCache:
+    """
+    Two tier cache of API responses which are invalidated all at once.
+
+    Every key is combined with current version of the namespace, which is kept
+    in the shared Django cache, so bumping the version invalidates entries in
+    all processes. First tier is a per-process LRU, second tier is the shared
+    Django cache.
+
+    Version is a random token rather than an incremented number, so concurrent
+    bumps never produce the same version on backends without atomic incr.
+
+    Hits and misses are counted per process under the lock and added to shared
+    counters in batches, so totals of all processes are approximate.
+    """
+    stats_names = ('l1_hits', 'l2_hits', 'misses')
+
+    def __init__(self, namespace):
+        self.namespace = namespace
+        self.local = OrderedDict()
+        self.local_stats = dict.fromkeys(self.stats_names, 0)
+        # counts not added to shared counters yet
+        self.pending_stats = dict.fromkeys(self.stats_names, 0)
+        self.lock = threading.Lock()
+
+    @property
+    def version_key(self):
+        return f'{self.namespace}:version'
+
+    def get_version(self):
+        version = cache.get(self.version_key)
+        if version is None:
+            cache.add(self.version_key, uuid4().hex, timeout=None)
+            version = cache.get(self.version_key)
+        return version
+
+    async def aget_version(self):
+        version = await cache.aget(self.version_key)
+        if version is None:
+            await cache.aadd(self.version_key, uuid4().hex, timeout=None)
+            version = await cache.aget(self.version_key)
+        return version
+
+    def bump_version(self):
+        cache.set(self.version_key, uuid4().hex, timeout=None)
+
+    def get_or_set(self, key, builder, version=None):
+        """
+        Returns value cached for key in given or current version
+        or builds it with builder and caches it in both tiers
+        """
+        shared_key = self.make_key(version or self.get_version(), key)
+        value = self.get_local(shared_key)
+        if value is not None:
+            self.count('l1_hits')
+            return value
+
+        value = cache.get(shared_key)
+        if value is None:
+            self.count('misses')
+            value = builder()
+            cache.set(shared_key, value, timeout=settings.API_CACHE_TIMEOUT)
+        else:
+            self.count('l2_hits')
+
+        self.set_local(shared_key, value)
+        return value
+
+    async def aget_or_set(self, key, builder, version=None):
+        """
+        Async version of get_or_set, builder is a coroutine function
+        """
+        shared_key = self.make_key(version or await self.aget_version(), key)
+        value = self.get_local(shared_key)
+        if value is not None:
+            await self.acount('l1_hits')
+            return value
+
+        value = await cache.aget(shared_key)
+        if value is None:
+            await self.acount('misses')
+            value = await builder()
+            await cache.aset(shared_key, value, timeout=settings.API_CACHE_TIMEOUT)
+        else:
+            await self.acount('l2_hits')
+
+        self.set_local(shared_key, value)
+        return value
+
+    def make_key(self, version, key):
+        digest = md5(key.encode()).hexdigest()
+        return f'{self.namespace}:{version}:{digest}'
+
+    def get_local(self, shared_key):
+        with self.lock:
+            value = self.local.get(shared_key)
+            if value is not None:
+                self.local.move_to_end(shared_key)
+        return value
+
+    def set_local(self, shared_key, value):
+        with self.lock:
+            self.local[shared_key] = value
+            while len(self.local) > settings.API_CACHE_LOCAL_ENTRIES:
+                self.local.popitem(last=False)
+
+    def count(self, name):
+        pending = self.count_local(name)
+        if pending:
+            self.flush_stats(pending)
+
+    async def acount(self, name):
+        pending = self.count_local(name)
+        if pending:
+            await self.aflush_stats(pending)
+
+    def count_local(self, name):
+        """
+        Counts a hit or a miss in this process,
+        returns pending counts once there are enough of them
+        """
+        with self.lock:
+            self.local_stats[name] += 1
+            self.pending_stats[name] += 1
+            if sum(self.pending_stats.values()) < settings.API_CACHE_STATS_FLUSH_EVERY:
+                return None
+        return self.take_pending_stats()
+
+    def take_pending_stats(self):
+        with self.lock:
+            pending = self.pending_stats
+            self.pending_stats = dict.fromkeys(self.stats_names, 0)
+        return pending
+
+    def flush_stats(self, pending):
+        for name, value in pending.items():
+            if not value:
+                continue
+            stats_key = f'{self.namespace}:stats:{name}'
+            cache.add(stats_key, 0, timeout=None)
+            try:
+                cache.incr(stats_key, value)
+            except ValueError:
+                # counter was evicted between add and incr
+                pass
+
+    async def aflush_stats(self, pending):
+        for name, value in pending.items():
+            if not value:
+                continue
+            stats_key = f'{self.namespace}:stats:{name}'
+            await cache.aadd(stats_key, 0, timeout=None)
+            try:
+                await cache.aincr(stats_key, value)
+            except ValueError:
+                pass
+
+    def get_stats(self):
+        """
+        Returns hit/miss counters of all processes and of the current one,
+        counts of other processes are added to totals in batches
+        """
+        self.flush_stats(self.take_pending_stats())
+        with self.lock:
+            process = dict(self.local_stats)
+        shared = cache.get_many([
+            f'{self.namespace}:stats:{name}' for name in self.stats_names
+        ])
+        return {
+            'total': {
+                name: shared.get(f'{self.namespace}:stats:{name}', 0)
+                for name in self.stats_names
+            },
+            'process': process,
+        }
+
+    def clear_local(self):
+        # pending counts are not lost with the local tier
+        self.flush_stats(self.take_pending_stats())
+        with self.lock:
+            self.local.clear()
+            self.local_stats = dict.fromkeys(self.stats_names, 0)
+
+
+lot_list_cache = VersionedCache('lots')
+# bid summaries of lots are not cached, version of this namespace changes with
+# bids and is a part of the catalogue ETag
+lot_summary_cache = VersionedCache('lot-summaries')
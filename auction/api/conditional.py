@@ -0,0 +1,36 @@
+"""
+Conditional GET of listings with weak ETags built from version counters.
+
+Lots and user accounts have version counters incremented by every change
+of what their listings show, and the lot catalogue has the version of its
+cache. ETag of a listing is known before its queryset is run, so requests
+with a matching If-None-Match header get 304 without querying and
+serializing rows.
+"""
+from django.utils.cache import get_conditional_response
+from rest_framework import status
+from rest_framework.response import Response
+
+
+def make_etag(*parts):
+    return 'W/"{}"'.format('-'.join(str(part) for part in parts))
+
+
+def is_not_modified(request, etag):
+    """
+    Whether If-None-Match header of the request matches etag
+    """
+    response = get_conditional_response(request, etag=etag)
+    return response is not None and response.status_code == status.HTTP_304_NOT_MODIFIED
+
+
+def respond(request, etag, build_response):
+    """
+    Returns 304 response if the client has the current version,
+    otherwise response built by build_response with ETag header
+    """
+    if is_not_modified(request, etag):
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+    response = build_response()
+    response['ETag'] = etag
+    return response
@@ -0,0 +1,141 @@
+"""
+Log of recent events of every lot, streamed to watchers as server-sent events.
+
+Event ids are versions of the lot. A version is incremented in the same
+UPDATE which changes the lot, so ids are durable and never reused, even when
+the cache is cleared. Events of every version are kept in one key of the
+shared Django cache, so watchers in any process read them without touching
+the database. Only events of the last LOT_EVENTS_RETAINED versions of a lot
+are read, older ones expire with the cache timeout.
+
+Streams are async generators which wait with asyncio.sleep, so under ASGI
+a watcher does not occupy a thread or a database connection.
+"""
+import asyncio
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+
+BID_PLACED = 'bid_placed'
+BID_WITHDRAWN = 'bid_withdrawn'
+BID_ACCEPTED = 'bid_accepted'
+LOT_CLOSED = 'lot_closed'
+
+# delay before a client reconnects when the stream ends, milliseconds
+RETRY_MS = 1000
+# comment line sent to idle watchers, so proxies keep connections open, seconds
+KEEPALIVE_INTERVAL = 15
+# events are appended after commits, so events of a version may be appended
+# after events of the next one. Readers wait for missing versions followed by
+# versions appended within this time, seconds
+GAP_WAIT = 5
+
+
+class LotEventLog:
+    namespace = 'lot-events'
+
+    def head_key(self, lot_id):
+        return f'{self.namespace}:{lot_id}:head'
+
+    def event_key(self, lot_id, version):
+        return f'{self.namespace}:{lot_id}:{version}'
+
+    def publish(self, lot_id, version, event, data):
+        """
+        Publishes event of the change which made given version of the lot
+        after the current transaction is committed, so rolled back changes
+        are never announced
+        """
+        transaction.on_commit(lambda: self.append(lot_id, version, event, data))
+
+    def append(self, lot_id, version, event, data):
+        # a version is made by one transaction, which publishes its events in order
+        event_key = self.event_key(lot_id, version)
+        group = cache.get(event_key) or {'events': []}
+        group['events'].append({'event': event, 'data': data})
+        group['appended_at'] = time.time()
+        cache.set(event_key, group, timeout=settings.LOT_EVENTS_TIMEOUT)
+        # head only tells readers where to look, a stale or evicted head
+        # delays events until the next change of the lot, ids are not reused
+        head_key = self.head_key(lot_id)
+        if cache.get(head_key, 0) < version:
+            cache.set(head_key, version, timeout=settings.LOT_EVENTS_TIMEOUT)
+
+    async def aread(self, lot_id, after):
+        """
+        Returns (id, event) pairs of retained events published after given id.
+        Only the last event of a version has the id, so a client which lost
+        the connection in the middle of a version receives all its events again
+        """
+        last_version = await cache.aget(self.head_key(lot_id), 0)
+        if last_version <= after:
+            return []
+        # the first version is the lot as created, it has no events
+        first_version = max(after + 1, 2, last_version - settings.LOT_EVENTS_RETAINED + 1)
+        keys = {
+            self.event_key(lot_id, version): version
+            for version in range(first_version, last_version + 1)
+        }
+        found = await cache.aget_many(keys)
+        groups = [(version, found.get(key)) for key, version in keys.items()]
+        waited_since = time.time() - GAP_WAIT
+        pairs = []
+        for index, (version, group) in enumerate(groups):
+            if group is None:
+                # events of the version may be appended yet or lost for good
+                if any(later and later['appended_at'] > waited_since
+                       for _, later in groups[index + 1:]):
+                    break
+                continue
+            events = group['events']
+            pairs.extend((None, event) for event in events[:-1])
+            pairs.append((version, events[-1]))
+        return pairs
+
+
+def release_connection():
+    # the stream does not query the database, so the connection is released
+    if not connection.in_atomic_block:
+        connection.close()
+
+
+async def stream_events(lot_id, last_event_id, closed=False, wait=True):
+    """
+    Yields events of the lot published after last_event_id until the lot is
+    closed or LOT_EVENTS_STREAM_DURATION passes, then the client reconnects
+    with Last-Event-ID. Without wait only published events are yielded.
+    Waiting for events only reads the cache.
+    The stream starts with last_event_id, so a client which connected without
+    Last-Event-ID resumes from it instead of the version current on reconnect
+    """
+    yield f'retry: {RETRY_MS}\nid: {last_event_id}\n\n'
+    started = last_sent = time.monotonic()
+    while True:
+        for event_id, event in await lot_events.aread(lot_id, last_event_id):
+            if event_id is not None:
+                last_event_id = event_id
+            last_sent = time.monotonic()
+            yield format_event(event_id, event)
+            if event['event'] == LOT_CLOSED:
+                return
+        now = time.monotonic()
+        if closed or not wait or now - started >= settings.LOT_EVENTS_STREAM_DURATION:
+            return
+        if now - last_sent >= KEEPALIVE_INTERVAL:
+            last_sent = now
+            yield ':\n\n'
+        await asyncio.sleep(settings.LOT_EVENTS_POLL_INTERVAL)
+
+
+def format_event(event_id, event):
+    return (
+        (f'id: {event_id}\n' if event_id is not None else '')
+        + f'event: {event["event"]}\n'
+        f'data: {json.dumps(event["data"])}\n\n'
+    )
+
+
+lot_events = LotEventLog()
@@ -0,0 +1,35 @@
+from rest_framework.filters import BaseFilterBackend
+
+from .serializers import LotFilterSerializer
+
+
+class LotFilter(BaseFilterBackend):
+    """
+    Filters open lots by breed, price range, author and creation date and
+    sets the keyset pagination ordering. Every supported ordering has a
+    matching partial index of open lots, see Lot.Meta.indexes
+    """
+    lookups = {
+        'breed': 'pet__breed',
+        'price_min': 'price__gte',
+        'price_max': 'price__lte',
+        'author': 'author__user__username',
+        'created_after': 'created_at__gte',
+        'created_before': 'created_at__lt',
+    }
+    # all fields are ordered in one direction, so indexes are scanned either way
+    orderings = {
+        'created_at': ('created_at', 'id'),
+        '-created_at': ('-created_at', '-id'),
+        'price': ('price', 'id'),
+        '-price': ('-price', '-id'),
+    }
+
+    def filter_queryset(self, request, queryset, view):
+        serializer = LotFilterSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+        view.pagination_ordering = self.orderings[params['ordering']]
+        return queryset.filter(**{
+            lookup: params[name] for name, lookup in self.lookups.items() if name in params
+        })
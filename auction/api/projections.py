@@ -0,0 +1,176 @@
+"""
+Read-only serialization of listings built from ``QuerySet.values()`` rows.
+
+DRF serializers instantiate model objects and run every field through its
+own machinery, which costs more than the query itself for large pages.
+Projection describes the same output as a display serializer, compiles it
+into a plan of plain getters once and then only copies values from rows.
+Output is identical to output of the corresponding serializer.
+"""
+from decimal import Decimal
+
+from django.db import models as db_models
+from django.utils import timezone
+
+from auction.core import models
+
+
+def _resolve_field(model, lookup):
+    *relations, name = lookup.split('__')
+    for relation in relations:
+        model = model._meta.get_field(relation).related_model
+    return model._meta.get_field(name)
+
+
+def _decimal_formatter(field):
+    # the same representation as DRF DecimalField with COERCE_DECIMAL_TO_STRING
+    quantum = Decimal(1).scaleb(-field.decimal_places)
+
+    def format_decimal(value):
+        if value is None:
+            return None
+        return '{:f}'.format(value.quantize(quantum))
+    return format_decimal
+
+
+def _format_datetime(value):
+    # the same representation as DRF DateTimeField with ISO 8601 format
+    if value is None:
+        return None
+    if timezone.is_aware(value):
+        value = timezone.localtime(value)
+    value = value.isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+
+class Projection:
+    """
+    Describes output of a serializer as mapping of output names to lookups.
+    Nested output is described with (relation, Projection) pair
+    """
+
+    def __init__(self, model, fields):
+        self.model = model
+        self.fields = fields
+        self.plan = self.compile()
+
+    def compile(self, prefix=''):
+        plan = []
+        for name, source in self.fields.items():
+            if isinstance(source, tuple):
+                relation, projection = source
+                plan.append((name, None, projection.compile(f'{prefix}{relation}__')))
+                continue
+            field = _resolve_field(self.model, source)
+            formatter = None
+            if isinstance(field, db_models.DecimalField):
+                formatter = _decimal_formatter(field)
+            elif isinstance(field, db_models.DateTimeField):
+                formatter = _format_datetime
+            plan.append((name, f'{prefix}{source}', formatter))
+        return plan
+
+    @property
+    def lookups(self):
+        return list(self._plan_lookups(self.plan))
+
+    def _plan_lookups(self, plan):
+        for _, lookup, extra in plan:
+            if lookup is None:
+                yield from self._plan_lookups(extra)
+            else:
+                yield lookup
+
+    def values(self, queryset, *extra_lookups):
+        """
+        Returns queryset of rows required for the projection.
+        Extra lookups (e.g. ordering fields used for pagination) are added to rows
+        """
+        lookups = self.lookups
+        for lookup in extra_lookups:
+            lookup = lookup.lstrip('-')
+            if lookup not in lookups:
+                lookups.append(lookup)
+        return queryset.values(*lookups)
+
+    def represent(self, row, plan=None):
+        output = {}
+        for name, lookup, extra in plan or self.plan:
+            if lookup is None:
+                output[name] = self.represent(row, extra)
+            elif extra is None:
+                output[name] = row[lookup]
+            else:
+                output[name] = extra(row[lookup])
+        return output
+
+    def represent_many(self, rows):
+        represent = self.represent
+        return [represent(row) for row in rows]
+
+
+pet = Projection(models.Pet, {
+    'id': 'id',
+    'name': 'name',
+    'breed': 'breed',
+})
+
+# lot catalogue is cached without bid summaries, which change with every bid
+lot_catalogue = Projection(models.Lot, {
+    'id': 'id',
+    'pet': ('pet', pet),
+    'price': 'price',
+    'author': 'author__user__username',
+    'ends_at': 'ends_at',
+})
+
+lot_bid_summary = Projection(models.Lot, {
+    'id': 'id',
+    'bid_count': 'bid_count',
+    'highest_bid': 'highest_bid_price',
+    'highest_bidder': 'highest_bidder__user__username',
+})
+
+lot_display = Projection(models.Lot, {**lot_catalogue.fields, **lot_bid_summary.fields})
+
+bid_short_display = Projection(models.Bid, {
+    'id': 'id',
+    'price': 'price',
+    'author': 'author__user__username',
+})
+
+bid_long_display = Projection(models.Bid, {
+    'id': 'id',
+    'price': 'price',
+    'author': 'author__user__username',
+    'lot': ('lot', lot_display),
+})
+
+
+archived_lot_display = Projection(models.ArchivedLot, {
+    'id': 'id',
+    'pet': ('pet', pet),
+    'price': 'price',
+    'author': 'author__user__username',
+    'created_at': 'created_at',
+    'archived_at': 'archived_at',
+})
+
+archived_bid_display = Projection(models.ArchivedBid, {
+    'id': 'id',
+    'price': 'price',
+    'author': 'author__user__username',
+    'created_at': 'created_at',
+})
+
+
+def add_bid_summaries(page, rows):
+    """
+    Returns a copy of cached catalogue page with bid summaries of its lots,
+    rows are lot_bid_summary rows of the lots
+    """
+    summaries = {row['id']: lot_bid_summary.represent(row) for row in rows}
+    results = [{**lot, **summaries.get(lot['id'], {})} for lot in page['results']]
+    return {**page, 'results': results}
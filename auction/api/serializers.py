@@ -1,17 +1,19 @@
 from django.conf import settings
+from django.contrib.auth import authenticate
+from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import User
 from django.contrib.auth.password_validation import validate_password
+from django.db import IntegrityError, transaction
+from django.utils import timezone
 from rest_framework import serializers
-from rest_framework.validators import UniqueValidator
 
 from auction.core import models
+from auction.core.constants import Breeds
 
 
 class UserCreateSerializer(serializers.ModelSerializer):
-    username = serializers.CharField(
-        required=True,
-        validators=[UniqueValidator(queryset=User.objects.all())]
-    )
+    # uniqueness is checked by the database on insert
+    username = serializers.CharField(required=True)
     password = serializers.CharField(
         write_only=True,
         required=True,
@@ -33,19 +35,45 @@ class UserCreateSerializer(serializers.ModelSerializer):
         return attrs
 
     def create(self, validated_data):
-        user = User.objects.create(
+        # password is hashed before the transaction, so it is not kept open
+        # while hashing, and the user is inserted with its hash at once
+        user = User(
             username=validated_data['username'],
+            password=make_password(validated_data['password']),
             is_active=True
         )
-        user.set_password(validated_data['password'])
-        user.save()
-        models.UserAccount.objects.create(
-            user=user, balance=settings.DEFAULT_USER_BALANCE
-        )
+        try:
+            with transaction.atomic():
+                user.save(force_insert=True)
+                models.UserAccount.objects.create(
+                    user=user, balance=settings.DEFAULT_USER_BALANCE
+                )
+        except IntegrityError:
+            raise serializers.ValidationError(
+                {'username': ['A user with that username already exists.']}
+            )
 
         return user
 
 
+class LoginSerializer(serializers.Serializer):
+    username = serializers.CharField()
+    password = serializers.CharField(write_only=True, trim_whitespace=False)
+
+    def validate(self, attrs):
+        user = authenticate(
+            request=self.context.get('request'),
+            username=attrs['username'],
+            password=attrs['password'],
+        )
+        if user is None:
+            raise serializers.ValidationError(
+                'Unable to log in with provided credentials.', code='authorization'
+            )
+        attrs['user'] = user
+        return attrs
+
+
 class PetSerializer(serializers.ModelSerializer):
     class Meta:
         model = models.Pet
@@ -53,13 +81,41 @@ class PetSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 
+def validate_ends_at(value):
+    if value is not None and value <= timezone.now():
+        raise serializers.ValidationError('Ensure this value is in the future.')
+
+
 class LotDisplaySerializer(serializers.ModelSerializer):
     pet = PetSerializer(read_only=True)
     author = serializers.StringRelatedField(read_only=True)
+    highest_bid = serializers.DecimalField(
+        source='highest_bid_price', max_digits=10, decimal_places=2, read_only=True
+    )
+    highest_bidder = serializers.StringRelatedField(read_only=True)
 
     class Meta:
         model = models.Lot
-        fields = ('id', 'pet', 'price', 'author')
+        fields = (
+            'id', 'pet', 'price', 'author', 'ends_at',
+            'bid_count', 'highest_bid', 'highest_bidder',
+        )
+
+
+class LotFilterSerializer(serializers.Serializer):
+    """
+    Query parameters of the lot catalogue
+    """
+    breed = serializers.ChoiceField(choices=Breeds.choices, required=False)
+    price_min = serializers.DecimalField(max_digits=10, decimal_places=2, required=False)
+    price_max = serializers.DecimalField(max_digits=10, decimal_places=2, required=False)
+    author = serializers.CharField(required=False)
+    created_after = serializers.DateTimeField(required=False)
+    created_before = serializers.DateTimeField(required=False)
+    ordering = serializers.ChoiceField(
+        choices=('created_at', '-created_at', 'price', '-price'),
+        default='created_at',
+    )
 
 
 class LotCreateSerializer(serializers.ModelSerializer):
@@ -67,7 +123,18 @@ class LotCreateSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = models.Lot
-        fields = ('pet', 'price')
+        fields = ('pet', 'price', 'ends_at')
+        extra_kwargs = {'ends_at': {'validators': [validate_ends_at]}}
+
+
+class LotBulkItemSerializer(serializers.ModelSerializer):
+    # pets of the whole list are fetched with one query by the view
+    pet = serializers.IntegerField()
+
+    class Meta:
+        model = models.Lot
+        fields = ('pet', 'price', 'ends_at')
+        extra_kwargs = {'ends_at': {'validators': [validate_ends_at]}}
 
 
 class BidShortDisplaySerializer(serializers.ModelSerializer):
@@ -93,3 +160,12 @@ class BidCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = models.Bid
         fields = ('price', 'lot')
+
+
+class BidBatchItemSerializer(serializers.ModelSerializer):
+    # lots of the whole batch are fetched with one query by the view
+    lot = serializers.IntegerField()
+
+    class Meta:
+        model = models.Bid
+        fields = ('price', 'lot')
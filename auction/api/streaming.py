@@ -0,0 +1,94 @@
+"""
+Streaming responses served without blocking the event loop of ASGI servers.
+
+ASGI handler of Django 4.1 iterates streaming content synchronously on the
+event loop, so a stream which waits blocks all requests of the worker and
+a stream which queries the database fails with SynchronousOnlyOperation.
+AsyncStreamingHttpResponse is streamed by ASGIHandler below with
+``async for`` instead, the same way Django 4.2 streams async iterators.
+Sync iterators which query the database are streamed with streaming_response,
+which advances them in the thread of the request.
+"""
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.core.handlers import asgi
+from django.http import StreamingHttpResponse
+from django.http.response import HttpResponseBase
+
+
+class AsyncStreamingHttpResponse(HttpResponseBase):
+    """
+    Streaming response of an async iterator of str or bytes,
+    served only by ASGIHandler of this module
+    """
+    streaming = True
+    is_async = True
+
+    def __init__(self, streaming_content, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.streaming_content = streaming_content
+
+    def __iter__(self):
+        raise TypeError('Async streaming response is served only by auction.asgi application')
+
+
+class ASGIHandler(asgi.ASGIHandler):
+
+    async def send_response(self, response, send):
+        if not getattr(response, 'is_async', False):
+            return await super().send_response(response, send)
+
+        await send({
+            'type': 'http.response.start',
+            'status': response.status_code,
+            'headers': [
+                (header.encode('ascii'), value.encode('latin1'))
+                for header, value in response.items()
+            ] + [
+                (b'Set-Cookie', cookie.output(header='').encode('ascii').strip())
+                for cookie in response.cookies.values()
+            ],
+        })
+        try:
+            async for part in response.streaming_content:
+                await send({
+                    'type': 'http.response.body',
+                    'body': response.make_bytes(part),
+                    'more_body': True,
+                })
+            await send({'type': 'http.response.body'})
+        finally:
+            aclose = getattr(response.streaming_content, 'aclose', None)
+            if aclose is not None:
+                await aclose()
+            await sync_to_async(response.close, thread_sensitive=True)()
+
+
+def is_asgi_request(request):
+    return isinstance(request, asgi.ASGIRequest)
+
+
+async def iterate_in_thread(iterator, batch_size=100):
+    """
+    Advances a sync iterator in the thread of the request, where its database
+    connection lives, and yields its items on the event loop
+    """
+    iterator = iter(iterator)
+    next_batch = sync_to_async(lambda: list(islice(iterator, batch_size)), thread_sensitive=True)
+    while True:
+        batch = await next_batch()
+        if not batch:
+            return
+        for item in batch:
+            yield item
+
+
+def streaming_response(request, iterator, batch_size=100, **kwargs):
+    """
+    Streams a sync iterator which may query the database,
+    under ASGI it is advanced in batches outside of the event loop
+    """
+    if is_asgi_request(request):
+        return AsyncStreamingHttpResponse(iterate_in_thread(iterator, batch_size), **kwargs)
+    return StreamingHttpResponse(iterator, **kwargs)
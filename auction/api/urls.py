@@ -1,7 +1,7 @@
 from django.urls import path
 from rest_framework.routers import SimpleRouter
 
-from . import views
+from . import async_views, views
 
 app_name = 'api'
 
@@ -9,7 +9,20 @@ router = SimpleRouter()
 router.register(r'pets', views.PetViewSet)
 router.register(r'lots', views.LotViewSet)
 router.register(r'bids', views.BidViewSet)
+router.register(r'archive/lots', views.ArchivedLotViewSet)
 
 urlpatterns = [
     path('register/', views.UserCreateView.as_view()),
+    path('login/', views.LoginView.as_view()),
+    path('logout/', views.LogoutView.as_view()),
+    path('cache-stats/', views.CacheStatsView.as_view()),
+    path('market-stats/', views.MarketStatsView.as_view()),
+    path('export/<str:name>/', views.ExportView.as_view()),
+    # async versions of read-heavy endpoints for ASGI servers
+    path('async/pets/', async_views.PetListView.as_view()),
+    path('async/lots/', async_views.LotListView.as_view()),
+    path('async/lots/<int:pk>/bids/', async_views.LotBidListView.as_view()),
+    path('async/bids/', async_views.BidListView.as_view()),
+    # served by an async view, so watchers do not occupy threads of ASGI servers
+    path('lots/<int:pk>/events/', async_views.LotEventsView.as_view()),
 ] + router.urls
@@ -1,15 +1,79 @@
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
 from django.db.transaction import atomic
+from django.conf import settings
 from django.contrib.auth.models import User
-from rest_framework.generics import ListAPIView, CreateAPIView
+from django.db.models import Sum
+from django.utils import timezone
+from rest_framework.generics import CreateAPIView, get_object_or_404
 from rest_framework.viewsets import GenericViewSet
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.decorators import action
-from rest_framework.permissions import AllowAny
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
+from rest_framework.views import APIView
 
-from auction.core import models
+from auction.core import export, models, stats
 from auction.core.constants import LotStatuses
-from . import serializers, exceptions
+from . import serializers, conditional, exceptions, filters, projections
+from .authentication import TokenAuthentication, revoke_tokens
+from .cache import lot_list_cache, lot_summary_cache
+from .events import BID_ACCEPTED, BID_PLACED, BID_WITHDRAWN, LOT_CLOSED, lot_events
+from .streaming import streaming_response
+
+
+def batch_error(exc):
+    """
+    Result of a batch item which failed with APIException
+    """
+    return {
+        'status': exc.status_code,
+        'code': exc.default_code,
+        'detail': exc.detail,
+    }
+
+
+def batch_validation_error(errors):
+    return batch_error(ValidationError(errors))
+
+
+def get_batch_items(request, name):
+    items = request.data
+    if not isinstance(items, list):
+        raise ValidationError({'non_field_errors': [f'Expected a list of {name}.']})
+    if len(items) > settings.API_MAX_BATCH_SIZE:
+        raise ValidationError({'non_field_errors': [
+            f'Ensure this list has no more than {settings.API_MAX_BATCH_SIZE} {name}.'
+        ]})
+    return items
+
+
+def validate_batch_items(serializer_class, items, results):
+    """
+    Validates every item with serializer and returns validated data of valid
+    items by their index, errors of invalid items are put to results
+    """
+    valid = {}
+    for index, item in enumerate(items):
+        serializer = serializer_class(data=item)
+        if serializer.is_valid():
+            valid[index] = serializer.validated_data
+        else:
+            results[index] = batch_validation_error(serializer.errors)
+    return valid
+
+
+def format_decimal(value):
+    # the same representation as DecimalField of serializers
+    return None if value is None else '{:f}'.format(value)
+
+
+def does_not_exist_error(field, pk):
+    return batch_validation_error({
+        field: [f'Invalid pk "{pk}" - object does not exist.']
+    })
 
 
 class UserCreateView(CreateAPIView):
@@ -18,33 +82,196 @@ class UserCreateView(CreateAPIView):
     serializer_class = serializers.UserCreateSerializer
 
 
+class LoginView(APIView):
+    """
+    Issues an API token for username and password. The password is checked
+    once here, requests authenticated with the token skip password hashing
+    """
+    permission_classes = (AllowAny,)
+
+    def post(self, request):
+        serializer = serializers.LoginSerializer(
+            data=request.data, context={'request': request}
+        )
+        serializer.is_valid(raise_exception=True)
+        token, key = models.AuthToken.issue(serializer.validated_data['user'])
+        return Response(
+            {'token': key, 'expires_at': token.expires_at},
+            status=status.HTTP_201_CREATED,
+        )
+
+
+class LogoutView(APIView):
+    """
+    Revokes the token of the request, or all tokens of the user with {"all": true}
+    """
+    permission_classes = (IsAuthenticated,)
+
+    def post(self, request):
+        tokens = models.AuthToken.objects.filter(user=request.user)
+        if not request.data.get('all'):
+            if not isinstance(request.successful_authenticator, TokenAuthentication):
+                raise ValidationError(
+                    {'non_field_errors': ['Request is not authenticated with a token.']}
+                )
+            tokens = tokens.filter(digest=request.auth)
+        revoke_tokens(tokens)
+        return Response()
+
+
+class CacheStatsView(APIView):
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        return Response({'lots': lot_list_cache.get_stats()})
+
+
+class MarketStatsView(APIView):
+    """
+    Per-breed market statistics and daily activity of the last
+    MARKET_STATS_DAYS days, read from incrementally maintained counters
+    """
+
+    def get(self, request):
+        breeds = [
+            {
+                'breed': row.breed,
+                'open_lots': row.open_lots,
+                'average_price': format_decimal(stats.average(row.open_lots_price, row.open_lots)),
+                'open_bids': row.open_bids,
+                'sold_lots': row.sold_lots,
+                'average_winning_bid': format_decimal(stats.average(row.sold_price, row.sold_lots)),
+            }
+            for row in models.BreedStats.objects.order_by('breed')
+        ]
+        since = timezone.localdate() - timedelta(days=settings.MARKET_STATS_DAYS - 1)
+        daily = models.DailyStats.objects.filter(date__gte=since).values('date').annotate(
+            lots_created=Sum('lots_created'),
+            bids_placed=Sum('bids_placed'),
+            sales=Sum('sales'),
+            sales_amount=Sum('sales_amount'),
+        ).order_by('-date')
+        return Response({
+            'breeds': breeds,
+            'daily': [
+                {**row, 'sales_amount': format_decimal(row['sales_amount'])} for row in daily
+            ],
+        })
+
+
+class ExportView(APIView):
+    """
+    Streams lots, bids, pets or accounts as CSV or JSONL, with optional
+    from, to and status filters. Under ASGI rows are fetched outside
+    of the event loop
+    """
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request, name):
+        if name not in export.EXPORTS:
+            raise NotFound()
+        # "format" parameter is reserved by DRF for renderer override
+        file_format = request.query_params.get('file_format', 'csv')
+        if file_format not in export.FORMATS:
+            raise ValidationError({'file_format': f'Choose one of {", ".join(export.FORMATS)}.'})
+        try:
+            filters = export.parse_filters(
+                request.query_params.get('from'),
+                request.query_params.get('to'),
+                request.query_params.get('status'),
+            )
+            lines = export.export_lines(
+                name, file_format, chunk_size=settings.EXPORT_CHUNK_SIZE, **filters
+            )
+        except ValueError as error:
+            raise ValidationError({'non_field_errors': [str(error)]})
+
+        response = streaming_response(
+            request._request, lines, batch_size=settings.EXPORT_CHUNK_SIZE,
+            content_type=export.CONTENT_TYPES[file_format],
+        )
+        response['Content-Disposition'] = f'attachment; filename="{name}.{file_format}"'
+        return response
+
+
 class PetViewSet(GenericViewSet):
     queryset = models.Pet.objects.all()
     serializer_class = serializers.PetSerializer
 
     def list(self, request, *args, **kwargs):
+        account = request.user.useraccount
+        etag = conditional.make_etag('pets', account.pk, account.get_version())
+        return conditional.respond(request, etag, self.get_list_response)
+
+    def get_list_response(self):
         queryset = self.get_queryset().filter(
-            owner=request.user.useraccount
+            owner=self.request.user.useraccount
         )
         queryset = self.filter_queryset(queryset)
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        page = self.paginate_queryset(projections.pet.values(queryset, 'created_at'))
+        return self.get_paginated_response(projections.pet.represent_many(page))
 
     def create(self, request, *args, **kwargs):
         serializer = self.serializer_class(data=request.data)
         serializer.is_valid(raise_exception=True)
         serializer.save(owner=request.user.useraccount)
+        models.UserAccount.bump_versions([request.user.useraccount.pk])
 
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """
+        Creates pets from a list, results are returned in order of items
+        """
+        items = get_batch_items(request, 'pets')
+        results = [None] * len(items)
+        valid = validate_batch_items(serializers.PetSerializer, items, results)
+
+        account = request.user.useraccount
+        pets = models.Pet.objects.bulk_create(
+            models.Pet(owner=account, **data) for data in valid.values()
+        )
+        if pets:
+            models.UserAccount.bump_versions([account.pk])
+        for index, pet in zip(valid, pets):
+            results[index] = {
+                'status': status.HTTP_201_CREATED,
+                'pet': serializers.PetSerializer(pet).data,
+            }
+        return Response(results)
+
 
 class LotViewSet(GenericViewSet):
     queryset = models.Lot.objects.all()
+    ladder_ordering = models.BID_LADDER_ORDERING
 
     def list(self, request):
-        queryset = self.get_queryset().select_related('pet').filter(status=LotStatuses.OPEN)
-        serializer = serializers.LotDisplaySerializer(queryset, many=True)
-        return Response(serializer.data)
+        # version of the cache changes with every opened or closed lot,
+        # bid summaries are read on every request and have their own version
+        version = lot_list_cache.get_version()
+        etag = conditional.make_etag('lots', version, lot_summary_cache.get_version())
+
+        def build_response():
+            page = lot_list_cache.get_or_set(
+                request.build_absolute_uri(), self.get_list_data, version=version
+            )
+            lot_ids = [lot['id'] for lot in page['results']]
+            summaries = projections.lot_bid_summary.values(
+                models.Lot.objects.filter(pk__in=lot_ids)
+            ) if lot_ids else []
+            return Response(projections.add_bid_summaries(page, summaries))
+        return conditional.respond(request, etag, build_response)
+
+    def get_list_data(self):
+        queryset = filters.LotFilter().filter_queryset(
+            self.request, self.get_queryset().filter(status=LotStatuses.OPEN), self
+        )
+        page = self.paginate_queryset(
+            projections.lot_catalogue.values(queryset, *self.pagination_ordering)
+        )
+        data = projections.lot_catalogue.represent_many(page)
+        return self.get_paginated_response(data).data
 
     def create(self, request, *args, **kwargs):
         serializer = serializers.LotCreateSerializer(data=request.data)
@@ -52,108 +279,384 @@ class LotViewSet(GenericViewSet):
         pet = serializer.validated_data['pet']
 
         # check that user owns pet
-        if not pet.owner == request.user.useraccount:
+        if pet.owner_id != request.user.useraccount.pk:
             raise exceptions.UserNotOwnPet()
 
-        # check that there is no existed lot for this pet
-        lot_exists = models.Lot.objects.filter(
-            author=request.user.useraccount,
-            pet=pet,
-            status=LotStatuses.OPEN,
-        ).exists()
-        if lot_exists:
+        # only one open lot per pet is allowed by lot_open_pet_uniq constraint
+        try:
+            with atomic():
+                lot = serializer.save(
+                    author=self.request.user.useraccount,
+                    status=LotStatuses.OPEN
+                )
+        except IntegrityError:
             raise exceptions.LotExists()
 
-        lot = serializer.save(
-            author=self.request.user.useraccount,
-            status=LotStatuses.OPEN
-        )
+        lot_list_cache.bump_version()
+        stats.lots_opened([lot])
+
         return Response(
             serializers.LotDisplaySerializer(lot).data,
             status=status.HTTP_201_CREATED
         )
 
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """
+        Puts pets up for sale from a list of {pet, price} items,
+        results are returned in order of items
+        """
+        items = get_batch_items(request, 'lots')
+        results = [None] * len(items)
+        valid = validate_batch_items(serializers.LotBulkItemSerializer, items, results)
+
+        account = request.user.useraccount
+        pet_ids = {data['pet'] for data in valid.values()}
+        pets = models.Pet.objects.in_bulk(pet_ids)
+        listed = set(models.Lot.objects.filter(
+            pet__in=pet_ids, status=LotStatuses.OPEN
+        ).values_list('pet_id', flat=True))
+
+        lots = {}
+        for index, data in valid.items():
+            pet = pets.get(data['pet'])
+            if pet is None:
+                results[index] = does_not_exist_error('pet', data['pet'])
+            elif pet.owner_id != account.pk:
+                results[index] = batch_error(exceptions.UserNotOwnPet())
+            elif pet.pk in listed:
+                results[index] = batch_error(exceptions.LotExists())
+            else:
+                listed.add(pet.pk)
+                lots[index] = models.Lot(
+                    pet=pet, author=account, price=data['price'],
+                    ends_at=data.get('ends_at'), status=LotStatuses.OPEN,
+                )
+
+        if lots:
+            # only one open lot per pet is allowed by lot_open_pet_uniq constraint
+            try:
+                with atomic():
+                    models.Lot.objects.bulk_create(lots.values())
+            except IntegrityError:
+                raise exceptions.LotExists()
+            lot_list_cache.bump_version()
+            stats.lots_opened(lots.values())
+
+        for index, lot in lots.items():
+            results[index] = {
+                'status': status.HTTP_201_CREATED,
+                'lot': serializers.LotDisplaySerializer(lot).data,
+            }
+        return Response(results)
+
+    def get_lot_etag(self, lot):
+        return conditional.make_etag('lot', lot.pk, lot.version)
+
     @action(detail=True, methods=['get'])
     def bids(self, request, pk=None):
         lot = self.get_object()
-        bids = lot.bids.filter(lot__status=LotStatuses.OPEN)
-        return Response(serializers.BidShortDisplaySerializer(bids, many=True).data)
+
+        def build_response():
+            bids = lot.bids.filter(lot__status=LotStatuses.OPEN)
+            page = self.paginate_queryset(projections.bid_short_display.values(bids, 'created_at'))
+            return self.get_paginated_response(projections.bid_short_display.represent_many(page))
+        return conditional.respond(request, self.get_lot_etag(lot), build_response)
+
+    @action(detail=True, methods=['get'])
+    def ladder(self, request, pk=None):
+        """
+        Bids of the lot ordered from the highest price.
+        With ?top=N only N highest bids are returned without pagination
+        """
+        lot = self.get_object()
+        top = request.query_params.get('top')
+        if top is not None:
+            try:
+                top = int(top)
+            except ValueError:
+                raise ValidationError({'top': 'A valid integer is required.'})
+            top = max(0, min(top, settings.API_MAX_PAGE_SIZE))
+
+        def build_response():
+            bids = projections.bid_short_display.values(
+                lot.bids.filter(lot__status=LotStatuses.OPEN), *self.ladder_ordering
+            )
+            if top is not None:
+                bids = bids.order_by(*self.ladder_ordering)[:top]
+                return Response(projections.bid_short_display.represent_many(bids))
+
+            self.pagination_ordering = self.ladder_ordering
+            page = self.paginate_queryset(bids)
+            return self.get_paginated_response(projections.bid_short_display.represent_many(page))
+        return conditional.respond(request, self.get_lot_etag(lot), build_response)
+
+    @action(detail=True, methods=['get'], url_path='best-bid')
+    def best_bid(self, request, pk=None):
+        lot = self.get_object()
+        # bids of closed lots are not listed
+        bid_count = 0 if lot.is_closed else lot.bid_count
+        best_bid = None
+        if bid_count:
+            best_bid = lot.bids.select_related('author__user').order_by(
+                *self.ladder_ordering
+            ).first()
+        return Response({
+            'lot': lot.id,
+            'bid_count': bid_count,
+            'best_bid': (
+                serializers.BidShortDisplaySerializer(best_bid).data if best_bid else None
+            ),
+        })
 
     @action(detail=True, methods=['post'])
     def close(self, request, pk=None):
         lot = self.get_object()
-        if not lot.author == request.user.useraccount:
+        if lot.author_id != request.user.useraccount.pk:
             raise exceptions.UserIsNotAuthorForLot()
 
         if lot.is_closed:
             raise exceptions.LotAlreadyClosed()
 
-        lot.close()
+        if not lot.close():
+            raise exceptions.LotAlreadyClosed()
+
+        lot_list_cache.bump_version()
+        lot_events.publish(lot.pk, lot.version, LOT_CLOSED, {'id': lot.pk})
+        stats.lots_closed([lot.pk])
         return Response()
 
 
 class BidViewSet(GenericViewSet):
     queryset = models.Bid.objects.select_related('lot__pet')
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'accept':
+            # bidder becomes owner of the pet and is shown in the event
+            queryset = queryset.select_related('author__user')
+        return queryset
+
     def list(self, request):
         queryset = self.get_queryset().filter(
             lot__status=LotStatuses.OPEN
         )
-        serializer = serializers.BidLongDisplaySerializer(queryset, many=True)
-        return Response(serializer.data)
+        page = self.paginate_queryset(projections.bid_long_display.values(queryset, 'created_at'))
+        return self.get_paginated_response(projections.bid_long_display.represent_many(page))
 
     def create(self, request, *args, **kwargs):
         serializer = serializers.BidCreateSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         lot = serializer.validated_data['lot']
 
-        if lot.is_closed:
+        # ended lot is not closed until expire_lots sweeps it
+        if lot.is_closed or lot.has_ended:
             raise exceptions.LotAlreadyClosed()
 
-        if lot.author == request.user.useraccount:
+        if lot.author_id == request.user.useraccount.pk:
             raise exceptions.CannotBidInOwnLot()
 
-        user_already_has_bid = lot.bids.filter(
-            author=request.user.useraccount
-        ).exists()
-        if user_already_has_bid:
+        try:
+            with atomic():
+                # lock the lot, so it cannot be closed before bid is saved
+                lot = models.Lot.objects.select_for_update(of=('self',)).select_related(
+                    'pet', 'author__user', 'highest_bidder__user'
+                ).get(pk=lot.pk)
+                if lot.is_closed:
+                    raise exceptions.LotAlreadyClosed()
+
+                # only one bid per user is allowed by bid_lot_author_uniq constraint
+                bid = serializer.save(
+                    author=self.request.user.useraccount,
+                    lot=lot,
+                )
+
+                if not request.user.useraccount.reserve_funds(bid.price):
+                    raise exceptions.InsufficientBalance()
+                models.Lot.add_bids([bid])
+                # bids change only bid summaries, cached catalogue pages stay valid
+                transaction.on_commit(lot_summary_cache.bump_version)
+                stats.bids_placed([bid])
+                lot_events.publish(
+                    lot.pk, lot.version, BID_PLACED,
+                    serializers.BidShortDisplaySerializer(bid).data,
+                )
+        except IntegrityError:
             raise exceptions.OnlyOneBidAllowed()
 
-        if serializer.validated_data['price'] > request.user.useraccount.available_balance:
-            raise exceptions.InsufficientBalance()
-
-        bid = serializer.save(
-            author=self.request.user.useraccount,
-        )
         return Response(
             serializers.BidLongDisplaySerializer(bid).data,
             status=status.HTTP_201_CREATED
         )
 
+    @action(detail=False, methods=['post'])
+    def batch(self, request):
+        """
+        Places bids from a list of {lot, price} items in one transaction.
+        Items are checked against one snapshot of user's balance, results
+        are returned in order of items with an error code for rejected ones
+        """
+        items = get_batch_items(request, 'bids')
+        results = [None] * len(items)
+        valid = validate_batch_items(serializers.BidBatchItemSerializer, items, results)
+
+        account = request.user.useraccount
+        lot_ids = {data['lot'] for data in valid.values()}
+        try:
+            with atomic():
+                # lots are locked in order of ids, so concurrent batches do not deadlock
+                lots = {
+                    lot.pk: lot for lot in models.Lot.objects.select_for_update(
+                        of=('self',)
+                    ).select_related('pet').filter(pk__in=lot_ids).order_by('pk')
+                }
+                placed = set(models.Bid.objects.filter(
+                    author=account, lot__in=lot_ids
+                ).values_list('lot_id', flat=True))
+                account = models.UserAccount.objects.select_for_update().get(pk=account.pk)
+                available = account.available_balance
+
+                bids = {}
+                for index, data in valid.items():
+                    lot = lots.get(data['lot'])
+                    if lot is None:
+                        results[index] = does_not_exist_error('lot', data['lot'])
+                    elif lot.is_closed or lot.has_ended:
+                        results[index] = batch_error(exceptions.LotAlreadyClosed())
+                    elif lot.author_id == account.pk:
+                        results[index] = batch_error(exceptions.CannotBidInOwnLot())
+                    elif lot.pk in placed:
+                        results[index] = batch_error(exceptions.OnlyOneBidAllowed())
+                    elif data['price'] > available:
+                        results[index] = batch_error(exceptions.InsufficientBalance())
+                    else:
+                        placed.add(lot.pk)
+                        available -= data['price']
+                        bids[index] = models.Bid(lot=lot, author=account, price=data['price'])
+
+                if bids:
+                    models.Bid.objects.bulk_create(bids.values())
+                    if not account.reserve_funds(sum(bid.price for bid in bids.values())):
+                        raise exceptions.InsufficientBalance()
+                    models.Lot.add_bids(list(bids.values()))
+                    transaction.on_commit(lot_summary_cache.bump_version)
+                    stats.bids_placed(bids.values())
+        except IntegrityError:
+            raise exceptions.OnlyOneBidAllowed()
+
+        # locked account is a new instance, the user is set to avoid querying it again
+        account.user = request.user
+        for index, bid in bids.items():
+            data = serializers.BidShortDisplaySerializer(bid).data
+            lot_events.publish(bid.lot_id, bid.lot.version, BID_PLACED, data)
+            results[index] = {'status': status.HTTP_201_CREATED, 'bid': data}
+        return Response(results)
+
     def destroy(self, request, *args, **kwargs):
         bid = self.get_object()
 
-        if bid.author != request.user.useraccount:
+        if bid.author_id != request.user.useraccount.pk:
             raise exceptions.UserIsNotAuthorForBid()
 
         if bid.lot.is_closed:
             raise exceptions.LotAlreadyClosed()
 
-        bid.delete()
+        with atomic():
+            # lock the lot, so it cannot be closed while bid is being deleted
+            lot = models.Lot.objects.select_for_update().get(pk=bid.lot_id)
+            if lot.is_closed:
+                raise exceptions.LotAlreadyClosed()
+
+            # the bid could be deleted by a concurrent request before the lot was locked
+            deleted, _ = models.Bid.objects.filter(pk=bid.pk).delete()
+            if not deleted:
+                raise NotFound()
+            lot.remove_bid(bid)
+            lot_events.publish(lot.pk, lot.version, BID_WITHDRAWN, {'id': bid.pk})
+            request.user.useraccount.release_funds(bid.price)
+            transaction.on_commit(lot_summary_cache.bump_version)
+            stats.bid_withdrawn(bid)
         return Response()
 
     @action(detail=True, methods=['post'])
     def accept(self, request, pk=None):
         bid = self.get_object()
-        if bid.lot.author != request.user.useraccount:
+        if bid.lot.author_id != request.user.useraccount.pk:
             raise exceptions.CanOnlyAcceptBidForOwnLot()
 
         if bid.lot.is_closed:
             raise exceptions.LotAlreadyClosed()
 
         with atomic():
+            # lock the lot, so the bid cannot be withdrawn while it is accepted
+            lot = models.Lot.objects.select_for_update(of=('self',)).select_related(
+                'pet'
+            ).get(pk=bid.lot_id)
+            if lot.is_closed:
+                raise exceptions.LotAlreadyClosed()
+            # the bid could be withdrawn before the lot was locked
+            bid = models.Bid.objects.select_related('author__user').filter(pk=bid.pk).first()
+            if bid is None:
+                raise NotFound()
+            bid.lot = lot
+
+            # closing the lot releases funds reserved by all its bids,
+            # including the accepted one
+            if not lot.close(sold_price=bid.price):
+                raise exceptions.LotAlreadyClosed()
+            if not models.UserAccount.transfer(
+                bid.author, request.user.useraccount, bid.price
+            ):
+                raise exceptions.InsufficientBalance()
+            # accounts are locked by the transfer in order of their keys
             bid.lot.pet.set_owner(bid.author)
-            bid.lot.author.increase_balance(bid.price)
-            bid.author.decrease_balance(bid.price)
-            bid.lot.close()
-        return Response()
\ No newline at end of file
+            transaction.on_commit(lot_list_cache.bump_version)
+            lot_events.publish(
+                bid.lot_id, bid.lot.version, BID_ACCEPTED,
+                serializers.BidShortDisplaySerializer(bid).data,
+            )
+            lot_events.publish(bid.lot_id, bid.lot.version, LOT_CLOSED, {'id': bid.lot_id})
+            stats.lots_closed([bid.lot_id], sales=[(bid.lot.pet.breed, bid.price)])
+        return Response()
+
+
+class ArchivedLotViewSet(GenericViewSet):
+    """
+    Read-only access to archived lots and their bids.
+    Lots are filtered by ?author=<username> and ?pet=<id>
+    """
+    queryset = models.ArchivedLot.objects.all()
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action != 'list':
+            return queryset
+        author = self.request.query_params.get('author')
+        if author:
+            queryset = queryset.filter(author__user__username=author)
+        pet = self.request.query_params.get('pet')
+        if pet:
+            try:
+                queryset = queryset.filter(pet=int(pet))
+            except ValueError:
+                raise ValidationError({'pet': 'A valid integer is required.'})
+        return queryset
+
+    def list(self, request):
+        lots = projections.archived_lot_display.values(self.get_queryset(), 'created_at')
+        page = self.paginate_queryset(lots)
+        return self.get_paginated_response(projections.archived_lot_display.represent_many(page))
+
+    def retrieve(self, request, pk=None):
+        lot = get_object_or_404(
+            projections.archived_lot_display.values(self.get_queryset()), pk=pk
+        )
+        return Response(projections.archived_lot_display.represent(lot))
+
+    @action(detail=True, methods=['get'])
+    def bids(self, request, pk=None):
+        lot = self.get_object()
+        page = self.paginate_queryset(
+            projections.archived_bid_display.values(lot.bids.all(), 'created_at')
+        )
+        return self.get_paginated_response(projections.archived_bid_display.represent_many(page))
@@ -0,0 +1,356 @@
+"""
+Synthetic API workload used by replay_workload command.
+
+Workload keeps track of users, pets, lots and bids created during the run,
+so every operation is sent with valid arguments. Operations are executed
+through a transport, either in-process with Django test client against the
+real URLconf or over HTTP against a running server.
+"""
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from base64 import b64encode
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+from django.contrib.auth.models import User
+from django.db import DatabaseError, connections
+from rest_framework.test import APIClient
+
+OPERATIONS = (
+    'register', 'create_pet', 'create_lot', 'list_lots',
+    'place_bid', 'delete_bid', 'accept', 'close',
+)
+# postgres error codes of lock timeouts, deadlocks and serialization failures
+LOCK_ERROR_CODES = {'40001', '40P01', '55P03'}
+
+
+class Skip(Exception):
+    """
+    Raised when state of the workload does not allow an operation, e.g. there
+    are no bids to accept yet
+    """
+
+
+class InProcessTransport:
+    """
+    Handles requests with the test client. With force_auth users are loaded
+    by username and authenticated with force_authenticate, so password hashing
+    of basic authentication is not a part of the latency
+    """
+
+    def __init__(self, force_auth=False):
+        self.client = APIClient(raise_request_exception=True)
+        self.force_auth = force_auth
+
+    def request(self, method, path, data=None, auth=None):
+        headers = {}
+        if auth and self.force_auth:
+            self.client.force_authenticate(user=User.objects.get(username=auth[0]))
+        elif auth:
+            self.client.force_authenticate(user=None)
+            headers['HTTP_AUTHORIZATION'] = basic_auth_header(*auth)
+        else:
+            self.client.force_authenticate(user=None)
+        response = getattr(self.client, method)(
+            path, data=data, format='json', **headers
+        )
+        try:
+            body = response.json() if response.content else None
+        except ValueError:
+            body = None
+        return response.status_code, body
+
+    def close(self):
+        connections.close_all()
+
+
+class HttpTransport:
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+
+    def request(self, method, path, data=None, auth=None):
+        request = Request(
+            f'{self.base_url}{path}',
+            method=method.upper(),
+            data=json.dumps(data).encode() if data is not None else None,
+            headers={'Content-Type': 'application/json'},
+        )
+        if auth:
+            request.add_header('Authorization', basic_auth_header(*auth))
+        try:
+            with urlopen(request) as response:
+                status, content = response.status, response.read()
+        except HTTPError as error:
+            status, content = error.code, error.read()
+        try:
+            body = json.loads(content) if content else None
+        except ValueError:
+            body = None
+        return status, body
+
+    def close(self):
+        pass
+
+
+def basic_auth_header(username, password):
+    return 'Basic ' + b64encode(f'{username}:{password}'.encode()).decode()
+
+
+def percentile(sorted_values, percent):
+    if not sorted_values:
+        return None
+    index = max(math.ceil(len(sorted_values) * percent / 100) - 1, 0)
+    return sorted_values[index]
+
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.status_codes = defaultdict(Counter)
+        self.errors = defaultdict(Counter)
+        self.lock_failures = Counter()
+        self.skipped = Counter()
+
+    def record(self, operation, latency, status=None, error=None, lock_failure=False):
+        with self.lock:
+            self.latencies[operation].append(latency)
+            if status is not None:
+                self.status_codes[operation][status] += 1
+            if error is not None:
+                self.errors[operation][error] += 1
+            if lock_failure:
+                self.lock_failures[operation] += 1
+
+    def skip(self, operation):
+        with self.lock:
+            self.skipped[operation] += 1
+
+    def summary(self, elapsed):
+        operations = {}
+        for operation in OPERATIONS:
+            latencies = sorted(self.latencies.get(operation, []))
+            if not latencies and not self.skipped[operation]:
+                continue
+            operations[operation] = {
+                'count': len(latencies),
+                'throughput': len(latencies) / elapsed if elapsed else None,
+                'p50_ms': _ms(percentile(latencies, 50)),
+                'p95_ms': _ms(percentile(latencies, 95)),
+                'p99_ms': _ms(percentile(latencies, 99)),
+                'status_codes': {
+                    str(status): count
+                    for status, count in sorted(self.status_codes[operation].items())
+                },
+                'errors': dict(self.errors[operation]),
+                'lock_failures': self.lock_failures[operation],
+                'skipped': self.skipped[operation],
+            }
+        total = sum(len(latencies) for latencies in self.latencies.values())
+        return {
+            'elapsed_s': elapsed,
+            'requests': total,
+            'throughput': total / elapsed if elapsed else None,
+            'operations': operations,
+        }
+
+
+def _ms(seconds):
+    return None if seconds is None else seconds * 1000
+
+
+class Workload:
+    def __init__(self, make_transport, mix, seed=None, password='Pa55-workload'):
+        self.make_transport = make_transport
+        self.operations, self.weights = zip(*mix.items())
+        self.password = password
+        self.random = random.Random(seed)
+        self.random_lock = threading.Lock()
+        self.state_lock = threading.Lock()
+        self.users = []
+        self.unlisted_pets = defaultdict(list)
+        self.open_lots = {}
+        self.bids = {}
+        self.stats = Stats()
+        self.local = threading.local()
+
+    @property
+    def transport(self):
+        if not hasattr(self.local, 'transport'):
+            self.local.transport = self.make_transport()
+        return self.local.transport
+
+    def choose_operation(self):
+        with self.random_lock:
+            return self.random.choices(self.operations, weights=self.weights)[0]
+
+    def choice(self, items):
+        with self.random_lock:
+            return self.random.choice(items)
+
+    def run_operation(self, operation):
+        started = time.perf_counter()
+        try:
+            status = getattr(self, operation)()
+        except Skip:
+            self.stats.skip(operation)
+            return
+        except DatabaseError as error:
+            pgcode = getattr(error.__cause__, 'pgcode', None)
+            self.stats.record(
+                operation, time.perf_counter() - started,
+                error=type(error).__name__, lock_failure=pgcode in LOCK_ERROR_CODES,
+            )
+            return
+        except Exception as error:
+            self.stats.record(
+                operation, time.perf_counter() - started, error=type(error).__name__
+            )
+            return
+        self.stats.record(operation, time.perf_counter() - started, status=status)
+
+    def run(self, operations, concurrency):
+        """
+        Runs operations with a pool of workers and returns elapsed time.
+        Every worker gets its own transport and database connection
+        """
+        operations = iter(operations)
+        lock = threading.Lock()
+
+        def worker():
+            try:
+                while True:
+                    with lock:
+                        operation = next(operations, None)
+                    if operation is None:
+                        return
+                    self.run_operation(operation)
+            finally:
+                if hasattr(self.local, 'transport'):
+                    self.local.transport.close()
+                    del self.local.transport
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            for future in [executor.submit(worker) for _ in range(concurrency)]:
+                future.result()
+        return time.perf_counter() - started
+
+    def random_user(self):
+        with self.state_lock:
+            if not self.users:
+                raise Skip()
+            return self.choice(self.users)
+
+    # operations, each one returns status code of the response
+
+    def register(self):
+        username = f'workload_{uuid.uuid4().hex[:12]}'
+        status, _ = self.transport.request('post', '/api/register/', {
+            'username': username, 'password': self.password, 'password2': self.password,
+        })
+        if status == 201:
+            with self.state_lock:
+                self.users.append(username)
+        return status
+
+    def create_pet(self):
+        user = self.random_user()
+        status, body = self.transport.request(
+            'post', '/api/pets/', {'name': 'Workload', 'breed': 'cat'},
+            auth=(user, self.password),
+        )
+        if status == 201:
+            with self.state_lock:
+                self.unlisted_pets[user].append(body['id'])
+        return status
+
+    def create_lot(self):
+        with self.state_lock:
+            owners = [user for user, pets in self.unlisted_pets.items() if pets]
+            if not owners:
+                raise Skip()
+            user = self.choice(owners)
+            pet = self.unlisted_pets[user].pop()
+        status, body = self.transport.request(
+            'post', '/api/lots/', {'pet': pet, 'price': '10.00'}, auth=(user, self.password),
+        )
+        with self.state_lock:
+            if status == 201:
+                self.open_lots[body['id']] = (user, pet)
+            else:
+                self.unlisted_pets[user].append(pet)
+        return status
+
+    def list_lots(self):
+        user = self.random_user()
+        status, _ = self.transport.request('get', '/api/lots/', auth=(user, self.password))
+        return status
+
+    def place_bid(self):
+        user = self.random_user()
+        with self.state_lock:
+            # a user can bid only once in a lot
+            placed = {lot for bidder, lot in self.bids.values() if bidder == user}
+            lots = [
+                lot for lot, (author, _) in self.open_lots.items()
+                if author != user and lot not in placed
+            ]
+            if not lots:
+                raise Skip()
+            lot = self.choice(lots)
+        status, body = self.transport.request(
+            'post', '/api/bids/', {'lot': lot, 'price': '0.01'}, auth=(user, self.password),
+        )
+        if status == 201:
+            with self.state_lock:
+                self.bids[body['id']] = (user, lot)
+        return status
+
+    def delete_bid(self):
+        with self.state_lock:
+            bids = [bid for bid, (_, lot) in self.bids.items() if lot in self.open_lots]
+            if not bids:
+                raise Skip()
+            bid = self.choice(bids)
+            user, _ = self.bids.pop(bid)
+        status, _ = self.transport.request(
+            'delete', f'/api/bids/{bid}/', auth=(user, self.password)
+        )
+        return status
+
+    def accept(self):
+        with self.state_lock:
+            bids = [bid for bid, (_, lot) in self.bids.items() if lot in self.open_lots]
+            if not bids:
+                raise Skip()
+            bid = self.choice(bids)
+            bidder, lot = self.bids.pop(bid)
+            author, pet = self.open_lots.pop(lot)
+        status, _ = self.transport.request(
+            'post', f'/api/bids/{bid}/accept/', auth=(author, self.password)
+        )
+        if status == 200:
+            with self.state_lock:
+                self.unlisted_pets[bidder].append(pet)
+        return status
+
+    def close(self):
+        with self.state_lock:
+            if not self.open_lots:
+                raise Skip()
+            lot = self.choice(list(self.open_lots))
+            author, pet = self.open_lots.pop(lot)
+        status, _ = self.transport.request(
+            'post', f'/api/lots/{lot}/close/', auth=(author, self.password)
+        )
+        if status == 200:
+            with self.state_lock:
+                self.unlisted_pets[author].append(pet)
+        return status
@@ -9,8 +9,13 @@ https://docs.djangoproject.com/en/4.1/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'auction.settings.prod')
 
-application = get_asgi_application()
+django.setup(set_prefix=False)
+
+# the handler streams async iterators, which Django 4.1 does not
+from auction.api.streaming import ASGIHandler  # noqa: E402
+
+application = ASGIHandler()
@@ -6,6 +6,7 @@ from . import models
 @admin.register(models.UserAccount)
 class UserAccountAdmin(admin.ModelAdmin):
     list_display = ('user', 'balance', 'available_balance')
+    readonly_fields = ('reserved_amount',)
 
 
 @admin.register(models.Pet)
@@ -22,3 +23,19 @@ class LotAdmin(admin.ModelAdmin):
 @admin.register(models.Bid)
 class BidAdmin(admin.ModelAdmin):
     list_display = ('lot', 'author', 'price')
+
+
+@admin.register(models.ArchivedLot)
+class ArchivedLotAdmin(admin.ModelAdmin):
+    list_display = ('pet', 'author', 'price', 'created_at', 'archived_at')
+
+
+@admin.register(models.ArchivedBid)
+class ArchivedBidAdmin(admin.ModelAdmin):
+    list_display = ('lot', 'author', 'price')
+
+
+@admin.register(models.AuthToken)
+class AuthTokenAdmin(admin.ModelAdmin):
+    list_display = ('user', 'created_at', 'expires_at')
+    readonly_fields = ('digest',)
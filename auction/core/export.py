@@ -0,0 +1,190 @@
+"""
+Streaming export of marketplace data as CSV or JSONL.
+
+Rows are read with ``QuerySet.iterator()``, which uses server-side cursors
+on PostgreSQL, and formatted one by one, so memory use does not depend on
+the number of exported rows.
+"""
+import csv
+from datetime import datetime, time
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .constants import LotStatuses
+from .models import Bid, Lot, Pet, UserAccount
+
+FORMATS = ('csv', 'jsonl')
+CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+}
+
+
+def _status_name(value):
+    return LotStatuses(value).name.lower()
+
+
+class Export:
+    """
+    Describes exported columns as mapping of column names to lookups,
+    field used by date range filter and field used by status filter
+    """
+
+    def __init__(self, queryset, columns, date_field, status_field=None, formatters=None):
+        self.queryset = queryset
+        self.columns = columns
+        self.date_field = date_field
+        self.status_field = status_field
+        self.formatters = formatters or {}
+
+    def filter(self, date_from=None, date_to=None, status=None):
+        queryset = self.queryset
+        if date_from is not None:
+            queryset = queryset.filter(**{f'{self.date_field}__gte': date_from})
+        if date_to is not None:
+            queryset = queryset.filter(**{f'{self.date_field}__lt': date_to})
+        if status is not None:
+            if self.status_field is None:
+                raise ValueError('Status filter is not supported')
+            queryset = queryset.filter(**{self.status_field: status})
+        return queryset
+
+    def rows(self, queryset, chunk_size):
+        formatters = [
+            self.formatters.get(column) for column in self.columns
+        ]
+        queryset = queryset.order_by('pk').values_list(*self.columns.values())
+        for row in queryset.iterator(chunk_size=chunk_size):
+            yield [
+                formatter(value) if formatter and value is not None else value
+                for formatter, value in zip(formatters, row)
+            ]
+
+
+EXPORTS = {
+    'lots': Export(
+        Lot.objects.all(),
+        {
+            'id': 'id',
+            'pet': 'pet_id',
+            'pet_name': 'pet__name',
+            'breed': 'pet__breed',
+            'author': 'author__user__username',
+            'price': 'price',
+            'status': 'status',
+            'created_at': 'created_at',
+        },
+        date_field='created_at',
+        status_field='status',
+        formatters={'status': _status_name},
+    ),
+    'bids': Export(
+        Bid.objects.all(),
+        {
+            'id': 'id',
+            'lot': 'lot_id',
+            'author': 'author__user__username',
+            'price': 'price',
+            'lot_status': 'lot__status',
+            'created_at': 'created_at',
+        },
+        date_field='created_at',
+        status_field='lot__status',
+        formatters={'lot_status': _status_name},
+    ),
+    'pets': Export(
+        Pet.objects.all(),
+        {
+            'id': 'id',
+            'name': 'name',
+            'breed': 'breed',
+            'owner': 'owner__user__username',
+            'created_at': 'created_at',
+        },
+        date_field='created_at',
+    ),
+    'accounts': Export(
+        UserAccount.objects.all(),
+        {
+            'id': 'id',
+            'username': 'user__username',
+            'balance': 'balance',
+            'reserved_amount': 'reserved_amount',
+            'date_joined': 'user__date_joined',
+        },
+        date_field='user__date_joined',
+    ),
+}
+
+
+class _Echo:
+    """
+    File-like object which returns written value, so csv.writer formats a row
+    without buffering it
+    """
+
+    def write(self, value):
+        return value
+
+
+def export_lines(name, file_format, chunk_size=2000, **filters):
+    """
+    Returns iterator over lines of exported rows, CSV starts with a header.
+    Filters are checked before the iterator is returned
+    """
+    export = EXPORTS[name]
+    rows = export.rows(export.filter(**filters), chunk_size)
+    if file_format == 'csv':
+        return _csv_lines(export.columns, rows)
+    return _jsonl_lines(export.columns, rows)
+
+
+def _csv_lines(columns, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def _jsonl_lines(columns, rows):
+    encoder = DjangoJSONEncoder()
+    columns = list(columns)
+    for row in rows:
+        yield encoder.encode(dict(zip(columns, row))) + '\n'
+
+
+def parse_filters(date_from=None, date_to=None, status=None):
+    """
+    Converts filter values given as strings, dates are ISO dates or datetimes.
+    Raises ValueError on invalid values
+    """
+    return {
+        'date_from': _parse_moment(date_from),
+        'date_to': _parse_moment(date_to),
+        'status': _parse_status(status),
+    }
+
+
+def _parse_moment(value):
+    if not value:
+        return None
+    moment = parse_datetime(value)
+    if moment is None:
+        date = parse_date(value)
+        if date is None:
+            raise ValueError(f'Invalid date "{value}"')
+        moment = datetime.combine(date, time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def _parse_status(value):
+    if not value:
+        return None
+    try:
+        return LotStatuses[value.upper()]
+    except KeyError:
+        raise ValueError(f'Invalid status "{value}"')
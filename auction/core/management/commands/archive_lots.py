@@ -0,0 +1,66 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from auction.core.constants import LotStatuses
+from auction.core.models import ArchivedLot, Lot
+
+
+class Command(BaseCommand):
+    help = (
+        'Moves lots closed before the threshold with their bids to archive tables. '
+        'Every chunk is moved in its own transaction, so the command can be stopped '
+        'and run again at any time'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than', type=int, default=settings.ARCHIVE_LOTS_AFTER_DAYS,
+            help='Archives lots closed this number of days ago or earlier'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=500,
+            help='Number of lots moved in one transaction'
+        )
+        parser.add_argument(
+            '--limit', type=int, default=None,
+            help='Maximum number of lots archived by this run'
+        )
+
+    def handle(self, *args, older_than, chunk_size, limit, **options):
+        if older_than < 0 or chunk_size < 1:
+            raise CommandError('Threshold can\'t be negative and chunk size must be positive')
+        threshold = timezone.now() - timedelta(days=older_than)
+
+        started = time.perf_counter()
+        archived_lots = archived_bids = 0
+        last_pk = 0
+        while limit is None or archived_lots < limit:
+            size = chunk_size if limit is None else min(chunk_size, limit - archived_lots)
+            with transaction.atomic():
+                # lots locked by other transactions are left for the next run
+                lot_ids = list(
+                    # lots closed before closed_at was recorded fall back to created_at
+                    Lot.objects.select_for_update(skip_locked=True).filter(
+                        Q(closed_at__lt=threshold)
+                        | Q(closed_at__isnull=True, created_at__lt=threshold),
+                        pk__gt=last_pk,
+                        status=LotStatuses.CLOSED,
+                    ).order_by('pk').values_list('pk', flat=True)[:size]
+                )
+                if not lot_ids:
+                    break
+                last_pk = lot_ids[-1]
+                lots_count, bids_count = ArchivedLot.archive(lot_ids)
+            archived_lots += lots_count
+            archived_bids += bids_count
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Archived {archived_lots} lots and {archived_bids} bids in {elapsed:.1f}s'
+        ))
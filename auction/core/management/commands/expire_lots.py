@@ -0,0 +1,110 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from auction.api.cache import lot_list_cache
+from auction.api.events import BID_ACCEPTED, LOT_CLOSED, lot_events
+from auction.api.serializers import BidShortDisplaySerializer
+from auction.core import stats
+from auction.core.models import BID_LADDER_ORDERING, Bid, Lot, UserAccount
+
+
+class TransferFailed(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Closes open lots whose ends_at has passed in batches and releases reserved funds. '
+        'With --settle the highest bid of every lot is accepted'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Number of lots closed in one transaction'
+        )
+        parser.add_argument(
+            '--settle', action='store_true',
+            help='Accepts the highest bid of every closed lot'
+        )
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Keeps checking for expired lots until interrupted'
+        )
+        parser.add_argument(
+            '--interval', type=float, default=5.0,
+            help='Pause between checks in loop mode, seconds'
+        )
+
+    def handle(self, *args, batch_size, settle, loop, interval, **options):
+        if batch_size < 1:
+            raise CommandError('Batch size must be positive')
+
+        self.closed = self.settled = 0
+        started = time.perf_counter()
+        try:
+            while True:
+                closed = self.sweep(batch_size, settle)
+                # a full batch means more lots may be expired already
+                if closed < batch_size:
+                    if not loop:
+                        break
+                    time.sleep(interval)
+        except KeyboardInterrupt:
+            pass
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Closed {self.closed} lots, settled {self.settled} in {elapsed:.1f}s '
+            f'({self.closed / elapsed:.0f} lots/s)'
+        ))
+
+    def sweep(self, batch_size, settle):
+        with transaction.atomic():
+            versions = Lot.close_expired(batch_size)
+            if not versions:
+                return 0
+            lot_ids = list(versions)
+            accepted = self.settle(lot_ids) if settle else []
+            transaction.on_commit(lot_list_cache.bump_version)
+            for bid in accepted:
+                lot_events.publish(
+                    bid.lot_id, versions[bid.lot_id], BID_ACCEPTED,
+                    BidShortDisplaySerializer(bid).data,
+                )
+            for lot_id, version in versions.items():
+                lot_events.publish(lot_id, version, LOT_CLOSED, {'id': lot_id})
+            stats.lots_closed(lot_ids, sales=[(bid.lot.pet.breed, bid.price) for bid in accepted])
+        self.closed += len(lot_ids)
+        self.settled += len(accepted)
+        return len(lot_ids)
+
+    def settle(self, lot_ids):
+        """
+        Accepts the highest bid of every lot, the bidder becomes owner of the pet
+        and pays the price to the author. Returns accepted bids
+        """
+        # the highest bid of every lot is read with one DISTINCT ON query
+        bids = Bid.objects.filter(lot_id__in=lot_ids).select_related(
+            'author__user', 'lot__author', 'lot__pet'
+        ).order_by('lot_id', *BID_LADDER_ORDERING).distinct('lot_id')
+
+        accepted = []
+        for bid in bids:
+            try:
+                with transaction.atomic():
+                    Lot.objects.filter(pk=bid.lot_id).update(sold_price=bid.price)
+                    if not UserAccount.transfer(bid.author, bid.lot.author, bid.price):
+                        raise TransferFailed()
+                    # accounts are locked by the transfer in order of their keys
+                    bid.lot.pet.set_owner(bid.author)
+            except TransferFailed:
+                self.stderr.write(
+                    f'Lot {bid.lot_id}: {bid.author} has not enough balance, '
+                    f'the lot is closed without a sale'
+                )
+                continue
+            accepted.append(bid)
+        return accepted
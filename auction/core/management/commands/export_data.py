@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from auction.core.export import EXPORTS, FORMATS, export_lines, parse_filters
+
+
+class Command(BaseCommand):
+    help = 'Exports lots, bids, pets or accounts as CSV or JSONL'
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', choices=list(EXPORTS))
+        parser.add_argument('--format', dest='file_format', choices=FORMATS, default='csv')
+        parser.add_argument(
+            '--from', dest='date_from',
+            help='Exports rows created at or after the date, ISO date or datetime'
+        )
+        parser.add_argument(
+            '--to', dest='date_to',
+            help='Exports rows created before the date, ISO date or datetime'
+        )
+        parser.add_argument(
+            '--status', choices=('open', 'closed'),
+            help='Status of lots, for bids status of their lots'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=2000,
+            help='Number of rows fetched from the database at once'
+        )
+        parser.add_argument('--output', help='File to write, stdout by default')
+
+    def handle(self, *args, name, file_format, chunk_size, output, **options):
+        try:
+            filters = parse_filters(options['date_from'], options['date_to'], options['status'])
+            lines = export_lines(name, file_format, chunk_size=chunk_size, **filters)
+        except ValueError as error:
+            raise CommandError(str(error))
+
+        if output is None:
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+
+        count = 0
+        with open(output, 'w', newline='') as file:
+            for line in lines:
+                file.write(line)
+                count += 1
+        if file_format == 'csv':
+            count -= 1
+        self.stdout.write(self.style.SUCCESS(f'Exported {count} rows to {output}'))
@@ -0,0 +1,163 @@
+import csv
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, transaction
+
+from auction.core.models import UserAccount
+
+FORMATS = ('csv', 'jsonl')
+
+
+def read_records(file, file_format):
+    """
+    Yields (line number, record) pairs, CSV files start with a header
+    """
+    if file_format == 'csv':
+        reader = csv.DictReader(file)
+        for record in reader:
+            yield reader.line_num, record
+        return
+    for line_num, line in enumerate(file, start=1):
+        if line.strip():
+            try:
+                yield line_num, json.loads(line)
+            except ValueError:
+                yield line_num, None
+
+
+def clean_record(record, default_balance):
+    """
+    Returns (username, password, balance) of the record,
+    raises ValidationError on invalid values
+    """
+    if not isinstance(record, dict):
+        raise ValidationError('Invalid record')
+    username = str(record.get('username') or '').strip()
+    password = str(record.get('password') or '')
+    if not username or not password:
+        raise ValidationError('Username and password are required')
+    User._meta.get_field('username').run_validators(username)
+
+    balance = record.get('balance')
+    if balance in (None, ''):
+        return username, password, default_balance
+    try:
+        balance = Decimal(str(balance))
+    except InvalidOperation:
+        raise ValidationError(f'Invalid balance "{balance}"')
+    if balance < 0:
+        raise ValidationError('Balance can\'t be negative')
+    return username, password, balance
+
+
+class Command(BaseCommand):
+    help = (
+        'Creates users with accounts from CSV or JSONL file with username, password '
+        'and optional balance columns. Passwords are hashed in a pool of processes, '
+        'users are inserted in batches. Existing usernames are skipped'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument(
+            '--format', dest='file_format', choices=FORMATS,
+            help='Format of the file, detected by extension by default'
+        )
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count(),
+            help='Number of processes hashing passwords, 1 hashes in this process'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--balance', type=Decimal, default=None,
+            help='Balance of users without one in the file, DEFAULT_USER_BALANCE by default'
+        )
+
+    def handle(self, *args, path, file_format, workers, batch_size, balance, **options):
+        if file_format is None:
+            file_format = os.path.splitext(path)[1].lstrip('.').lower()
+            if file_format not in FORMATS:
+                raise CommandError('Unknown file format, use --format')
+        if workers < 1 or batch_size < 1:
+            raise CommandError('Workers and batch size must be positive')
+        self.default_balance = settings.DEFAULT_USER_BALANCE if balance is None else balance
+        self.created = self.skipped = self.invalid = 0
+
+        started = time.perf_counter()
+        with open(path, newline='') as file:
+            records = read_records(file, file_format)
+            if workers == 1:
+                self.provision(records, batch_size, map)
+            else:
+                # workers set up Django themselves when processes are spawned
+                with ProcessPoolExecutor(max_workers=workers, initializer=django.setup) as executor:
+                    def hash_passwords(function, passwords):
+                        chunksize = max(1, len(passwords) // (workers * 4))
+                        return executor.map(function, passwords, chunksize=chunksize)
+
+                    self.provision(records, batch_size, hash_passwords)
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {self.created} users, skipped {self.skipped} existing '
+            f'and {self.invalid} invalid records in {elapsed:.1f}s '
+            f'({self.created / elapsed:.0f} users/s)'
+        ))
+
+    def provision(self, records, batch_size, hash_passwords):
+        seen = set()
+        while True:
+            batch = list(islice(records, batch_size))
+            if not batch:
+                return
+
+            rows = {}
+            for line_num, record in batch:
+                try:
+                    username, password, balance = clean_record(record, self.default_balance)
+                except ValidationError as error:
+                    self.invalid += 1
+                    self.stderr.write(f'Line {line_num}: {"; ".join(error.messages)}')
+                    continue
+                if username in seen:
+                    self.skipped += 1
+                    continue
+                seen.add(username)
+                rows[username] = (password, balance)
+
+            existing = User.objects.filter(username__in=rows).values_list('username', flat=True)
+            for username in existing:
+                del rows[username]
+                self.skipped += 1
+            if not rows:
+                continue
+
+            usernames = list(rows)
+            passwords = hash_passwords(make_password, [rows[username][0] for username in usernames])
+            users = [
+                User(username=username, password=password, is_active=True)
+                for username, password in zip(usernames, passwords)
+            ]
+            try:
+                with transaction.atomic():
+                    User.objects.bulk_create(users)
+                    UserAccount.objects.bulk_create(
+                        UserAccount(user=user, balance=rows[user.username][1])
+                        for user in users
+                    )
+            except IntegrityError as error:
+                raise CommandError(
+                    f'Users were created concurrently, run the command again to resume: {error}'
+                )
+            self.created += len(users)
@@ -0,0 +1,82 @@
+import time
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from auction.core.constants import LotStatuses
+from auction.core.models import ArchivedBid, ArchivedLot, Bid, BreedStats, DailyStats, Lot
+from auction.core.stats import BREED_FIELDS, DAILY_FIELDS
+
+
+class Command(BaseCommand):
+    help = (
+        'Recomputes market statistics from lots and bids, archived ones included. '
+        'Rows are read in chunks, statistics are replaced in one transaction. '
+        'Changes made while the command reads rows may be missed, so it is better '
+        'run when the market is quiet'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=2000,
+            help='Number of rows fetched from the database at once'
+        )
+
+    def handle(self, *args, chunk_size, **options):
+        started = time.perf_counter()
+        self.breeds = defaultdict(lambda: dict.fromkeys(BREED_FIELDS, 0))
+        self.daily = defaultdict(lambda: dict.fromkeys(DAILY_FIELDS, 0))
+
+        lot_fields = ('pet__breed', 'price', 'sold_price', 'created_at', 'closed_at')
+        for row in Lot.objects.values_list('status', *lot_fields).iterator(chunk_size=chunk_size):
+            self.add_lot(*row)
+        for row in ArchivedLot.objects.values_list(*lot_fields).iterator(chunk_size=chunk_size):
+            self.add_lot(LotStatuses.CLOSED, *row)
+
+        bids = Bid.objects.values_list('lot__pet__breed', 'lot__status', 'created_at')
+        for breed, status, created_at in bids.iterator(chunk_size=chunk_size):
+            self.add_bid(breed, status, created_at)
+        bids = ArchivedBid.objects.values_list('lot__pet__breed', 'created_at')
+        for breed, created_at in bids.iterator(chunk_size=chunk_size):
+            self.add_bid(breed, LotStatuses.CLOSED, created_at)
+
+        with transaction.atomic():
+            BreedStats.objects.all().delete()
+            DailyStats.objects.all().delete()
+            BreedStats.objects.bulk_create(
+                BreedStats(breed=breed, **values) for breed, values in self.breeds.items()
+            )
+            DailyStats.objects.bulk_create(
+                (
+                    DailyStats(date=date, breed=breed, **values)
+                    for (date, breed), values in self.daily.items()
+                ),
+                batch_size=chunk_size,
+            )
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt statistics of {len(self.breeds)} breeds and '
+            f'{len(self.daily)} days in {elapsed:.1f}s'
+        ))
+
+    def add_lot(self, status, breed, price, sold_price, created_at, closed_at):
+        self.daily[timezone.localdate(created_at), breed]['lots_created'] += 1
+        breed_values = self.breeds[breed]
+        if status == LotStatuses.OPEN:
+            breed_values['open_lots'] += 1
+            breed_values['open_lots_price'] += price
+        elif sold_price is not None:
+            breed_values['sold_lots'] += 1
+            breed_values['sold_price'] += sold_price
+            if closed_at is not None:
+                daily_values = self.daily[timezone.localdate(closed_at), breed]
+                daily_values['sales'] += 1
+                daily_values['sales_amount'] += sold_price
+
+    def add_bid(self, breed, status, created_at):
+        self.daily[timezone.localdate(created_at), breed]['bids_placed'] += 1
+        if status == LotStatuses.OPEN:
+            self.breeds[breed]['open_bids'] += 1
@@ -0,0 +1,62 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Sum
+
+from auction.core.constants import LotStatuses
+from auction.core.models import Bid, UserAccount
+
+
+class Command(BaseCommand):
+    help = 'Checks reserved funds of user accounts against their open bids and repairs drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=1000,
+            help='Number of accounts checked in one transaction'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only report drift without repairing it'
+        )
+
+    def handle(self, *args, chunk_size, dry_run, **options):
+        checked = drifted = 0
+        last_pk = 0
+        while True:
+            with transaction.atomic():
+                # accounts are locked, so bids cannot be placed or withdrawn
+                # by them until the chunk is checked
+                accounts = list(
+                    UserAccount.objects.select_for_update().filter(
+                        pk__gt=last_pk
+                    ).order_by('pk').values_list('pk', 'reserved_amount')[:chunk_size]
+                )
+                if not accounts:
+                    break
+                last_pk = accounts[-1][0]
+                open_bids_sums = dict(
+                    Bid.objects.filter(
+                        author__in=[pk for pk, _ in accounts],
+                        lot__status=LotStatuses.OPEN,
+                    ).values('author').annotate(
+                        price_sum=Sum('price')
+                    ).values_list('author', 'price_sum')
+                )
+                for pk, reserved_amount in accounts:
+                    actual = open_bids_sums.get(pk, Decimal('0.00'))
+                    if reserved_amount == actual:
+                        continue
+                    drifted += 1
+                    self.stdout.write(
+                        f'Account {pk}: reserved {reserved_amount}, open bids {actual}'
+                    )
+                    if not dry_run:
+                        UserAccount.objects.filter(pk=pk).update(reserved_amount=actual)
+            checked += len(accounts)
+
+        action = 'found' if dry_run else 'repaired'
+        self.stdout.write(self.style.SUCCESS(
+            f'Checked {checked} accounts, {action} {drifted} with drift'
+        ))
@@ -0,0 +1,115 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from auction.api.workload import (
+    OPERATIONS, HttpTransport, InProcessTransport, Stats, Workload,
+)
+
+DEFAULT_MIX = (
+    'register=5,create_pet=10,create_lot=10,list_lots=40,'
+    'place_bid=25,delete_bid=4,accept=4,close=2'
+)
+
+
+def parse_mix(value):
+    mix = {}
+    for item in value.split(','):
+        operation, _, weight = item.partition('=')
+        operation = operation.strip()
+        if operation not in OPERATIONS:
+            raise CommandError(
+                f'Unknown operation "{operation}", choose from {", ".join(OPERATIONS)}'
+            )
+        try:
+            mix[operation] = float(weight)
+        except ValueError:
+            raise CommandError(f'Invalid weight of "{operation}": "{weight}"')
+    if not any(mix.values()):
+        raise CommandError('At least one operation must have positive weight')
+    return mix
+
+
+class Command(BaseCommand):
+    help = (
+        'Replays a mix of API operations with concurrent clients and reports '
+        'throughput and latency percentiles'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument(
+            '--mix', default=DEFAULT_MIX,
+            help='Comma separated operation=weight pairs'
+        )
+        parser.add_argument(
+            '--users', type=int, default=10,
+            help='Users registered before the run'
+        )
+        parser.add_argument(
+            '--target',
+            help='Base URL of a running server, e.g. http://localhost:8000. '
+                 'By default requests are handled in-process'
+        )
+        parser.add_argument(
+            '--force-auth', action='store_true',
+            help='Skips password hashing of basic authentication, only for in-process requests'
+        )
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument('--json', dest='json_path', help='Writes report to the file')
+
+    def handle(self, *args, **options):
+        mix = parse_mix(options['mix'])
+        target = options['target']
+        if target and options['force_auth']:
+            raise CommandError('--force-auth cannot be used with --target')
+        if target:
+            workload = Workload(lambda: HttpTransport(target), mix, seed=options['seed'])
+        else:
+            workload = Workload(
+                lambda: InProcessTransport(force_auth=options['force_auth']),
+                mix, seed=options['seed'],
+            )
+
+        concurrency = options['concurrency']
+        workload.run(['register'] * options['users'], concurrency)
+        if not workload.users:
+            raise CommandError('Could not register users for the workload')
+        # registration of initial users is not a part of the report
+        workload.stats = Stats()
+
+        operations = [workload.choose_operation() for _ in range(options['requests'])]
+        elapsed = workload.run(operations, concurrency)
+        summary = workload.stats.summary(elapsed)
+
+        self.write_report(summary)
+        if options['json_path']:
+            with open(options['json_path'], 'w') as file:
+                json.dump(summary, file, indent=2)
+
+    def write_report(self, summary):
+        self.stdout.write(
+            f'{summary["requests"]} requests in {summary["elapsed_s"]:.1f}s, '
+            f'{summary["throughput"]:.1f} req/s'
+        )
+        header = (
+            f'{"operation":<12} {"count":>6} {"req/s":>8} {"p50 ms":>8} '
+            f'{"p95 ms":>8} {"p99 ms":>8} {"locks":>6} {"skipped":>8}  responses'
+        )
+        self.stdout.write(header)
+        for operation, stats in summary['operations'].items():
+            responses = ', '.join(
+                f'{code}: {count}'
+                for code, count in {**stats['status_codes'], **stats['errors']}.items()
+            )
+            self.stdout.write(
+                f'{operation:<12} {stats["count"]:>6} {stats["throughput"]:>8.1f} '
+                f'{_format_ms(stats["p50_ms"])} {_format_ms(stats["p95_ms"])} '
+                f'{_format_ms(stats["p99_ms"])} {stats["lock_failures"]:>6} '
+                f'{stats["skipped"]:>8}  {responses}'
+            )
+
+
+def _format_ms(value):
+    return f'{"-":>8}' if value is None else f'{value:>8.1f}'
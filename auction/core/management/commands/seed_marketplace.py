@@ -0,0 +1,181 @@
+import random
+import time
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from auction.core.constants import Breeds, LotStatuses
+from auction.core.models import Bid, Lot, Pet, UserAccount
+
+PET_NAMES = (
+    'Bella', 'Charlie', 'Luna', 'Lucy', 'Max', 'Bailey', 'Daisy', 'Sadie',
+    'Molly', 'Buddy', 'Lola', 'Stella', 'Tucker', 'Bear', 'Zoey', 'Duke',
+    'Harley', 'Maggie', 'Jax', 'Sonic', 'Prickles', 'Spike', 'Mr. Pokey', 'Quill',
+)
+BID_DISTRIBUTIONS = ('uniform', 'exponential')
+
+
+class Command(BaseCommand):
+    help = 'Generates users, pets, lots and bids with bulk inserts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--pets-per-user', type=int, default=2)
+        parser.add_argument(
+            '--lot-ratio', type=float, default=0.5,
+            help='Share of pets put up for sale'
+        )
+        parser.add_argument(
+            '--open-ratio', type=float, default=0.8,
+            help='Share of lots which are still open'
+        )
+        parser.add_argument(
+            '--bids-per-lot', type=float, default=5,
+            help='Average number of bids in a lot'
+        )
+        parser.add_argument(
+            '--bid-distribution', choices=BID_DISTRIBUTIONS, default='exponential',
+            help='Distribution of number of bids per lot, exponential gives a few popular lots'
+        )
+        parser.add_argument('--balance', type=Decimal, default=Decimal('1000.00'))
+        parser.add_argument('--password', default='password')
+        parser.add_argument('--username-prefix', default='user')
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        if options['users'] < 2:
+            raise CommandError('At least two users are required to place bids')
+
+        started = time.perf_counter()
+        with transaction.atomic():
+            accounts = self.create_accounts()
+            pets = self.create_pets(accounts)
+            lots = self.create_lots(pets)
+            bids_count, reserved = self.create_bids(accounts, lots)
+            self.update_bid_summaries(lots)
+            self.update_reserved_amounts(accounts, reserved)
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {len(accounts)} users, {len(pets)} pets, {len(lots)} lots '
+            f'and {bids_count} bids in {elapsed:.1f}s'
+        ))
+        # bulk inserts bypass counters of market statistics
+        call_command('rebuild_market_stats', chunk_size=self.batch_size, stdout=self.stdout)
+
+    def create_accounts(self):
+        username_prefix = self.options['username_prefix']
+        usernames = [
+            f'{username_prefix}{index}' for index in range(self.options['users'])
+        ]
+        if User.objects.filter(username__in=usernames[:1] + usernames[-1:]).exists():
+            raise CommandError(
+                f'Users with prefix "{username_prefix}" already exist, use --username-prefix'
+            )
+
+        # hashing is slow, so all users share one precomputed hash
+        password = make_password(self.options['password'])
+        users = User.objects.bulk_create(
+            (
+                User(username=username, password=password, is_active=True)
+                for username in usernames
+            ),
+            batch_size=self.batch_size,
+        )
+        return UserAccount.objects.bulk_create(
+            (UserAccount(user=user, balance=self.options['balance']) for user in users),
+            batch_size=self.batch_size,
+        )
+
+    def create_pets(self, accounts):
+        breeds = Breeds.values
+        return Pet.objects.bulk_create(
+            (
+                Pet(
+                    owner=account,
+                    breed=self.random.choice(breeds),
+                    name=self.random.choice(PET_NAMES),
+                )
+                for account in accounts
+                for _ in range(self.options['pets_per_user'])
+            ),
+            batch_size=self.batch_size,
+        )
+
+    def create_lots(self, pets):
+        lot_ratio = self.options['lot_ratio']
+        open_ratio = self.options['open_ratio']
+        return Lot.objects.bulk_create(
+            (
+                Lot(
+                    pet=pet,
+                    author_id=pet.owner_id,
+                    price=self.random_price(),
+                    status=(
+                        LotStatuses.OPEN if self.random.random() < open_ratio
+                        else LotStatuses.CLOSED
+                    ),
+                )
+                for pet in pets
+                if self.random.random() < lot_ratio
+            ),
+            batch_size=self.batch_size,
+        )
+
+    def create_bids(self, accounts, lots):
+        account_pks = [account.pk for account in accounts]
+        balance = self.options['balance']
+        reserved = dict.fromkeys(account_pks, Decimal('0.00'))
+        created = 0
+        batch = []
+        for lot in lots:
+            bids_count = min(self.bids_count(), len(account_pks) - 1)
+            bidders = [
+                bidder for bidder in self.random.sample(account_pks, bids_count + 1)
+                if bidder != lot.author_id
+            ][:bids_count]
+            for bidder in bidders:
+                price = self.random_price()
+                if lot.status == LotStatuses.OPEN:
+                    # bidders never reserve more than they have
+                    if reserved[bidder] + price > balance:
+                        continue
+                    reserved[bidder] += price
+                batch.append(Bid(lot=lot, author_id=bidder, price=price))
+            if len(batch) >= self.batch_size:
+                created += len(Bid.objects.bulk_create(batch))
+                batch = []
+        created += len(Bid.objects.bulk_create(batch))
+        return created, reserved
+
+    def update_bid_summaries(self, lots):
+        for start in range(0, len(lots), self.batch_size):
+            Lot.objects.filter(
+                pk__in=[lot.pk for lot in lots[start:start + self.batch_size]]
+            ).update(**Lot.bid_summary())
+
+    def update_reserved_amounts(self, accounts, reserved):
+        for account in accounts:
+            account.reserved_amount = reserved[account.pk]
+        UserAccount.objects.bulk_update(
+            [account for account in accounts if account.reserved_amount],
+            ['reserved_amount'],
+            batch_size=self.batch_size,
+        )
+
+    def bids_count(self):
+        average = self.options['bids_per_lot']
+        if self.options['bid_distribution'] == 'uniform':
+            return self.random.randint(0, round(2 * average))
+        return round(self.random.expovariate(1 / average)) if average else 0
+
+    def random_price(self):
+        return Decimal(self.random.randint(100, 10000)) / 100
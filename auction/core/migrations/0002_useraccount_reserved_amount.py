@@ -0,0 +1,32 @@
+# Generated by Django 4.1 on 2026-10-18 08:13
+
+from decimal import Decimal
+from django.db import migrations, models
+
+
+def fill_reserved_amount(apps, schema_editor):
+    UserAccount = apps.get_model('core', 'UserAccount')
+    Bid = apps.get_model('core', 'Bid')
+    open_bids_sums = Bid.objects.filter(
+        lot__status=0
+    ).values('author').annotate(price_sum=models.Sum('price'))
+    for row in open_bids_sums.iterator():
+        UserAccount.objects.filter(pk=row['author']).update(
+            reserved_amount=row['price_sum']
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='useraccount',
+            name='reserved_amount',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=10),
+        ),
+        migrations.RunPython(fill_reserved_amount, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 4.1 on 2026-10-18 08:15
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def remove_duplicates(apps, schema_editor):
+    """
+    Closes all but the newest open lot of every pet and deletes all but the
+    highest bid of every user in a lot, so the constraints can be added.
+    Reserved amounts of affected users are recomputed
+    """
+    Lot = apps.get_model('core', 'Lot')
+    Bid = apps.get_model('core', 'Bid')
+    UserAccount = apps.get_model('core', 'UserAccount')
+
+    newer_lots = Lot.objects.filter(pet=OuterRef('pet'), status=0).filter(
+        Q(created_at__gt=OuterRef('created_at'))
+        | Q(created_at=OuterRef('created_at'), id__gt=OuterRef('id'))
+    )
+    stale_lots = Lot.objects.filter(Exists(newer_lots), status=0)
+    higher_bids = Bid.objects.filter(lot=OuterRef('lot'), author=OuterRef('author')).filter(
+        Q(price__gt=OuterRef('price'))
+        | Q(price=OuterRef('price'), created_at__lt=OuterRef('created_at'))
+        | Q(price=OuterRef('price'), created_at=OuterRef('created_at'), id__lt=OuterRef('id'))
+    )
+    duplicate_bids = Bid.objects.filter(Exists(higher_bids))
+
+    affected = set(Bid.objects.filter(
+        Q(lot__in=stale_lots) | Q(pk__in=duplicate_bids.values('pk'))
+    ).values_list('author', flat=True))
+    Lot.objects.filter(pk__in=list(stale_lots.values_list('pk', flat=True))).update(status=1)
+    Bid.objects.filter(pk__in=list(duplicate_bids.values_list('pk', flat=True))).delete()
+    if affected:
+        reserved = Bid.objects.filter(author=OuterRef('pk'), lot__status=0).values(
+            'author'
+        ).annotate(price_sum=Sum('price')).values('price_sum')
+        UserAccount.objects.filter(pk__in=affected).update(reserved_amount=Coalesce(
+            Subquery(reserved),
+            Value(Decimal('0.00'), output_field=models.DecimalField()),
+        ))
+    # tables with pending deferred foreign key checks cannot be altered
+    schema_editor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='lot',
+            name='lot_status_created_idx',
+        ),
+        migrations.AddIndex(
+            model_name='lot',
+            index=models.Index(condition=models.Q(('status', 0)), fields=['created_at', 'id'], name='lot_open_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lot',
+            index=models.Index(condition=models.Q(('status', 0)), fields=['id'], name='lot_open_idx'),
+        ),
+        migrations.RunPython(remove_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='bid',
+            constraint=models.UniqueConstraint(fields=('lot', 'author'), name='bid_lot_author_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='lot',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 0)), fields=('pet',), name='lot_open_pet_uniq'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.1 on 2026-10-18 08:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_bid_lot_constraints'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bid',
+            index=models.Index(fields=['lot', '-price', 'created_at', 'id'], include=('author',), name='bid_lot_price_idx'),
+        ),
+    ]
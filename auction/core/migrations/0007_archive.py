@@ -0,0 +1,43 @@
+# Generated by Django 4.1 on 2026-10-18 09:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_authtoken'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedLot',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('created_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='archived_lots', to='core.useraccount')),
+                ('pet', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='archived_lots', to='core.pet')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedBid',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('created_at', models.DateTimeField()),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='archived_bids', to='core.useraccount')),
+                ('lot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bids', to='core.archivedlot')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='archivedlot',
+            index=models.Index(fields=['created_at', 'id'], name='archived_lot_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedbid',
+            index=models.Index(fields=['lot', 'created_at', 'id'], name='archived_bid_lot_created_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.1 on 2026-10-18 09:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lot',
+            name='ends_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='lot',
+            index=models.Index(condition=models.Q(('ends_at__isnull', False), ('status', 0)), fields=['ends_at', 'id'], name='lot_open_ends_at_idx'),
+        ),
+    ]
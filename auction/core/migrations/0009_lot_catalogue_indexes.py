@@ -0,0 +1,25 @@
+# Generated by Django 4.1 on 2026-10-18 09:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_lot_ends_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='lot',
+            index=models.Index(condition=models.Q(('status', 0)), fields=['price', 'id'], name='lot_open_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lot',
+            index=models.Index(condition=models.Q(('status', 0)), fields=['author', 'created_at', 'id'], name='lot_open_author_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pet',
+            index=models.Index(fields=['breed', 'id'], name='pet_breed_idx'),
+        ),
+    ]
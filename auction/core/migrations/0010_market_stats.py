@@ -0,0 +1,62 @@
+# Generated by Django 4.1 on 2026-10-18 09:58
+
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_lot_catalogue_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BreedStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('breed', models.CharField(choices=[('cat', 'Cat'), ('hedgehog', 'Hedgehog')], max_length=50, unique=True)),
+                ('open_lots', models.IntegerField(default=0)),
+                ('open_lots_price', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=16)),
+                ('open_bids', models.IntegerField(default=0)),
+                ('sold_lots', models.IntegerField(default=0)),
+                ('sold_price', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=16)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('breed', models.CharField(choices=[('cat', 'Cat'), ('hedgehog', 'Hedgehog')], max_length=50)),
+                ('lots_created', models.IntegerField(default=0)),
+                ('bids_placed', models.IntegerField(default=0)),
+                ('sales', models.IntegerField(default=0)),
+                ('sales_amount', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=16)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='archivedlot',
+            name='closed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='archivedlot',
+            name='sold_price',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='lot',
+            name='closed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='lot',
+            name='sold_price',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='dailystats',
+            constraint=models.UniqueConstraint(fields=('date', 'breed'), name='daily_stats_date_breed_uniq'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 4.1 on 2026-10-18 10:03
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+
+
+def fill_bid_summary(apps, schema_editor):
+    Bid = apps.get_model('core', 'Bid')
+    Lot = apps.get_model('core', 'Lot')
+    bids = Bid.objects.filter(lot=OuterRef('pk'))
+    highest = bids.order_by('-price', 'created_at', 'id')
+    Lot.objects.update(
+        bid_count=Coalesce(Subquery(
+            bids.order_by().values('lot').annotate(count=Count('id')).values('count')
+        ), 0),
+        highest_bid_price=Subquery(highest.values('price')[:1]),
+        highest_bidder=Subquery(highest.values('author')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_market_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lot',
+            name='bid_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='lot',
+            name='highest_bid_price',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='lot',
+            name='highest_bidder',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='core.useraccount'),
+        ),
+        migrations.RunPython(fill_bid_summary, migrations.RunPython.noop),
+    ]
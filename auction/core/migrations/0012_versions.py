@@ -0,0 +1,23 @@
+# Generated by Django 4.1 on 2026-10-18 10:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_lot_bid_summary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lot',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='useraccount',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
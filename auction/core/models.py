@@ -1,10 +1,19 @@
+import secrets
+from datetime import timedelta
 from decimal import Decimal
+from hashlib import sha256
 
-from django.db import models
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import Case, Count, F, OuterRef, Q, Subquery, Sum, Value, When
 from django.db.models.functions import Coalesce
+from django.utils import timezone
 
 from .constants import Breeds, LotStatuses
 
+# highest price first, earlier bid wins a tie
+BID_LADDER_ORDERING = ('-price', 'created_at', 'id')
+
 
 class UserAccount(models.Model):
     """
@@ -17,26 +26,112 @@ class UserAccount(models.Model):
     balance = models.DecimalField(
         max_digits=10, decimal_places=2
     )
+    # sum of prices of user's bids in open lots, kept in sync by
+    # bid create/delete and lot close
+    reserved_amount = models.DecimalField(
+        max_digits=10, decimal_places=2, default=Decimal('0.00')
+    )
+    # incremented on every change of user's pets, ETag of the pets listing
+    version = models.PositiveIntegerField(default=1)
 
     def __str__(self):
         return self.user.username
 
+    def get_version(self):
+        """
+        Reads version from the database, instances of authenticated users
+        may be cached
+        """
+        return UserAccount.objects.values_list('version', flat=True).get(pk=self.pk)
+
+    async def aget_version(self):
+        return await UserAccount.objects.values_list('version', flat=True).aget(pk=self.pk)
+
+    @classmethod
+    def bump_versions(cls, account_ids):
+        cls.objects.filter(pk__in=account_ids).update(version=F('version') + 1)
+
     @property
     def available_balance(self):
-        open_bids_sum = self.bids.filter(
-            lot__status=LotStatuses.OPEN
-        ).aggregate(
-            price_sum=Coalesce(models.Sum('price'), Decimal('0.00'))
-        )['price_sum']
-        return self.balance - open_bids_sum
+        return self.balance - self.reserved_amount
+
+    def reserve_funds(self, amount):
+        """
+        Reserves amount for an open bid if user has enough available balance.
+        Returns False otherwise
+        """
+        updated = UserAccount.objects.filter(
+            pk=self.pk,
+            balance__gte=F('reserved_amount') + amount,
+        ).update(reserved_amount=F('reserved_amount') + amount)
+        return bool(updated)
+
+    def release_funds(self, amount):
+        UserAccount.objects.filter(pk=self.pk).update(
+            reserved_amount=F('reserved_amount') - amount
+        )
+
+    @classmethod
+    def release_funds_for_lots(cls, lot_ids):
+        """
+        Releases funds reserved by all bids placed in given lots.
+        Accounts are locked in primary key order before the UPDATE, which
+        locks rows in any order, so it cannot deadlock with transfers
+        """
+        bids = Bid.objects.filter(lot_id__in=lot_ids)
+        account_ids = list(cls.objects.select_for_update().filter(
+            pk__in=bids.values('author')
+        ).order_by('pk').values_list('pk', flat=True))
+        if not account_ids:
+            return
+        bids_sum = bids.filter(
+            author=OuterRef('pk')
+        ).values('author').annotate(price_sum=Sum('price')).values('price_sum')
+        cls.objects.filter(pk__in=account_ids).update(
+            reserved_amount=F('reserved_amount') - Subquery(
+                bids_sum, output_field=models.DecimalField()
+            )
+        )
 
     def increase_balance(self, amount):
-        self.balance += amount
-        self.save()
+        """
+        Balance is changed with a single UPDATE statement,
+        so the instance is not refreshed
+        """
+        UserAccount.objects.filter(pk=self.pk).update(
+            balance=F('balance') + amount
+        )
 
     def decrease_balance(self, amount):
-        self.balance -= amount
-        self.save()
+        """
+        Decreases balance if it is not less than amount.
+        Returns False otherwise
+        """
+        updated = UserAccount.objects.filter(
+            pk=self.pk, balance__gte=amount
+        ).update(balance=F('balance') - amount)
+        return bool(updated)
+
+    @classmethod
+    def transfer(cls, payer, payee, amount):
+        """
+        Moves amount from payer to payee balance.
+        Accounts are updated in primary key order, so concurrent transfers
+        between the same accounts cannot deadlock.
+        Returns False if payer has not enough balance, nothing is changed then
+        """
+        with transaction.atomic():
+            if payer.pk < payee.pk:
+                if not payer.decrease_balance(amount):
+                    return False
+                payee.increase_balance(amount)
+            else:
+                payee.increase_balance(amount)
+                if not payer.decrease_balance(amount):
+                    # payee is credited already
+                    transaction.set_rollback(True)
+                    return False
+        return True
 
 
 class Pet(models.Model):
@@ -47,13 +142,29 @@ class Pet(models.Model):
         to=UserAccount, on_delete=models.CASCADE, related_name='pets'
     )
     name = models.CharField(max_length=255)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['owner', 'created_at', 'id'], name='pet_owner_created_idx'
+            ),
+            # lot catalogue filtered by breed
+            models.Index(fields=['breed', 'id'], name='pet_breed_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
     def set_owner(self, new_owner):
+        """
+        Gives the pet to new owner. Versions of both accounts are bumped,
+        so they should be locked in advance to avoid deadlocks
+        """
+        old_owner_id = self.owner_id
         self.owner = new_owner
-        self.save()
+        self.save(update_fields=['owner'])
+        UserAccount.bump_versions([old_owner_id, new_owner.pk])
 
 
 class Lot(models.Model):
@@ -69,15 +180,185 @@ class Lot(models.Model):
     status = models.PositiveSmallIntegerField(
         choices=LotStatuses.choices
     )
-    created_at = models.DateTimeField(auto_now=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # open lot is closed by expire_lots command after this moment
+    ends_at = models.DateTimeField(null=True, blank=True)
+    closed_at = models.DateTimeField(null=True, blank=True)
+    # price of the accepted bid
+    sold_price = models.DecimalField(
+        max_digits=10, decimal_places=2, null=True, blank=True
+    )
+    # summary of bids kept in sync by bid create and delete,
+    # so listings do not aggregate bids
+    bid_count = models.IntegerField(default=0)
+    highest_bid_price = models.DecimalField(
+        max_digits=10, decimal_places=2, null=True, blank=True
+    )
+    highest_bidder = models.ForeignKey(
+        to=UserAccount, on_delete=models.PROTECT, null=True, blank=True, related_name='+'
+    )
+    # incremented on every change of the lot or its bids, ETag of the bid listings
+    version = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['pet'],
+                condition=models.Q(status=LotStatuses.OPEN),
+                name='lot_open_pet_uniq',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['created_at', 'id'],
+                condition=models.Q(status=LotStatuses.OPEN),
+                name='lot_open_created_idx',
+            ),
+            models.Index(
+                fields=['id'],
+                condition=models.Q(status=LotStatuses.OPEN),
+                name='lot_open_idx',
+            ),
+            # lot catalogue ordered or filtered by price
+            models.Index(
+                fields=['price', 'id'],
+                condition=models.Q(status=LotStatuses.OPEN),
+                name='lot_open_price_idx',
+            ),
+            # lot catalogue filtered by author
+            models.Index(
+                fields=['author', 'created_at', 'id'],
+                condition=models.Q(status=LotStatuses.OPEN),
+                name='lot_open_author_created_idx',
+            ),
+            # expired lots are found without scanning closed ones
+            models.Index(
+                fields=['ends_at', 'id'],
+                condition=models.Q(status=LotStatuses.OPEN, ends_at__isnull=False),
+                name='lot_open_ends_at_idx',
+            ),
+        ]
 
     @property
     def is_closed(self):
         return self.status == LotStatuses.CLOSED
 
-    def close(self):
+    @property
+    def has_ended(self):
+        return self.ends_at is not None and self.ends_at <= timezone.now()
+
+    def close(self, sold_price=None):
+        """
+        Closes the lot and releases funds reserved by its bids,
+        sold_price is the price of the accepted bid.
+        Returns False if lot was already closed
+        """
+        closed_at = timezone.now()
+        with transaction.atomic():
+            updated = Lot.objects.filter(
+                pk=self.pk, status=LotStatuses.OPEN
+            ).update(
+                status=LotStatuses.CLOSED, closed_at=closed_at, sold_price=sold_price,
+                version=F('version') + 1,
+            )
+            if updated:
+                UserAccount.release_funds_for_lots([self.pk])
+                # the row is locked by the update, so the version is exact
+                self.version = Lot.objects.values_list('version', flat=True).get(pk=self.pk)
+        if updated:
+            self.closed_at = closed_at
+            self.sold_price = sold_price
         self.status = LotStatuses.CLOSED
-        self.save()
+        return bool(updated)
+
+    @staticmethod
+    def add_bids(bids):
+        """
+        Adds new bids to summaries of their locked lots with one UPDATE,
+        one bid per lot. Lot instances of bids are updated as well
+        """
+        if not bids:
+            return
+        raises = [
+            (
+                Q(pk=bid.lot_id)
+                & (Q(highest_bid_price__isnull=True) | Q(highest_bid_price__lt=bid.price)),
+                bid,
+            )
+            for bid in bids
+        ]
+        Lot.objects.filter(pk__in=[bid.lot_id for bid in bids]).update(
+            bid_count=F('bid_count') + 1,
+            version=F('version') + 1,
+            highest_bid_price=Case(
+                *[When(condition, then=Value(bid.price)) for condition, bid in raises],
+                default=F('highest_bid_price'),
+            ),
+            highest_bidder=Case(
+                *[When(condition, then=Value(bid.author_id)) for condition, bid in raises],
+                default=F('highest_bidder'),
+                output_field=models.BigIntegerField(),
+            ),
+        )
+        for bid in bids:
+            lot = bid.lot
+            lot.bid_count += 1
+            lot.version += 1
+            if lot.highest_bid_price is None or lot.highest_bid_price < bid.price:
+                lot.highest_bid_price = bid.price
+                lot.highest_bidder = bid.author
+
+    def remove_bid(self, bid):
+        """
+        Removes deleted bid from summary of the locked lot,
+        the highest bid is recomputed only if the removed bid was the highest.
+        Version of the instance is updated as well
+        """
+        updates = {'bid_count': F('bid_count') - 1, 'version': F('version') + 1}
+        # one bid per user is allowed, so the bidder identifies the bid
+        if self.highest_bidder_id == bid.author_id:
+            updates.update(Lot.bid_summary(only_highest=True))
+        Lot.objects.filter(pk=self.pk).update(**updates)
+        self.version += 1
+
+    @staticmethod
+    def bid_summary(only_highest=False):
+        """
+        Expressions recomputing bid summary of lots from their bids
+        """
+        bids = Bid.objects.filter(lot=OuterRef('pk'))
+        highest = bids.order_by(*BID_LADDER_ORDERING)
+        summary = {
+            'highest_bid_price': Subquery(highest.values('price')[:1]),
+            'highest_bidder': Subquery(highest.values('author')[:1]),
+        }
+        if not only_highest:
+            summary['bid_count'] = Coalesce(Subquery(
+                bids.order_by().values('lot').annotate(count=Count('id')).values('count')
+            ), 0)
+        return summary
+
+    @classmethod
+    def close_expired(cls, limit, now=None):
+        """
+        Closes up to limit open lots which ended before now with one UPDATE
+        and releases funds reserved by their bids. Lots locked by other
+        transactions are skipped. Must be called in a transaction,
+        returns new versions of closed lots by their ids
+        """
+        now = now or timezone.now()
+        versions = {
+            pk: version + 1
+            for pk, version in cls.objects.select_for_update(skip_locked=True).filter(
+                status=LotStatuses.OPEN, ends_at__lte=now
+            ).order_by('ends_at', 'id').values_list('pk', 'version')[:limit]
+        }
+        if versions:
+            cls.objects.filter(pk__in=list(versions)).update(
+                status=LotStatuses.CLOSED, closed_at=timezone.now(), version=F('version') + 1
+            )
+            UserAccount.release_funds_for_lots(list(versions))
+        return versions
 
 
 class Bid(models.Model):
@@ -90,4 +371,185 @@ class Bid(models.Model):
     price = models.DecimalField(
         max_digits=10, decimal_places=2
     )
-    created_at = models.DateTimeField(auto_now=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['lot', 'author'], name='bid_lot_author_uniq'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['lot', 'created_at', 'id'], name='bid_lot_created_idx'
+            ),
+            # covers bid ladder of a lot, so top bids are read with index-only scan
+            models.Index(
+                fields=['lot', '-price', 'created_at', 'id'],
+                include=['author'],
+                name='bid_lot_price_idx',
+            ),
+            models.Index(
+                fields=['created_at', 'id'], name='bid_created_idx'
+            ),
+        ]
+
+
+class ArchivedLot(models.Model):
+    """
+    Closed lot moved out of the lot table, so queries of live auctions and
+    their indexes do not grow with history. Keeps primary key of the lot
+    """
+    id = models.BigIntegerField(primary_key=True)
+    pet = models.ForeignKey(
+        to=Pet, on_delete=models.PROTECT, related_name='archived_lots'
+    )
+    author = models.ForeignKey(
+        to=UserAccount, on_delete=models.PROTECT, related_name='archived_lots'
+    )
+    price = models.DecimalField(
+        max_digits=10, decimal_places=2
+    )
+    created_at = models.DateTimeField()
+    closed_at = models.DateTimeField(null=True, blank=True)
+    sold_price = models.DecimalField(
+        max_digits=10, decimal_places=2, null=True, blank=True
+    )
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['created_at', 'id'], name='archived_lot_created_idx'
+            ),
+        ]
+
+    @classmethod
+    def archive(cls, lot_ids):
+        """
+        Moves closed lots with given ids and their bids to archive tables.
+        Must be called in a transaction which locked the lots.
+        Returns numbers of archived lots and bids
+        """
+        lots = Lot.objects.filter(
+            pk__in=lot_ids, status=LotStatuses.CLOSED
+        ).values(
+            'id', 'pet_id', 'author_id', 'price', 'created_at', 'closed_at', 'sold_price'
+        )
+        archived_lots = cls.objects.bulk_create(cls(**lot) for lot in lots)
+        lot_ids = [lot.pk for lot in archived_lots]
+
+        bids = Bid.objects.filter(lot_id__in=lot_ids)
+        archived_bids = ArchivedBid.objects.bulk_create(
+            ArchivedBid(**bid)
+            for bid in bids.values('id', 'lot_id', 'author_id', 'price', 'created_at')
+        )
+        bids.delete()
+        Lot.objects.filter(pk__in=lot_ids).delete()
+        return len(archived_lots), len(archived_bids)
+
+
+class ArchivedBid(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    author = models.ForeignKey(
+        to=UserAccount, on_delete=models.PROTECT, related_name='archived_bids'
+    )
+    lot = models.ForeignKey(
+        to=ArchivedLot, on_delete=models.CASCADE, related_name='bids'
+    )
+    price = models.DecimalField(
+        max_digits=10, decimal_places=2
+    )
+    created_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['lot', 'created_at', 'id'], name='archived_bid_lot_created_idx'
+            ),
+        ]
+
+
+class BreedStats(models.Model):
+    """
+    Market statistics of a breed. Updated incrementally by auction.core.stats,
+    recomputed by rebuild_market_stats command
+    """
+    breed = models.CharField(
+        max_length=50, choices=Breeds.choices, unique=True
+    )
+    open_lots = models.IntegerField(default=0)
+    # sum of asking prices of open lots
+    open_lots_price = models.DecimalField(
+        max_digits=16, decimal_places=2, default=Decimal('0.00')
+    )
+    open_bids = models.IntegerField(default=0)
+    sold_lots = models.IntegerField(default=0)
+    # sum of prices of accepted bids
+    sold_price = models.DecimalField(
+        max_digits=16, decimal_places=2, default=Decimal('0.00')
+    )
+
+    def __str__(self):
+        return self.breed
+
+
+class DailyStats(models.Model):
+    """
+    Market activity of a breed in a day
+    """
+    date = models.DateField()
+    breed = models.CharField(
+        max_length=50, choices=Breeds.choices
+    )
+    lots_created = models.IntegerField(default=0)
+    bids_placed = models.IntegerField(default=0)
+    sales = models.IntegerField(default=0)
+    sales_amount = models.DecimalField(
+        max_digits=16, decimal_places=2, default=Decimal('0.00')
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['date', 'breed'], name='daily_stats_date_breed_uniq'
+            ),
+        ]
+
+
+class AuthToken(models.Model):
+    """
+    API token of a user. Only sha256 digest of the token is stored,
+    the token itself is returned once on login
+    """
+    user = models.ForeignKey(
+        to='auth.User', on_delete=models.CASCADE, related_name='auth_tokens'
+    )
+    digest = models.CharField(max_length=64, unique=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+
+    def __str__(self):
+        return f'{self.user} token {self.pk}'
+
+    @staticmethod
+    def make_digest(key):
+        # tokens are random, so a fast digest is enough unlike passwords
+        return sha256(key.encode()).hexdigest()
+
+    @classmethod
+    def issue(cls, user):
+        """
+        Creates a token for user and returns it with the token key
+        """
+        key = secrets.token_urlsafe(32)
+        token = cls.objects.create(
+            user=user,
+            digest=cls.make_digest(key),
+            expires_at=timezone.now() + timedelta(seconds=settings.AUTH_TOKEN_LIFETIME),
+        )
+        return token, key
+
+    @property
+    def is_expired(self):
+        return self.expires_at <= timezone.now()
@@ -0,0 +1,87 @@
+import logging
+import re
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+IN_PARAMS_RE = re.compile(r'IN \((?:%s, )*%s\)')
+
+
+def query_shape(sql):
+    """
+    Returns SQL with parameter lists collapsed, so queries which differ
+    only by the number of IN parameters have the same shape
+    """
+    return IN_PARAMS_RE.sub('IN (...)', sql)
+
+
+class QueryRecorder:
+    """
+    Records queries executed on a database connection within the context
+    """
+
+    def __init__(self, using='default'):
+        self.using = using
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'sql': sql,
+                'duration': time.perf_counter() - started,
+            })
+
+    def __enter__(self):
+        self.wrapper = connections[self.using].execute_wrapper(self)
+        self.wrapper.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.wrapper.__exit__(*exc_info)
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def duration(self):
+        return sum(query['duration'] for query in self.queries)
+
+    def n_plus_one_suspects(self, threshold=None):
+        """
+        Returns query shapes repeated at least threshold times with their counts
+        """
+        if threshold is None:
+            threshold = settings.QUERY_COUNT_REPEAT_THRESHOLD
+        shapes = Counter(query_shape(query['sql']) for query in self.queries)
+        return {shape: count for shape, count in shapes.items() if count >= threshold}
+
+
+class QueryCountMiddleware:
+    """
+    Reports number of queries executed by a request in X-Query-Count header
+    and logs repeated query shapes as N+1 suspects
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with QueryRecorder() as recorder:
+            response = self.get_response(request)
+
+        response['X-Query-Count'] = recorder.count
+        response['X-Query-Duration'] = f'{recorder.duration * 1000:.1f}ms'
+        for shape, count in recorder.n_plus_one_suspects().items():
+            logger.warning(
+                'Possible N+1 in %s %s: query executed %s times: %s',
+                request.method, request.path, count, shape
+            )
+        return response
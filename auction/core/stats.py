@@ -0,0 +1,118 @@
+"""
+Incrementally maintained market statistics.
+
+Lot and bid changes add deltas to counters of the breed and of the day.
+Counters are updated after the transaction is committed with one UPDATE
+per row, so a counter row shared by all requests of a breed is locked only
+for the statement instead of the whole request. Statistics are not updated
+if the process dies between the commit and the update, such drift is
+repaired by rebuild_market_stats command.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+
+from .models import Bid, BreedStats, DailyStats, Lot
+
+BREED_FIELDS = ('open_lots', 'open_lots_price', 'open_bids', 'sold_lots', 'sold_price')
+DAILY_FIELDS = ('lots_created', 'bids_placed', 'sales', 'sales_amount')
+
+
+def _add(model, key, deltas):
+    updates = {name: F(name) + value for name, value in deltas.items() if value}
+    if not updates:
+        return
+    if not model.objects.filter(**key).update(**updates):
+        model.objects.get_or_create(**key)
+        model.objects.filter(**key).update(**updates)
+
+
+def apply(deltas, date=None):
+    """
+    Adds deltas given as {breed: {field: value}} to statistics of breeds
+    and of the day, the current one by default
+    """
+    date = date or timezone.localdate()
+    for breed, values in deltas.items():
+        _add(BreedStats, {'breed': breed}, {
+            name: value for name, value in values.items() if name in BREED_FIELDS
+        })
+        _add(DailyStats, {'date': date, 'breed': breed}, {
+            name: value for name, value in values.items() if name in DAILY_FIELDS
+        })
+
+
+def _deltas():
+    return defaultdict(lambda: defaultdict(int))
+
+
+def _record(deltas, date=None):
+    transaction.on_commit(lambda: apply(deltas, date))
+
+
+def lots_opened(lots):
+    deltas = _deltas()
+    for lot in lots:
+        values = deltas[lot.pet.breed]
+        values['open_lots'] += 1
+        values['open_lots_price'] += lot.price
+        values['lots_created'] += 1
+    _record(deltas)
+
+
+def bids_placed(bids):
+    deltas = _deltas()
+    for bid in bids:
+        values = deltas[bid.lot.pet.breed]
+        values['open_bids'] += 1
+        values['bids_placed'] += 1
+    _record(deltas)
+
+
+def bid_withdrawn(bid):
+    # daily counters keep bids which were not withdrawn
+    _record(
+        {bid.lot.pet.breed: {'open_bids': -1, 'bids_placed': -1}},
+        date=timezone.localdate(bid.created_at),
+    )
+
+
+def lots_closed(lot_ids, sales=()):
+    """
+    Records closing of lots, sales are (breed, price) pairs of accepted bids.
+    Closed lots are counted after the commit, their bids do not change anymore
+    """
+    lot_ids = list(lot_ids)
+    sales = list(sales)
+
+    def apply_closed():
+        deltas = _deltas()
+        lots = Lot.objects.filter(pk__in=lot_ids).values('pet__breed').annotate(
+            count=Count('id'), price_sum=Sum('price')
+        ).values_list('pet__breed', 'count', 'price_sum')
+        for breed, count, price_sum in lots:
+            deltas[breed]['open_lots'] -= count
+            deltas[breed]['open_lots_price'] -= price_sum
+        bids = Bid.objects.filter(lot_id__in=lot_ids).values('lot__pet__breed').annotate(
+            count=Count('id')
+        ).values_list('lot__pet__breed', 'count')
+        for breed, count in bids:
+            deltas[breed]['open_bids'] -= count
+        for breed, price in sales:
+            values = deltas[breed]
+            values['sold_lots'] += 1
+            values['sold_price'] += price
+            values['sales'] += 1
+            values['sales_amount'] += price
+        apply(deltas)
+
+    transaction.on_commit(apply_closed)
+
+
+def average(total, count):
+    if not count:
+        return None
+    return (Decimal(total) / count).quantize(Decimal('0.01'))
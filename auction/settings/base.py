@@ -35,6 +35,12 @@ DATABASES = {
     }
 }
 
+# CACHES
+# ------------------------------------------------------------------------------
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+}
+
 # URLS
 # ------------------------------------------------------------------------------
 ROOT_URLCONF = 'auction.urls'
@@ -63,7 +69,7 @@ INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + LOCAL_APPS
 # ------------------------------------------------------------------------------
 
 AUTHENTICATION_BACKENDS = [
-    'django.contrib.auth.backends.ModelBackend',
+    'auction.core.backends.UserAccountBackend',
 ]
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -185,13 +191,48 @@ LOGGING = {
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework.authentication.BasicAuthentication',
+        'auction.api.authentication.TokenAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'auction.api.permissions.HasUserAccount',
-    )
+    ),
+    'DEFAULT_PAGINATION_CLASS': 'auction.api.pagination.KeysetPagination',
+    'PAGE_SIZE': env.int('API_PAGE_SIZE', default=50),
 }
 
 
 # APP SPECIFIC SETTINGS
 # ------------------------------------------------------------------------------
-DEFAULT_USER_BALANCE = Decimal(env.str('DEFAULT_USER_BALANCE', default='100.00'))
\ No newline at end of file
+DEFAULT_USER_BALANCE = Decimal(env.str('DEFAULT_USER_BALANCE', default='100.00'))
+API_MAX_PAGE_SIZE = env.int('API_MAX_PAGE_SIZE', default=500)
+# lifetime of cached API responses in the shared cache, seconds
+API_CACHE_TIMEOUT = env.int('API_CACHE_TIMEOUT', default=300)
+# number of API responses kept in per-process LRU cache
+API_CACHE_LOCAL_ENTRIES = env.int('API_CACHE_LOCAL_ENTRIES', default=256)
+# hits and misses counted by a process before they are added to shared counters
+API_CACHE_STATS_FLUSH_EVERY = env.int('API_CACHE_STATS_FLUSH_EVERY', default=100)
+# query executed this many times within a request is reported as N+1 suspect
+QUERY_COUNT_REPEAT_THRESHOLD = env.int('QUERY_COUNT_REPEAT_THRESHOLD', default=3)
+# number of recent events of a lot which watchers can resume from
+LOT_EVENTS_RETAINED = env.int('LOT_EVENTS_RETAINED', default=100)
+# lifetime of lot events in the shared cache, seconds
+LOT_EVENTS_TIMEOUT = env.int('LOT_EVENTS_TIMEOUT', default=3600)
+# how often event streams check for new events, seconds
+LOT_EVENTS_POLL_INTERVAL = env.float('LOT_EVENTS_POLL_INTERVAL', default=1.0)
+# event stream is closed after this time and the client reconnects, seconds
+LOT_EVENTS_STREAM_DURATION = env.int('LOT_EVENTS_STREAM_DURATION', default=60)
+# maximum number of items in one request to batch endpoints
+API_MAX_BATCH_SIZE = env.int('API_MAX_BATCH_SIZE', default=100)
+# number of rows fetched at once by streaming exports
+EXPORT_CHUNK_SIZE = env.int('EXPORT_CHUNK_SIZE', default=2000)
+# lifetime of API tokens issued on login, seconds
+AUTH_TOKEN_LIFETIME = env.int('AUTH_TOKEN_LIFETIME', default=30 * 24 * 60 * 60)
+# verified tokens are cached in each process for this time, so revoked tokens
+# are still accepted by other processes for up to this time, seconds
+AUTH_TOKEN_CACHE_TTL = env.int('AUTH_TOKEN_CACHE_TTL', default=60)
+# number of verified tokens cached in each process
+AUTH_TOKEN_CACHE_ENTRIES = env.int('AUTH_TOKEN_CACHE_ENTRIES', default=1024)
+# lots closed this number of days ago are moved to archive tables
+ARCHIVE_LOTS_AFTER_DAYS = env.int('ARCHIVE_LOTS_AFTER_DAYS', default=90)
+# number of days of daily activity returned by market statistics
+MARKET_STATS_DAYS = env.int('MARKET_STATS_DAYS', default=30)
@@ -8,6 +8,14 @@ MIDDLEWARE += ['debug_toolbar.middleware.DebugToolbarMiddleware']  # noqa F405
 INSTALLED_APPS += ['debug_toolbar']  # noqa F405
 INTERNAL_IPS = ['127.0.0.1']
 
+# query counting
+# ------------------------------------------------------------------------------
+MIDDLEWARE.insert(0, 'auction.core.querycount.QueryCountMiddleware')  # noqa F405
+LOGGING['loggers']['auction.core.querycount'] = {  # noqa F405
+    'handlers': ['console'],
+    'level': 'WARNING',
+}
+
 # whitenoise
 # ------------------------------------------------------------------------------
 INSTALLED_APPS.insert(0, 'whitenoise.runserver_nostatic')  # noqa F405
@@ -1 +1,8 @@
 from .base import *  # noqa
+
+# CACHES
+# ------------------------------------------------------------------------------
+# gunicorn workers must share the cache, so local memory cache is not an option
+CACHES = {
+    'default': env.cache('CACHE_URL', default='filecache:///tmp/auction_cache'),  # noqa F405
+}
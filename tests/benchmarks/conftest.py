@@ -0,0 +1,86 @@
+import json
+import platform
+import subprocess
+from datetime import datetime, timezone
+
+import pytest
+from django.core.management import call_command
+
+from tests.benchmarks.data import seed_marketplace
+
+
+class BenchmarkReport:
+    def __init__(self):
+        self.results = []
+
+    def add(self, name, **metrics):
+        self.results.append({'name': name, **metrics})
+
+    def format(self):
+        lines = []
+        for result in self.results:
+            metrics = ', '.join(
+                f'{key}={value:.2f}' if isinstance(value, float) else f'{key}={value}'
+                for key, value in result.items() if key != 'name'
+            )
+            lines.append(f"{result['name']}: {metrics}")
+        return '\n'.join(lines)
+
+    def to_json(self):
+        try:
+            commit = subprocess.run(
+                ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            commit = None
+        return json.dumps({
+            'commit': commit,
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'results': self.results,
+        }, indent=2)
+
+
+report = BenchmarkReport()
+
+
+@pytest.fixture(scope='session')
+def benchmark_report():
+    return report
+
+
+def pytest_generate_tests(metafunc):
+    if 'volume' in metafunc.fixturenames:
+        volumes = [
+            int(volume) for volume in
+            metafunc.config.getoption('--benchmark-volumes').split(',')
+        ]
+        metafunc.parametrize('volume', volumes, scope='module')
+
+
+@pytest.fixture(scope='module')
+def marketplace(django_db_setup, django_db_blocker, volume):
+    """
+    Seeds given number of bids (ten per lot) once per module
+    """
+    with django_db_blocker.unblock():
+        accounts, lots = seed_marketplace(lots_count=max(volume // 10, 1), bids_per_lot=10)
+        yield {'volume': volume, 'accounts': accounts, 'lots': lots}
+        call_command('flush', interactive=False)
+
+
+@pytest.fixture(scope='session')
+def benchmark_iterations(request):
+    return request.config.getoption('--benchmark-iterations')
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    if not report.results:
+        return
+    terminalreporter.write_sep('=', 'benchmark results')
+    terminalreporter.write_line(report.format())
+    path = config.getoption('--benchmark-json')
+    if path:
+        with open(path, 'w') as output:
+            output.write(report.to_json())
+        terminalreporter.write_line(f'benchmark results written to {path}')
@@ -0,0 +1,45 @@
+from decimal import Decimal
+
+from auction.core import models
+from auction.core.constants import LotStatuses
+from tests import factories
+
+
+def seed_marketplace(lots_count, bids_per_lot, accounts_count=11, batch_size=1000):
+    """
+    Creates open lots with bids using factories for attributes
+    and bulk_create for inserts.
+    Prices are small enough for every account to afford all its bids
+    """
+    assert bids_per_lot < accounts_count
+    accounts = factories.UserAccountFactory.create_batch(
+        accounts_count, balance=Decimal('1000000.00')
+    )
+    pets = models.Pet.objects.bulk_create(
+        (
+            factories.PetFactory.build(owner=accounts[i % accounts_count])
+            for i in range(lots_count)
+        ),
+        batch_size=batch_size,
+    )
+    lots = models.Lot.objects.bulk_create(
+        (
+            factories.LotFactory.build(pet=pet, author_id=pet.owner_id, status=LotStatuses.OPEN)
+            for pet in pets
+        ),
+        batch_size=batch_size,
+    )
+    models.Bid.objects.bulk_create(
+        (
+            factories.BidFactory.build(
+                lot=lot,
+                author=accounts[(index + shift) % accounts_count],
+                price=Decimal(shift),
+            )
+            for index, lot in enumerate(lots)
+            for shift in range(1, bids_per_lot + 1)
+        ),
+        batch_size=batch_size,
+    )
+    models.Lot.objects.filter(pk__in=[lot.pk for lot in lots]).update(**models.Lot.bid_summary())
+    return accounts, lots
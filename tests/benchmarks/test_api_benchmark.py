@@ -0,0 +1,150 @@
+import statistics
+import time
+import tracemalloc
+from base64 import b64encode
+from decimal import Decimal
+
+import pytest
+from rest_framework.test import APIClient
+
+from auction.api.cache import lot_list_cache
+from auction.core import models
+from auction.core.querycount import QueryRecorder
+from tests import factories
+
+pytestmark = [pytest.mark.benchmark, pytest.mark.django_db]
+
+
+def measure(benchmark_report, name, volume, iterations, make_request):
+    """
+    Calls make_request(iteration) and reports latency percentiles, queries per
+    request and peak memory allocated by one request.
+    Requests are authenticated with force_authenticate, so password hashing
+    is not measured.
+    """
+    latencies = []
+    query_counts = []
+    for iteration in range(iterations):
+        with QueryRecorder() as recorder:
+            started = time.perf_counter()
+            response = make_request(iteration)
+            latencies.append(time.perf_counter() - started)
+        assert response.status_code in (200, 201), response.content
+        query_counts.append(recorder.count)
+
+    # tracing slows down allocations, so memory is measured with a separate request
+    tracemalloc.start()
+    make_request(iterations)
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    percentiles = statistics.quantiles(latencies, n=100, method='inclusive')
+    benchmark_report.add(
+        name,
+        volume=volume,
+        iterations=iterations,
+        requests_per_second=len(latencies) / sum(latencies),
+        p50_ms=percentiles[49] * 1000,
+        p95_ms=percentiles[94] * 1000,
+        queries_per_request=statistics.mean(query_counts),
+        peak_memory_kb=peak_memory / 1024,
+    )
+
+
+@pytest.fixture
+def bench_client(marketplace):
+    client = APIClient()
+    client.force_authenticate(user=marketplace['accounts'][0].user)
+    return client
+
+
+def test_list_lots(benchmark_report, benchmark_iterations, marketplace, bench_client):
+    measure(
+        benchmark_report, 'GET /api/lots/ (cached)', marketplace['volume'],
+        benchmark_iterations, lambda _: bench_client.get('/api/lots/'),
+    )
+
+    def uncached(_):
+        lot_list_cache.bump_version()
+        return bench_client.get('/api/lots/')
+    measure(
+        benchmark_report, 'GET /api/lots/ (uncached)', marketplace['volume'],
+        benchmark_iterations, uncached,
+    )
+
+
+def test_list_lots_authentication(benchmark_report, benchmark_iterations, marketplace):
+    """
+    Basic authentication hashes the password on every request,
+    token authentication checks a digest which is cached after the first request
+    """
+    user = marketplace['accounts'][0].user
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION='Basic ' + b64encode(
+        f'{user.username}:password'.encode()
+    ).decode())
+    measure(
+        benchmark_report, 'GET /api/lots/ (basic auth)', marketplace['volume'],
+        benchmark_iterations, lambda _: client.get('/api/lots/'),
+    )
+
+    _, key = models.AuthToken.issue(user)
+    client.credentials(HTTP_AUTHORIZATION=f'Token {key}')
+    measure(
+        benchmark_report, 'GET /api/lots/ (token auth)', marketplace['volume'],
+        benchmark_iterations, lambda _: client.get('/api/lots/'),
+    )
+
+
+def test_list_bids(benchmark_report, benchmark_iterations, marketplace, bench_client):
+    measure(
+        benchmark_report, 'GET /api/bids/', marketplace['volume'],
+        benchmark_iterations, lambda _: bench_client.get('/api/bids/'),
+    )
+
+
+def test_list_lot_bids(benchmark_report, benchmark_iterations, marketplace, bench_client):
+    lots = marketplace['lots']
+    measure(
+        benchmark_report, 'GET /api/lots/{id}/bids/', marketplace['volume'],
+        benchmark_iterations,
+        lambda iteration: bench_client.get(
+            f'/api/lots/{lots[iteration % len(lots)].id}/bids/'
+        ),
+    )
+
+
+def test_create_bid(benchmark_report, benchmark_iterations, marketplace):
+    lots = marketplace['lots']
+    if len(lots) <= benchmark_iterations:
+        pytest.skip('not enough lots to place a bid in a new lot on every iteration')
+    bidder = factories.UserAccountFactory.create(balance=Decimal('99999999.00'))
+    client = APIClient()
+    client.force_authenticate(user=bidder.user)
+    measure(
+        benchmark_report, 'POST /api/bids/', marketplace['volume'],
+        benchmark_iterations,
+        lambda iteration: client.post(
+            '/api/bids/', {'lot': lots[iteration].id, 'price': '1.00'}
+        ),
+    )
+
+
+def test_accept_bid(benchmark_report, benchmark_iterations, marketplace):
+    lots = marketplace['lots'][:benchmark_iterations + 1]
+    if len(lots) <= benchmark_iterations:
+        pytest.skip('not enough lots to accept a bid in a new lot on every iteration')
+    bids = {}
+    for bid in models.Bid.objects.filter(lot__in=lots).order_by('-id'):
+        bids[bid.lot_id] = bid.id
+    authors = {account.pk: account.user for account in marketplace['accounts']}
+    client = APIClient()
+
+    def accept(iteration):
+        lot = lots[iteration]
+        client.force_authenticate(user=authors[lot.author_id])
+        return client.post(f'/api/bids/{bids[lot.id]}/accept/')
+    measure(
+        benchmark_report, 'POST /api/bids/{id}/accept/', marketplace['volume'],
+        benchmark_iterations, accept,
+    )
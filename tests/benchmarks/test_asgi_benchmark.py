@@ -0,0 +1,105 @@
+import asyncio
+import statistics
+import time
+from base64 import b64encode
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.db import connections
+from django.test import AsyncClient, Client, override_settings
+
+pytestmark = [pytest.mark.benchmark, pytest.mark.django_db]
+
+CONCURRENCY = (1, 8, 32)
+
+
+@pytest.fixture(scope='module')
+def credentials(marketplace, django_db_blocker):
+    """
+    Basic auth credentials of a user with a fast password hash, so hashing
+    does not hide the difference between servers
+    """
+    with override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher']):
+        user = marketplace['accounts'][0].user
+        with django_db_blocker.unblock():
+            user.set_password('password')
+            user.save(update_fields=['password'])
+        yield 'Basic ' + b64encode(f'{user.username}:password'.encode()).decode()
+
+
+def wsgi_run(url, credentials, requests, concurrency):
+    """
+    Requests are handled by WSGI handler in a pool of threads,
+    like the threaded gunicorn worker
+    """
+    def worker(count):
+        client = Client()
+        latencies = []
+        try:
+            for _ in range(count):
+                started = time.perf_counter()
+                response = client.get(url, HTTP_AUTHORIZATION=credentials)
+                latencies.append(time.perf_counter() - started)
+                assert response.status_code == 200
+        finally:
+            connections.close_all()
+        return latencies
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        counts = [requests // concurrency] * concurrency
+        return [
+            latency
+            for latencies in executor.map(worker, counts)
+            for latency in latencies
+        ]
+
+
+def asgi_run(url, credentials, requests, concurrency):
+    """
+    Requests are handled by ASGI handler in one event loop,
+    like a uvicorn worker
+    """
+    client = AsyncClient()
+
+    async def worker(count):
+        latencies = []
+        for _ in range(count):
+            started = time.perf_counter()
+            response = await client.get(url, authorization=credentials)
+            latencies.append(time.perf_counter() - started)
+            assert response.status_code == 200
+        return latencies
+
+    async def run():
+        results = await asyncio.gather(*[
+            worker(requests // concurrency) for _ in range(concurrency)
+        ])
+        return [latency for latencies in results for latency in latencies]
+
+    return async_to_sync(run)()
+
+
+@pytest.mark.parametrize('concurrency', CONCURRENCY)
+@pytest.mark.parametrize('name,wsgi_url,asgi_url', [
+    ('bids', '/api/bids/', '/api/async/bids/'),
+    ('lot bids', '/api/lots/{lot_id}/bids/', '/api/async/lots/{lot_id}/bids/'),
+])
+def test_asgi_vs_wsgi_throughput(
+    benchmark_report, benchmark_iterations, marketplace, credentials,
+    name, wsgi_url, asgi_url, concurrency,
+):
+    lot_id = marketplace['lots'][0].id
+    requests = max(benchmark_iterations, concurrency)
+    for server, run, url in (('WSGI', wsgi_run, wsgi_url), ('ASGI', asgi_run, asgi_url)):
+        started = time.perf_counter()
+        latencies = run(url.format(lot_id=lot_id), credentials, requests, concurrency)
+        elapsed = time.perf_counter() - started
+        benchmark_report.add(
+            f'{server} {name} concurrency={concurrency}',
+            volume=marketplace['volume'],
+            requests=len(latencies),
+            requests_per_second=len(latencies) / elapsed,
+            p50_ms=statistics.median(latencies) * 1000,
+            max_ms=max(latencies) * 1000,
+        )
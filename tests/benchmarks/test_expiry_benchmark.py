@@ -0,0 +1,33 @@
+import time
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.utils import timezone
+
+from auction.core import models
+from auction.core.constants import LotStatuses
+from tests.benchmarks.data import seed_marketplace
+
+pytestmark = [pytest.mark.benchmark, pytest.mark.django_db]
+
+
+@pytest.mark.parametrize('settle', [False, True])
+@pytest.mark.parametrize('batch_size', [100, 1000])
+def test_expire_lots_throughput(benchmark_report, volume, batch_size, settle):
+    # lots are closed by the benchmark, so every run seeds its own
+    lots_count = max(volume // 10, 1)
+    seed_marketplace(lots_count=lots_count, bids_per_lot=10)
+    models.Lot.objects.update(ends_at=timezone.now())
+
+    started = time.perf_counter()
+    call_command('expire_lots', batch_size=batch_size, settle=settle, stdout=StringIO())
+    elapsed = time.perf_counter() - started
+
+    assert not models.Lot.objects.filter(status=LotStatuses.OPEN).exists()
+    benchmark_report.add(
+        f'expire lots batch_size={batch_size} settle={settle}',
+        volume=volume,
+        lots=lots_count,
+        lots_per_second=lots_count / elapsed,
+    )
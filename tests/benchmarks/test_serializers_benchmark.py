@@ -0,0 +1,64 @@
+import time
+
+import pytest
+
+from auction.api import projections, serializers
+from auction.core import models
+from tests.benchmarks.data import seed_marketplace
+
+pytestmark = [pytest.mark.benchmark, pytest.mark.django_db]
+
+ROWS = 2000
+
+
+def rows_per_second(rows, func, repeat=3):
+    best = min(_timed(func) for _ in range(repeat))
+    return rows / best
+
+
+def _timed(func):
+    started = time.perf_counter()
+    func()
+    return time.perf_counter() - started
+
+
+@pytest.mark.parametrize('name,queryset,related,projection,serializer_class', [
+    (
+        'lots', models.Lot.objects.order_by('id'), ('pet', 'author__user'),
+        projections.lot_display, serializers.LotDisplaySerializer,
+    ),
+    (
+        'bids', models.Bid.objects.order_by('id'),
+        ('author__user', 'lot__pet', 'lot__author__user'),
+        projections.bid_long_display, serializers.BidLongDisplaySerializer,
+    ),
+])
+def test_serialization_throughput(
+    benchmark_report, name, queryset, related, projection, serializer_class
+):
+    seed_marketplace(lots_count=ROWS, bids_per_lot=1)
+    queryset = queryset.all()[:ROWS]
+    instances = list(queryset.select_related(*related))
+    rows = list(projection.values(queryset))
+
+    benchmark_report.add(
+        f'serialize {name}',
+        rows=len(rows),
+        serializer_rows_per_sec=rows_per_second(
+            len(rows), lambda: serializer_class(instances, many=True).data
+        ),
+        projection_rows_per_sec=rows_per_second(
+            len(rows), lambda: projection.represent_many(rows)
+        ),
+    )
+    benchmark_report.add(
+        f'query and serialize {name}',
+        rows=len(rows),
+        serializer_rows_per_sec=rows_per_second(
+            len(rows),
+            lambda: serializer_class(queryset.select_related(*related), many=True).data
+        ),
+        projection_rows_per_sec=rows_per_second(
+            len(rows), lambda: projection.represent_many(projection.values(queryset))
+        ),
+    )
@@ -1,9 +1,51 @@
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+from django.core.cache import cache
 from rest_framework.test import APIClient
 import pytest
 
+from auction.api.authentication import token_cache
+from auction.api.cache import lot_list_cache
+from auction.core.querycount import QueryRecorder
 from tests import factories
 
 
+def pytest_addoption(parser):
+    parser.addoption(
+        '--benchmark', action='store_true', default=False,
+        help='Run benchmarks instead of skipping them'
+    )
+    parser.addoption(
+        '--benchmark-volumes', default='1000',
+        help='Comma separated numbers of bids seeded for API benchmarks, e.g. 1000,100000'
+    )
+    parser.addoption(
+        '--benchmark-iterations', type=int, default=50,
+        help='Number of requests measured for every API benchmark'
+    )
+    parser.addoption(
+        '--benchmark-json', default=None,
+        help='Path of a file benchmark results are written to as JSON'
+    )
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption('--benchmark'):
+        return
+    skip_benchmark = pytest.mark.skip(reason='benchmarks run only with --benchmark')
+    for item in items:
+        if 'benchmark' in item.keywords:
+            item.add_marker(skip_benchmark)
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    lot_list_cache.clear_local()
+    cache.clear()
+    token_cache.clear()
+
+
 @pytest.fixture(scope='function')
 def api_client():
     return APIClient()
@@ -12,3 +54,67 @@ def api_client():
 @pytest.fixture(scope='function')
 def user_account():
     return factories.UserAccountFactory.create()
+
+
+@pytest.fixture(scope='function')
+def query_budget():
+    """
+    Fails the test when queries executed within the context exceed
+    the budget or when the same query is repeated (N+1 suspect)
+    """
+    @contextmanager
+    def budget(max_queries):
+        with QueryRecorder() as recorder:
+            yield recorder
+        suspects = recorder.n_plus_one_suspects()
+        assert not suspects, f'N+1 suspects: {suspects}'
+        assert recorder.count <= max_queries, (
+            f'{recorder.count} queries executed, budget is {max_queries}:\n'
+            + '\n'.join(query['sql'] for query in recorder.queries)
+        )
+    return budget
+
+
+@pytest.fixture
+def asgi_get():
+    """
+    Sends GET request to the ASGI application of the project the way an ASGI
+    server does, so streamed responses are consumed on the event loop
+    """
+    from auction.asgi import application
+
+    async def get(url, headers=None):
+        path, _, query = url.partition('?')
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': path,
+            'raw_path': path.encode(),
+            'query_string': query.encode(),
+            'root_path': '',
+            'headers': [(b'host', b'testserver')] + [
+                (name.lower().encode(), value.encode())
+                for name, value in (headers or {}).items()
+            ],
+            'server': ('testserver', 80),
+            'client': ('127.0.0.1', 50000),
+        }
+        messages = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            messages.append(message)
+
+        await application(scope, receive, send)
+        start, *body = messages
+        return SimpleNamespace(
+            status_code=start['status'],
+            headers={name.decode(): value.decode() for name, value in start['headers']},
+            content=b''.join(message.get('body', b'') for message in body),
+        )
+    return get
@@ -1,12 +1,14 @@
 import factory
+from django.db.models import F
 from factory.django import DjangoModelFactory
 from factory.fuzzy import FuzzyChoice
 
-from auction.core import constants
+from auction.core import constants, models
 
 
 class UserFactory(DjangoModelFactory):
-    username = factory.Faker('user_name')
+    # faker repeats user names, which would give two accounts the same user
+    username = factory.Sequence(lambda n: f'member{n}')
 
     class Meta:
         model = 'auth.User'
@@ -54,3 +56,15 @@ class BidFactory(DjangoModelFactory):
 
     class Meta:
         model = 'core.Bid'
+
+    @factory.post_generation
+    def reserve_funds(obj, create, extracted, **kwargs):
+        if not create:
+            return
+        # bid summary is kept for closed lots as well
+        models.Lot.add_bids([obj])
+        if obj.lot.status != constants.LotStatuses.OPEN:
+            return
+        models.UserAccount.objects.filter(pk=obj.author_id).update(
+            reserved_amount=F('reserved_amount') + obj.price
+        )
@@ -1,12 +1,26 @@
+from base64 import b64encode
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
 from decimal import Decimal
+from io import StringIO
 
 import pytest
+from asgiref.sync import async_to_sync
 from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from faker import Faker
+from rest_framework.test import APIClient
 
+from auction.api import events, exceptions, views
+from auction.api.cache import lot_list_cache
 from auction.core import models
 from auction.core import constants
 from auction.core.constants import LotStatuses
+from auction.core.querycount import QueryRecorder
 from tests import factories
 
 pytestmark = pytest.mark.django_db
@@ -34,13 +48,37 @@ def test_register_user(faker, api_client):
     assert useraccount.balance == settings.DEFAULT_USER_BALANCE
 
 
+def test_register_user_inserts_once_per_table(faker, api_client, query_budget):
+    password = faker.password()
+    user_data = {'username': 'newcomer', 'password': password, 'password2': password}
+    # savepoint, user insert, account insert, release
+    with query_budget(4) as recorder:
+        response = api_client.post('/api/register/', user_data)
+    assert response.status_code == 201
+    assert sum(query['sql'].startswith('INSERT') for query in recorder.queries) == 2
+    assert models.UserAccount.objects.get().user.check_password(password)
+
+
+def test_register_existing_username(faker, api_client, user_account):
+    password = faker.password()
+    user_data = {
+        'username': user_account.user.username,
+        'password': password,
+        'password2': password
+    }
+    response = api_client.post('/api/register/', user_data)
+    assert response.status_code == 400
+    assert 'username' in response.data
+    assert models.UserAccount.objects.count() == 1
+
+
 def test_users_see_only_their_pets(api_client, user_account):
     factories.PetFactory.create_batch(5, owner=user_account)
     factories.PetFactory.create_batch(5)
     api_client.force_authenticate(user=user_account.user)
     response = api_client.get('/api/pets/')
     assert response.status_code == 200
-    assert len(response.json()) == 5
+    assert len(response.json()['results']) == 5
 
 
 def test_user_can_create_pet(faker, api_client, user_account):
@@ -62,7 +100,7 @@ def test_user_can_see_open_lots(api_client, user_account):
     api_client.force_authenticate(user=user_account.user)
     response = api_client.get('/api/lots/')
     assert response.status_code == 200
-    assert len(response.json()) == 5
+    assert len(response.json()['results']) == 5
 
 
 def test_user_can_close_his_lot(api_client, user_account):
@@ -88,7 +126,7 @@ def test_user_can_see_bids_for_lot(api_client, user_account):
     api_client.force_authenticate(user=user_account.user)
     response = api_client.get(f'/api/lots/{lot.id}/bids/')
     assert response.status_code == 200
-    assert len(response.json()) == 5
+    assert len(response.json()['results']) == 5
 
 
 def test_user_can_place_bids(api_client, user_account):
@@ -119,6 +157,31 @@ def test_user_cannot_place_bid_in_closed_lot(api_client, user_account):
     assert bids_count == 0
 
 
+def test_user_cannot_place_bid_in_ended_lot(api_client, user_account):
+    lot = factories.LotFactory.create(
+        status=LotStatuses.OPEN, ends_at=timezone.now() - timedelta(seconds=1)
+    )
+    api_client.force_authenticate(user=user_account.user)
+    response = api_client.post('/api/bids/', {'lot': lot.id, 'price': Decimal('0.01')})
+    assert response.status_code == 400
+    assert response.json()['detail'] == exceptions.LotAlreadyClosed.default_detail
+
+
+def test_lot_ends_at_must_be_in_future(api_client, user_account):
+    pet = factories.PetFactory.create(owner=user_account)
+    api_client.force_authenticate(user=user_account.user)
+    ends_at = timezone.now() + timedelta(days=1)
+    response = api_client.post('/api/lots/', {'pet': pet.id, 'price': '1.00', 'ends_at': ends_at})
+    assert response.status_code == 201
+    assert models.Lot.objects.get().ends_at == ends_at
+
+    response = api_client.post('/api/lots/', {
+        'pet': pet.id, 'price': '1.00', 'ends_at': timezone.now() - timedelta(days=1)
+    })
+    assert response.status_code == 400
+    assert 'ends_at' in response.json()
+
+
 def test_user_cannot_place_bid_in_his_lot(api_client, user_account):
     lot = factories.LotFactory.create(
         status=LotStatuses.OPEN,
@@ -217,7 +280,956 @@ def test_user_can_accept_bid(faker, api_client, user_account):
     assert user_account.balance == prev_lot_user_balance + test_bid_price
     bid_user_account.refresh_from_db()
     assert bid_user_account.balance == test_bid_user_balance - test_bid_price
+    assert bid_user_account.reserved_amount == Decimal('0.00')
     lot.refresh_from_db()
     assert lot.status == LotStatuses.CLOSED
     pet.refresh_from_db()
     assert pet.owner == bid_user_account
+
+
+def test_placing_bid_reserves_funds(api_client):
+    user_account = factories.UserAccountFactory.create(balance=Decimal('100.00'))
+    lot = factories.LotFactory.create(status=LotStatuses.OPEN)
+    api_client.force_authenticate(user=user_account.user)
+    response = api_client.post('/api/bids/', {'lot': lot.id, 'price': '30.00'})
+    assert response.status_code == 201
+    user_account.refresh_from_db()
+    assert user_account.reserved_amount == Decimal('30.00')
+    assert user_account.available_balance == Decimal('70.00')
+
+
+def test_deleting_bid_releases_funds(api_client, user_account):
+    lot = factories.LotFactory.create(status=LotStatuses.OPEN)
+    bid = factories.BidFactory.create(
+        lot=lot, price=Decimal('0.01'), author=user_account
+    )
+    api_client.force_authenticate(user=user_account.user)
+    response = api_client.delete(f'/api/bids/{bid.id}/')
+    assert response.status_code == 200
+    user_account.refresh_from_db()
+    assert user_account.reserved_amount == Decimal('0.00')
+
+
+def test_closing_lot_releases_funds(api_client, user_account):
+    lot = factories.LotFactory.create(author=user_account, status=LotStatuses.OPEN)
+    bids = factories.BidFactory.create_batch(3, lot=lot)
+    api_client.force_authenticate(user=user_account.user)
+    response = api_client.post(f'/api/lots/{lot.id}/close/', {})
+    assert response.status_code == 200
+    for bid in bids:
+        bid.author.refresh_from_db()
+        assert bid.author.reserved_amount == Decimal('0.00')
+
+
+def test_lots_are_paginated_with_cursor(api_client, user_account):
+    lots = factories.LotFactory.create_batch(5, status=LotStatuses.OPEN)
+    api_client.force_authenticate(user=user_account.user)
+    response = api_client.get('/api/lots/', {'page_size': 2})
+    assert response.status_code == 200
+    seen_ids = []
+    pages = []
+    while True:
+        page = response.json()
+        pages.append(page)
+        seen_ids += [lot['id'] for lot in page['results']]
+        if page['next'] is None:
+            break
+        # rows inserted meanwhile must not shift the following pages
+        factories.LotFactory.create(status=LotStatuses.OPEN)
+        response = api_client.get(page['next'])
+    assert seen_ids[:5] == [lot.id for lot in lots]
+    assert len(seen_ids) == len(set(seen_ids))
+
+    response = api_client.get(pages[1]['previous'])
+    assert response.json()['results'] == pages[0]['results']
+
+
+def test_page_size_is_capped(api_client, user_account, settings):
+    settings.API_MAX_PAGE_SIZE = 3
+    factories.LotFactory.create_batch(5, status=LotStatuses.OPEN)
+    api_client.force_authenticate(user=user_account.user)
+    response = api_client.get('/api/lots/', {'page_size': 100})
+    assert len(response.json()['results']) == 3
+
+
+def test_invalid_cursor(api_client, user_account):
+    api_client.force_authenticate(user=user_account.user)
+    response = api_client.get('/api/bids/', {'cursor': 'invalid'})
+    assert response.status_code == 404
+
+
+def test_user_cannot_place_second_bid_in_lot(api_client, user_account):
+    lot = factories.LotFactory.create(status=LotStatuses.OPEN)
+    factories.BidFactory.create(lot=lot, price=Decimal('0.01'), author=user_account)
+    api_client.force_authenticate(user=user_account.user)
+    response = api_client.post('/api/bids/', {'lot': lot.id, 'price': '0.01'})
+    assert response.status_code == 400
+    assert response.json()['detail'] == exceptions.OnlyOneBidAllowed.default_detail
+    user_account.refresh_from_db()
+    assert user_account.reserved_amount == Decimal('0.01')
+
+
+def test_user_cannot_create_second_open_lot_for_pet(api_client, user_account):
+    pet = factories.PetFactory.create(owner=user_account)
+    factories.LotFactory.create(pet=pet, author=user_account, status=LotStatuses.OPEN)
+    api_client.force_authenticate(user=user_account.user)
+    response = api_client.post('/api/lots/', {'pet': pet.id, 'price': '10.00'})
+    assert response.status_code == 400
+    assert response.json()['detail'] == exceptions.LotExists.default_detail
+    assert models.Lot.objects.count() == 1
+
+
+def test_failed_transfer_changes_no_balance():
+    payee = factories.UserAccountFactory.create(balance=Decimal('10.00'))
+    # payee has the lower key, so it is credited first
+    payer = factories.UserAccountFactory.create(balance=Decimal('5.00'))
+    assert not models.UserAccount.transfer(payer, payee, Decimal('6.00'))
+    payee.refresh_from_db()
+    payer.refresh_from_db()
+    assert (payee.balance, payer.balance) == (Decimal('10.00'), Decimal('5.00'))
+
+
+def test_bid_withdrawn_during_accept_is_not_accepted(api_client, user_account, monkeypatch):
+    pet = factories.PetFactory.create(owner=user_account)
+    lot = factories.LotFactory.create(status=LotStatuses.OPEN, author=user_account, pet=pet)
+    bidder = factories.UserAccountFactory.create(balance=Decimal('100.00'))
+    bid = factories.BidFactory.create(lot=lot, author=bidder, price=Decimal('10.00'))
+    bidder_client = APIClient()
+    bidder_client.force_authenticate(user=bidder.user)
+    get_object = views.BidViewSet.get_object
+
+    def get_object_and_withdraw(view):
+        obj = get_object(view)
+        # the bidder withdraws the bid after it is loaded for acceptance
+        if view.action == 'accept':
+            assert bidder_client.delete(f'/api/bids/{bid.id}/').status_code == 200
+        return obj
+
+    monkeypatch.setattr(views.BidViewSet, 'get_object', get_object_and_withdraw)
+    api_client.force_authenticate(user=user_account.user)
+    response = api_client.post(f'/api/bids/{bid.id}/accept/')
+    assert response.status_code == 404
+
+    lot.refresh_from_db()
+    assert lot.status == LotStatuses.OPEN
+    pet.refresh_from_db()
+    assert pet.owner_id == user_account.pk
+    bidder.refresh_from_db()
+    assert (bidder.balance, bidder.reserved_amount) == (Decimal('100.00'), Decimal('0.00'))
+
+
+def test_bid_deleted_twice_is_released_once(
+    api_client, monkeypatch, django_capture_on_commit_callbacks
+):
+    lot = factories.LotFactory.create(status=LotStatuses.OPEN)
+    bidder = factories.UserAccountFactory.create(balance=Decimal('100.00'))
+    factories.BidFactory.create(lot=lot, price=Decimal('5.00'))
+    bid = factories.BidFactory.create(lot=lot, author=bidder, price=Decimal('10.00'))
+    api_client.force_authenticate(user=bidder.user)
+    get_object = views.BidViewSet.get_object
+
+    def get_object_and_delete(view):
+        obj = get_object(view)
+        # a concurrent request deletes the bid after it is loaded
+        monkeypatch.setattr(views.BidViewSet, 'get_object', get_object)
+        assert api_client.delete(f'/api/bids/{bid.id}/').status_code == 200
+        return obj
+
+    monkeypatch.setattr(views.BidViewSet, 'get_object', get_object_and_delete)
+    # on-commit callbacks of both requests are run
+    with django_capture_on_commit_callbacks(execute=True):
+        response = api_client.delete(f'/api/bids/{bid.id}/')
+    assert response.status_code == 404
+
+    bidder.refresh_from_db()
+    assert bidder.reserved_amount == Decimal('0.00')
+    lot.refresh_from_db()
+    assert lot.bid_count == 1
+    assert models.BreedStats.objects.get(breed=lot.pet.breed).open_bids == -1
+
+
+@pytest.mark.django_db(transaction=True)
+def test_concurrent_accepts_keep_balances_consistent():
+    seller = factories.UserAccountFactory.create(balance=Decimal('0.00'))
+    bids = []
+    for _ in range(10):
+        lot = factories.LotFactory.create(
+            status=LotStatuses.OPEN,
+            author=seller,
+            pet=factories.PetFactory.create(owner=seller),
+        )
+        buyer = factories.UserAccountFactory.create(balance=Decimal('100.00'))
+        bids.append(factories.BidFactory.create(
+            lot=lot, author=buyer, price=Decimal('10.00')
+        ))
+
+    def accept(bid):
+        client = APIClient()
+        client.force_authenticate(user=seller.user)
+        try:
+            return client.post(f'/api/bids/{bid.id}/accept/').status_code
+        finally:
+            connection.close()
+
+    # every bid is accepted twice at the same time
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        status_codes = list(executor.map(accept, bids * 2))
+
+    assert status_codes.count(200) == len(bids)
+    seller.refresh_from_db()
+    assert seller.balance == Decimal('10.00') * len(bids)
+    for bid in bids:
+        bid.author.refresh_from_db()
+        assert bid.author.balance == Decimal('90.00')
+        assert bid.author.reserved_amount == Decimal('0.00')
+
+
+def test_lots_are_filtered_and_ordered(api_client, user_account):
+    cat = factories.PetFactory.create(breed=constants.Breeds.CAT)
+    cheap = factories.LotFactory.create(pet=cat, status=LotStatuses.OPEN, price=Decimal('5.00'))
+    middle, expensive = [
+        factories.LotFactory.create(
+            pet__breed=constants.Breeds.HEDGEHOG, status=LotStatuses.OPEN, price=Decimal(price)
+        )
+        for price in ('15.00', '25.00')
+    ]
+    factories.LotFactory.create(status=LotStatuses.CLOSED, price=Decimal('15.00'))
+    api_client.force_authenticate(user=user_account.user)
+
+    def lot_ids(**params):
+        response = api_client.get('/api/lots/', params)
+        assert response.status_code == 200
+        return [lot['id'] for lot in response.json()['results']]
+
+    assert lot_ids(breed='cat') == [cheap.id]
+    assert lot_ids(price_min='10', price_max='20') == [middle.id]
+    assert lot_ids(author=expensive.author.user.username) == [expensive.id]
+    assert lot_ids(created_after=middle.created_at.isoformat()) == [middle.id, expensive.id]
+    assert lot_ids(created_before=middle.created_at.isoformat()) == [cheap.id]
+    assert lot_ids(ordering='-price') == [expensive.id, middle.id, cheap.id]
+    assert lot_ids(ordering='-created_at') == [expensive.id, middle.id, cheap.id]
+
+    response = api_client.get('/api/lots/', {'ordering': 'price', 'page_size': 2})
+    assert [lot['id'] for lot in response.json()['results']] == [cheap.id, middle.id]
+    response = api_client.get(response.json()['next'])
+    assert [lot['id'] for lot in response.json()['results']] == [expensive.id]
+
+    response = api_client.get('/api/lots/', {'breed': 'dog', 'price_min': 'x'})
+    assert response.status_code == 400
+    assert set(response.json()) == {'breed', 'price_min'}
+
+
+def test_lot_filters_use_indexes(api_client, user_account):
+    """
+    Open lots are a small part of many closed ones, like in production,
+    so the planner has to use indexes of open lots instead of scanning tables
+    """
+    authors = factories.UserAccountFactory.create_batch(10)
+    pets = models.Pet.objects.bulk_create(
+        models.Pet(
+            owner=authors[index % 10], name='Spike', breed=constants.Breeds.values[index % 2]
+        )
+        for index in range(5000)
+    )
+    models.Lot.objects.bulk_create(
+        models.Lot(
+            pet=pet, author_id=pet.owner_id, price=Decimal(index * 7 % 10000),
+            status=LotStatuses.OPEN if index % 10 == 0 else LotStatuses.CLOSED,
+        )
+        for index, pet in enumerate(pets)
+    )
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE core_lot, core_pet, core_useraccount, auth_user')
+    author = authors[1].user.username
+    api_client.force_authenticate(user=user_account.user)
+
+    for params, index in [
+        ({}, 'lot_open_created_idx'),
+        ({'ordering': '-created_at'}, 'lot_open_created_idx'),
+        ({'ordering': 'price'}, 'lot_open_price_idx'),
+        ({'ordering': '-price'}, 'lot_open_price_idx'),
+        ({'breed': 'cat'}, None),
+        ({'breed': 'cat', 'ordering': '-price'}, None),
+        ({'price_min': '10', 'price_max': '200'}, 'lot_open_price_idx'),
+        ({'price_min': '10', 'ordering': 'price'}, 'lot_open_price_idx'),
+        ({'author': author}, 'lot_open_author_created_idx'),
+        ({'author': author, 'ordering': '-price'}, None),
+        ({'created_after': '2022-01-01', 'created_before': '2022-02-01'}, 'lot_open_created_idx'),
+    ]:
+        with CaptureQueriesContext(connection) as context:
+            response = api_client.get('/api/lots/', params)
+        assert response.status_code == 200
+        sql = next(query['sql'] for query in context.captured_queries if 'core_lot' in query['sql'])
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN {sql}')
+            plan = '\n'.join(row[0] for row in cursor.fetchall())
+        assert 'Seq Scan on core_lot' not in plan, (params, plan)
+        assert 'Seq Scan on core_pet' not in plan, (params, plan)
+        if index is not None:
+            assert index in plan, (params, plan)
+
+
+def test_lots_list_is_cached_until_lots_change(api_client, user_account):
+    factories.LotFactory.create_batch(2, status=LotStatuses.OPEN)
+    api_client.force_authenticate(user=user_account.user)
+    response = api_client.get('/api/lots/')
+    assert len(response.json()['results']) == 2
+
+    # lots changed outside of the API are not visible until version is bumped
+    factories.LotFactory.create(status=LotStatuses.OPEN)
+    response = api_client.get('/api/lots/')
+    assert len(response.json()['results']) == 2
+
+    pet = factories.PetFactory.create(owner=user_account)
+    response = api_client.post('/api/lots/', {'pet': pet.id, 'price': '10.00'})
+    assert response.status_code == 201
+    response = api_client.get('/api/lots/')
+    assert len(response.json()['results']) == 4
+
+
+def test_lots_list_reads_bid_summaries_on_every_request(api_client, user_account, query_budget):
+    factories.LotFactory.create_batch(3, status=LotStatuses.OPEN)
+    api_client.force_authenticate(user=user_account.user)
+    # load user account in advance, as authentication does
+    user_account.user.useraccount
+    # page of lots and bid summaries of its lots
+    with query_budget(2) as recorder:
+        assert api_client.get('/api/lots/').status_code == 200
+    assert recorder.count == 2
+    # cached page costs the query of bid summaries
+    with query_budget(1) as recorder:
+        assert api_client.get('/api/lots/').status_code == 200
+    assert recorder.count == 1
+
+
+def test_lots_list_cache_is_kept_by_bids(api_client, django_capture_on_commit_callbacks):
+    lot = factories.LotFactory.create(status=LotStatuses.OPEN)
+    admin = factories.UserAccountFactory.create(
+        user__is_staff=True, balance=Decimal('100.00')
+    )
+    api_client.force_authenticate(user=admin.user)
+    etag = api_client.get('/api/lots/')['ETag']
+
+    with django_capture_on_commit_callbacks(execute=True):
+        response = api_client.post('/api/bids/', {'lot': lot.id, 'price': '5.00'})
+    assert response.status_code == 201
+    lot_list_cache.clear_local()
+    response = api_client.get('/api/lots/', HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response['ETag'] != etag
+    data = response.json()['results'][0]
+    assert (data['bid_count'], data['highest_bid'], data['highest_bidder']) == (
+        1, '5.00', admin.user.username
+    )
+    response = api_client.get('/api/cache-stats/')
+    assert response.json()['lots']['total'] == {'l1_hits': 0, 'l2_hits': 1, 'misses': 1}
+
+
+def test_cache_stats(api_client):
+    admin = factories.UserAccountFactory.create(user__is_staff=True)
+    api_client.force_authenticate(user=admin.user)
+    api_client.get('/api/lots/')
+    api_client.get('/api/lots/')
+    lot_list_cache.clear_local()
+    api_client.get('/api/lots/')
+    response = api_client.get('/api/cache-stats/')
+    assert response.status_code == 200
+    assert response.json()['lots']['total'] == {'l1_hits': 1, 'l2_hits': 1, 'misses': 1}
+
+
+def test_cache_stats_are_added_to_totals_in_batches(settings):
+    settings.API_CACHE_STATS_FLUSH_EVERY = 3
+    lot_list_cache.count('misses')
+    lot_list_cache.count('l1_hits')
+    assert cache.get('lots:stats:misses') is None
+    lot_list_cache.count('l1_hits')
+    assert cache.get_many(['lots:stats:misses', 'lots:stats:l1_hits']) == {
+        'lots:stats:misses': 1, 'lots:stats:l1_hits': 2,
+    }
+
+
+def test_lot_bid_ladder(api_client, user_account):
+    lot = factories.LotFactory.create(status=LotStatuses.OPEN)
+    for price in ('10.00', '30.00', '20.00', '30.00'):
+        factories.BidFactory.create(lot=lot, price=Decimal(price))
+    api_client.force_authenticate(user=user_account.user)
+
+    response = api_client.get(f'/api/lots/{lot.id}/ladder/', {'page_size': 3})
+    assert response.status_code == 200
+    first_page = response.json()
+    assert [bid['price'] for bid in first_page['results']] == ['30.00', '30.00', '20.00']
+    response = api_client.get(first_page['next'])
+    assert [bid['price'] for bid in response.json()['results']] == ['10.00']
+
+    response = api_client.get(f'/api/lots/{lot.id}/ladder/', {'top': 2})
+    assert response.status_code == 200
+    assert response.json() == first_page['results'][:2]
+
+
+def test_lot_best_bid(api_client, user_account):
+    lot = factories.LotFactory.create(status=LotStatuses.OPEN)
+    api_client.force_authenticate(user=user_account.user)
+    response = api_client.get(f'/api/lots/{lot.id}/best-bid/')
+    assert response.json() == {'lot': lot.id, 'bid_count': 0, 'best_bid': None}
+
+    factories.BidFactory.create(lot=lot, price=Decimal('10.00'))
+    best_bid = factories.BidFactory.create(lot=lot, price=Decimal('20.00'))
+    response = api_client.get(f'/api/lots/{lot.id}/best-bid/')
+    assert response.json()['bid_count'] == 2
+    assert response.json()['best_bid']['id'] == best_bid.id
+
+    lot.close()
+    response = api_client.get(f'/api/lots/{lot.id}/best-bid/')
+    assert response.json() == {'lot': lot.id, 'bid_count': 0, 'best_bid': None}
+
+
+@pytest.mark.parametrize('url,budget', [
+    ('/api/pets/', 2),
+    # cached page of lots and bid summaries of its lots
+    ('/api/lots/', 2),
+    ('/api/bids/', 1),
+    ('/api/lots/{lot_id}/bids/', 2),
+    ('/api/lots/{lot_id}/ladder/', 2),
+    ('/api/lots/{lot_id}/best-bid/', 2),
+])
+@pytest.mark.parametrize('size', [1, 5])
+def test_list_query_budget(api_client, user_account, query_budget, url, budget, size):
+    factories.PetFactory.create_batch(size, owner=user_account)
+    lots = factories.LotFactory.create_batch(size, status=LotStatuses.OPEN)
+    for lot in lots:
+        factories.BidFactory.create_batch(size, lot=lot)
+    api_client.force_authenticate(user=user_account.user)
+    # load user account in advance, as authentication does
+    user_account.user.useraccount
+    with query_budget(budget):
+        response = api_client.get(url.format(lot_id=lots[0].id))
+    assert response.status_code == 200
+
+
+def test_write_query_budget(api_client, user_account, query_budget):
+    user_account.user.useraccount
+    lot = factories.LotFactory.create(status=LotStatuses.OPEN)
+    pet = factories.PetFactory.create(owner=user_account)
+    api_client.force_authenticate(user=user_account.user)
+
+    with query_budget(2):
+        response = api_client.post('/api/pets/', {'name': 'Tom', 'breed': constants.Breeds.CAT})
+    assert response.status_code == 201
+    with query_budget(4):
+        response = api_client.post('/api/lots/', {'pet': pet.id, 'price': '10.00'})
+    assert response.status_code == 201
+    with query_budget(7):
+        response = api_client.post('/api/bids/', {'lot': lot.id, 'price': '0.01'})
+    assert response.status_code == 201
+
+
+def read_events(response):
+    content = response.content.decode()
+    return [block for block in content.split('\n\n') if block.startswith(('id: ', 'event: '))]
+
+
+def test_lot_events_stream(api_client, user_account, django_capture_on_commit_callbacks):
+    lot = factories.LotFactory.create(status=LotStatuses.OPEN)
+    api_client.force_authenticate(user=user_account.user)
+    with django_capture_on_commit_callbacks(execute=True):
+        bid = api_client.post('/api/bids/', {'lot': lot.id, 'price': '1.00'}).json()
+        api_client.delete(f'/api/bids/{bid["id"]}/')
+
+    response = api_client.get(
+        f'/api/lots/{lot.id}/events/', HTTP_ACCEPT='text/event-stream', HTTP_LAST_EVENT_ID='0'
+    )
+    assert response.status_code == 200
+    assert response['Content-Type'] == 'text/event-stream'
+    # WSGI workers are not held by watchers, published events are sent at once
+    assert not response.streaming
+    # ids are versions of the lot, the lot is created with version 1
+    assert read_events(response) == [
+        'id: 2\nevent: bid_placed\ndata: '
+        f'{{"id": {bid["id"]}, "price": "1.00", "author": "{user_account.user.username}"}}',
+        f'id: 3\nevent: bid_withdrawn\ndata: {{"id": {bid["id"]}}}',
+    ]
+
+    response = api_client.get(f'/api/lots/{lot.id}/events/?last_event_id=2')
+    assert [event.split('\n')[0] for event in read_events(response)] == ['id: 3']
+    response = api_client.get(f'/api/lots/{lot.id}/events/')
+    assert read_events(response) == []
+
+    # ids are kept by the database, so they are not reused when the cache is cleared
+    cache.clear()
+    with django_capture_on_commit_callbacks(execute=True):
+        api_client.post('/api/bids/', {'lot': lot.id, 'price': '2.00'})
+    response = api_client.get(f'/api/lots/{lot.id}/events/', HTTP_LAST_EVENT_ID='3')
+    assert [event.split('\n')[:2] for event in read_events(response)] == [
+        ['id: 4', 'event: bid_placed']
+    ]
+
+
+def test_lot_events_stream_resumes_from_its_first_id(
+    api_client, user_account, django_capture_on_commit_callbacks
+):
+    lot = factories.LotFactory.create(status=LotStatuses.OPEN)
+    api_client.force_authenticate(user=user_account.user)
+    response = api_client.get(f'/api/lots/{lot.id}/events/')
+    # without Last-Event-ID the stream starts from the current version
+    assert response.content.decode().split('\n\n')[0] == f'retry: 1000\nid: {lot.version}'
+    assert read_events(response) == []
+
+    with django_capture_on_commit_callbacks(execute=True):
+        api_client.post('/api/bids/', {'lot': lot.id, 'price': '1.00'})
+    # EventSource reconnects with the id of the stream
+    response = api_client.get(
+        f'/api/lots/{lot.id}/events/', HTTP_LAST_EVENT_ID=str(lot.version)
+    )
+    assert [event.split('\n')[:2] for event in read_events(response)] == [
+        [f'id: {lot.version + 1}', 'event: bid_placed']
+    ]
+
+
+def test_lot_events_stream_ends_when_lot_is_closed(
+    api_client, user_account, django_capture_on_commit_callbacks
+):
+    lot = factories.LotFactory.create(status=LotStatuses.OPEN, author=user_account)
+    bid = factories.BidFactory.create(lot=lot, price=Decimal('1.00'))
+    # the bid made by the factory has no event
+    last_event_id = lot.version
+    api_client.force_authenticate(user=user_account.user)
+    with django_capture_on_commit_callbacks(execute=True):
+        api_client.post(f'/api/bids/{bid.id}/accept/')
+
+    lot.refresh_from_db()
+    response = api_client.get(
+        f'/api/lots/{lot.id}/events/', HTTP_LAST_EVENT_ID=str(last_event_id)
+    )
+    # both events are made by one version, only the last one has its id,
+    # so a client disconnected between them receives both again
+    assert read_events(response)[0].startswith('event: bid_accepted\n')
+    assert read_events(response)[1].startswith(f'id: {lot.version}\nevent: lot_closed\n')
+    response = api_client.get(
+        f'/api/lots/{lot.id}/events/', HTTP_LAST_EVENT_ID=str(lot.version)
+    )
+    assert response.status_code == 204
+
+
+def test_lot_events_wait_for_versions_appended_out_of_order(monkeypatch):
+    read = async_to_sync(events.lot_events.aread)
+    events.lot_events.append(1, 3, events.BID_PLACED, {'id': 2})
+    # events of version 2 may be appended after its commit
+    assert read(1, 1) == []
+    events.lot_events.append(1, 2, events.BID_PLACED, {'id': 1})
+    assert [event_id for event_id, event in read(1, 1)] == [2, 3]
+
+    # events which were never appended are skipped after a while
+    events.lot_events.append(1, 5, events.BID_WITHDRAWN, {'id': 1})
+    assert [event_id for event_id, event in read(1, 3)] == []
+    monkeypatch.setattr(events, 'GAP_WAIT', 0)
+    assert [event_id for event_id, event in read(1, 3)] == [5]
+
+
+def test_place_bids_in_batch(api_client, user_account, query_budget):
+    models.UserAccount.objects.filter(pk=user_account.pk).update(balance=Decimal('10.00'))
+    lots = factories.LotFactory.create_batch(4, status=LotStatuses.OPEN)
+    closed_lot = factories.LotFactory.create(status=LotStatuses.CLOSED)
+    own_lot = factories.LotFactory.create(status=LotStatuses.OPEN, author=user_account)
+    factories.BidFactory.create(lot=lots[3], author=user_account, price=Decimal('1.00'))
+    api_client.force_authenticate(user=user_account.user)
+    user_account.user.useraccount
+
+    with query_budget(8):
+        response = api_client.post('/api/bids/batch/', [
+            {'lot': lots[0].id, 'price': '4.00'},
+            {'lot': lots[1].id, 'price': '4.00'},
+            {'lot': lots[0].id, 'price': '1.00'},
+            {'lot': lots[2].id, 'price': '2.00'},
+            {'lot': lots[3].id, 'price': '1.00'},
+            {'lot': closed_lot.id, 'price': '1.00'},
+            {'lot': own_lot.id, 'price': '1.00'},
+            {'lot': 0, 'price': '1.00'},
+            {'lot': lots[2].id},
+        ], format='json')
+    assert response.status_code == 200
+    results = response.json()
+    assert [result['status'] for result in results] == [201, 201] + [400] * 7
+    assert [result.get('code') for result in results[2:]] == [
+        'only_one_bid_allowed', 'insufficient_balance', 'only_one_bid_allowed',
+        'lot_already_closed', 'cannot_bid_in_own_lot', 'invalid', 'invalid',
+    ]
+    assert results[0]['bid']['author'] == user_account.user.username
+    assert results[8]['detail'] == {'price': ['This field is required.']}
+
+    user_account.refresh_from_db()
+    assert user_account.reserved_amount == Decimal('9.00')
+    assert models.Bid.objects.filter(author=user_account).count() == 3
+
+
+def test_bids_batch_size_is_limited(api_client, user_account, settings):
+    settings.API_MAX_BATCH_SIZE = 1
+    api_client.force_authenticate(user=user_account.user)
+    response = api_client.post('/api/bids/batch/', [{}, {}], format='json')
+    assert response.status_code == 400
+    response = api_client.post('/api/bids/batch/', {}, format='json')
+    assert response.status_code == 400
+
+
+def test_create_pets_in_bulk(api_client, user_account, query_budget):
+    api_client.force_authenticate(user=user_account.user)
+    user_account.user.useraccount
+    with query_budget(2):
+        response = api_client.post('/api/pets/bulk/', [
+            {'name': 'Tom', 'breed': constants.Breeds.CAT},
+            {'name': 'Sonic', 'breed': 'dog'},
+            {'name': 'Spike', 'breed': constants.Breeds.HEDGEHOG},
+        ], format='json')
+    assert response.status_code == 200
+    results = response.json()
+    assert [result['status'] for result in results] == [201, 400, 201]
+    assert results[1]['detail'] == {'breed': ['"dog" is not a valid choice.']}
+    assert results[2]['pet']['name'] == 'Spike'
+    assert list(
+        models.Pet.objects.filter(owner=user_account).order_by('id').values_list('name', flat=True)
+    ) == ['Tom', 'Spike']
+
+
+def test_create_lots_in_bulk(api_client, user_account, query_budget):
+    pets = factories.PetFactory.create_batch(3, owner=user_account)
+    factories.LotFactory.create(pet=pets[2], author=user_account, status=LotStatuses.OPEN)
+    others_pet = factories.PetFactory.create()
+    api_client.force_authenticate(user=user_account.user)
+    user_account.user.useraccount
+
+    with query_budget(5):
+        response = api_client.post('/api/lots/bulk/', [
+            {'pet': pets[0].id, 'price': '10.00'},
+            {'pet': pets[1].id, 'price': '20.00'},
+            {'pet': pets[0].id, 'price': '30.00'},
+            {'pet': pets[2].id, 'price': '10.00'},
+            {'pet': others_pet.id, 'price': '10.00'},
+            {'pet': 0, 'price': '10.00'},
+            {'pet': pets[1].id},
+        ], format='json')
+    assert response.status_code == 200
+    results = response.json()
+    assert [result['status'] for result in results] == [201, 201] + [400] * 5
+    assert [result.get('code') for result in results[2:]] == [
+        'lot_exists', 'lot_exists', 'user_not_own_pet', 'invalid', 'invalid',
+    ]
+    assert results[1]['lot'] == {
+        'id': results[1]['lot']['id'],
+        'pet': {'id': pets[1].id, 'name': pets[1].name, 'breed': pets[1].breed},
+        'price': '20.00',
+        'author': user_account.user.username,
+        'ends_at': None,
+        'bid_count': 0,
+        'highest_bid': None,
+        'highest_bidder': None,
+    }
+    assert models.Lot.objects.filter(author=user_account, status=LotStatuses.OPEN).count() == 3
+
+
+def test_export_is_streamed_to_staff(api_client, user_account):
+    factories.PetFactory.create_batch(3)
+    api_client.force_authenticate(user=user_account.user)
+    response = api_client.get('/api/export/pets/')
+    assert response.status_code == 403
+
+    user_account.user.is_staff = True
+    user_account.user.save()
+    response = api_client.get('/api/export/pets/?file_format=jsonl&from=2000-01-01')
+    assert response.status_code == 200
+    assert response.streaming
+    assert response['Content-Type'] == 'application/x-ndjson'
+    assert len(b''.join(response.streaming_content).splitlines()) == 3
+
+    response = api_client.get('/api/export/pets/?status=open')
+    assert response.status_code == 400
+    response = api_client.get('/api/export/users/')
+    assert response.status_code == 404
+
+
+def test_token_authentication(api_client, user_account):
+    response = api_client.post('/api/login/', {
+        'username': user_account.user.username, 'password': 'wrong'
+    })
+    assert response.status_code == 400
+    response = api_client.post('/api/login/', {
+        'username': user_account.user.username, 'password': 'password'
+    })
+    assert response.status_code == 201
+    token = response.json()['token']
+    assert models.AuthToken.objects.get().digest != token
+
+    api_client.credentials(HTTP_AUTHORIZATION=f'Token {token}')
+    with QueryRecorder() as recorder:
+        response = api_client.get('/api/pets/')
+    assert response.status_code == 200
+    # token, user and user account are loaded with one query,
+    # then version of the account and pets
+    assert recorder.count == 3
+    # verified token is cached
+    with QueryRecorder() as recorder:
+        response = api_client.get('/api/pets/')
+    assert response.status_code == 200
+    assert recorder.count == 2
+
+    response = api_client.post('/api/logout/')
+    assert response.status_code == 200
+    assert not models.AuthToken.objects.exists()
+    response = api_client.get('/api/pets/')
+    assert response.status_code == 401
+
+
+def test_expired_token_is_rejected(api_client, user_account):
+    token, key = models.AuthToken.issue(user_account.user)
+    models.AuthToken.objects.filter(pk=token.pk).update(expires_at=timezone.now())
+    api_client.credentials(HTTP_AUTHORIZATION=f'Token {key}')
+    response = api_client.get('/api/pets/')
+    assert response.status_code == 401
+    api_client.credentials(HTTP_AUTHORIZATION='Token invalid')
+    response = api_client.get('/api/pets/')
+    assert response.status_code == 401
+
+
+def test_logout_revokes_all_tokens(api_client, user_account):
+    models.AuthToken.issue(user_account.user)
+    models.AuthToken.issue(factories.UserFactory.create())
+    api_client.force_authenticate(user=user_account.user)
+    response = api_client.post('/api/logout/', {'all': True}, format='json')
+    assert response.status_code == 200
+    assert not models.AuthToken.objects.filter(user=user_account.user).exists()
+    assert models.AuthToken.objects.count() == 1
+
+
+def test_basic_auth_loads_user_account_with_user(api_client, user_account, query_budget):
+    api_client.credentials(HTTP_AUTHORIZATION='Basic ' + b64encode(
+        f'{user_account.user.username}:password'.encode()
+    ).decode())
+    # user with account, then version of the account and pets
+    with query_budget(3):
+        response = api_client.get('/api/pets/')
+    assert response.status_code == 200
+
+
+def test_author_checks_query_budget(api_client, user_account, query_budget):
+    user_account.user.useraccount
+    api_client.force_authenticate(user=user_account.user)
+    lot = factories.LotFactory.create(status=LotStatuses.OPEN)
+    bid = factories.BidFactory.create(lot=lot, author=user_account, price=Decimal('1.00'))
+    # withdrawn bid is not the highest one, so the lot only decrements bid count
+    with query_budget(7):
+        response = api_client.delete(f'/api/bids/{bid.id}/')
+    assert response.status_code == 200
+
+    own_lot = factories.LotFactory.create(status=LotStatuses.OPEN, author=user_account)
+    # closing reads the new version of the lot, which is the id of the event
+    with query_budget(7):
+        response = api_client.post(f'/api/lots/{own_lot.id}/close/')
+    assert response.status_code == 200
+
+    own_lot = factories.LotFactory.create(status=LotStatuses.OPEN, author=user_account)
+    bid = factories.BidFactory.create(lot=own_lot, price=Decimal('1.00'))
+    # pet owners' accounts are bumped with one UPDATE,
+    # the bid is read again after the lot is locked,
+    # the transfer is made in a savepoint,
+    # bidders' accounts are locked before their funds are released
+    with query_budget(17):
+        response = api_client.post(f'/api/bids/{bid.id}/accept/')
+    assert response.status_code == 200
+
+
+def test_lot_bid_summary(api_client, user_account):
+    lot = factories.LotFactory.create(status=LotStatuses.OPEN)
+    bidders = factories.UserAccountFactory.create_batch(3, balance=Decimal('100.00'))
+    clients = []
+    for bidder in bidders:
+        client = APIClient()
+        client.force_authenticate(user=bidder.user)
+        clients.append(client)
+
+    def summary():
+        lot.refresh_from_db()
+        bidder = lot.highest_bidder and lot.highest_bidder.user.username
+        price = lot.highest_bid_price and str(lot.highest_bid_price)
+        return lot.bid_count, price, bidder
+
+    bid_ids = []
+    for client, price in zip(clients, ('5.00', '9.00', '9.00')):
+        response = client.post('/api/bids/', {'lot': lot.id, 'price': price})
+        assert response.status_code == 201
+        bid_ids.append(response.json()['id'])
+    assert response.json()['lot']['bid_count'] == 3
+    # earlier bid wins a tie
+    assert summary() == (3, '9.00', bidders[1].user.username)
+
+    assert clients[0].delete(f'/api/bids/{bid_ids[0]}/').status_code == 200
+    assert summary() == (2, '9.00', bidders[1].user.username)
+    assert clients[1].delete(f'/api/bids/{bid_ids[1]}/').status_code == 200
+    assert summary() == (1, '9.00', bidders[2].user.username)
+    assert clients[2].delete(f'/api/bids/{bid_ids[2]}/').status_code == 200
+    assert summary() == (0, None, None)
+
+    response = clients[0].post(
+        '/api/bids/batch/', [{'lot': lot.id, 'price': '3.00'}], format='json'
+    )
+    assert response.json()[0]['status'] == 201
+    assert summary() == (1, '3.00', bidders[0].user.username)
+
+    api_client.force_authenticate(user=user_account.user)
+    data = api_client.get('/api/lots/').json()['results'][0]
+    assert (data['bid_count'], data['highest_bid'], data['highest_bidder']) == summary()
+
+
+@pytest.mark.parametrize('url,budget', [
+    ('/api/pets/', 1),
+    ('/api/lots/?ordering=price', 0),
+    ('/api/lots/{lot_id}/bids/', 1),
+    ('/api/lots/{lot_id}/ladder/?top=5', 1),
+])
+def test_unchanged_listings_are_not_modified(api_client, user_account, query_budget, url, budget):
+    factories.PetFactory.create(owner=user_account)
+    lot = factories.LotFactory.create(status=LotStatuses.OPEN)
+    factories.BidFactory.create(lot=lot)
+    api_client.force_authenticate(user=user_account.user)
+    user_account.user.useraccount
+    url = url.format(lot_id=lot.id)
+
+    etag = api_client.get(url)['ETag']
+    assert etag.startswith('W/"')
+    with query_budget(budget):
+        response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 304
+    assert response['ETag'] == etag
+    assert not response.content
+
+    response = api_client.get(url, HTTP_IF_NONE_MATCH='W/"outdated"')
+    assert response.status_code == 200
+    assert response['ETag'] == etag
+
+
+def test_listing_etags_change_with_versions(api_client, django_capture_on_commit_callbacks):
+    user_account = factories.UserAccountFactory.create(balance=Decimal('100.00'))
+    pet = factories.PetFactory.create(owner=user_account)
+    lot = factories.LotFactory.create(pet=pet, author=user_account, status=LotStatuses.OPEN)
+    bidder = factories.UserAccountFactory.create(balance=Decimal('100.00'))
+    bidder_client = APIClient()
+    bidder_client.force_authenticate(user=bidder.user)
+    api_client.force_authenticate(user=user_account.user)
+    urls = {
+        'pets': '/api/pets/',
+        'bidder_pets': '/api/pets/',
+        'lots': '/api/lots/',
+        'bids': f'/api/lots/{lot.id}/bids/',
+    }
+
+    def etags():
+        return {
+            name: (bidder_client if name == 'bidder_pets' else api_client).get(url)['ETag']
+            for name, url in urls.items()
+        }
+
+    def changed(before):
+        after = etags()
+        return {name for name in urls if after[name] != before[name]}
+
+    before = etags()
+    response = api_client.post('/api/pets/', {'name': 'Tom', 'breed': constants.Breeds.CAT})
+    assert response.status_code == 201
+    assert changed(before) == {'pets'}
+
+    before = etags()
+    with django_capture_on_commit_callbacks(execute=True):
+        response = bidder_client.post('/api/bids/', {'lot': lot.id, 'price': '5.00'})
+    assert response.status_code == 201
+    assert changed(before) == {'lots', 'bids'}
+
+    before = etags()
+    with django_capture_on_commit_callbacks(execute=True):
+        response = bidder_client.delete(f'/api/bids/{response.json()["id"]}/')
+    assert response.status_code == 200
+    assert changed(before) == {'lots', 'bids'}
+
+    bid = factories.BidFactory.create(lot=lot, author=bidder, price=Decimal('5.00'))
+    before = etags()
+    with django_capture_on_commit_callbacks(execute=True):
+        response = api_client.post(f'/api/bids/{bid.id}/accept/')
+    assert response.status_code == 200
+    assert changed(before) == {'pets', 'bidder_pets', 'lots', 'bids'}
+
+
+def test_archived_lots(api_client, user_account):
+    lot = factories.LotFactory.create(author=user_account, status=LotStatuses.CLOSED)
+    factories.LotFactory.create(status=LotStatuses.CLOSED)
+    bids = factories.BidFactory.create_batch(3, lot=lot)
+    models.ArchivedLot.archive(list(models.Lot.objects.values_list('pk', flat=True)))
+    api_client.force_authenticate(user=user_account.user)
+
+    response = api_client.get('/api/archive/lots/', {'page_size': 1})
+    assert response.status_code == 200
+    assert len(response.data['results']) == 1
+    assert response.data['next'] is not None
+
+    response = api_client.get('/api/archive/lots/', {'author': user_account.user.username})
+    assert [item['id'] for item in response.data['results']] == [lot.pk]
+    assert response.data['results'][0]['pet'] == {
+        'id': lot.pet.pk, 'name': lot.pet.name, 'breed': lot.pet.breed
+    }
+
+    response = api_client.get(f'/api/archive/lots/{lot.pk}/')
+    assert response.status_code == 200
+    assert response.data['price'] == str(lot.price)
+
+    response = api_client.get(f'/api/archive/lots/{lot.pk}/bids/')
+    assert [item['id'] for item in response.data['results']] == [bid.pk for bid in bids]
+
+    assert api_client.get('/api/archive/lots/0/').status_code == 404
+    assert api_client.get('/api/archive/lots/', {'pet': 'x'}).status_code == 400
+
+
+def test_market_stats_are_maintained_incrementally(
+    api_client, user_account, django_capture_on_commit_callbacks
+):
+    bidder = factories.UserAccountFactory.create(balance=Decimal('100.00'))
+    bidder_client = APIClient()
+    bidder_client.force_authenticate(user=bidder.user)
+    api_client.force_authenticate(user=user_account.user)
+
+    def request(client, method, url, data=None):
+        with django_capture_on_commit_callbacks(execute=True):
+            response = getattr(client, method)(url, data, format='json')
+        assert response.status_code in (200, 201), response.content
+        return response.json() if response.content else None
+
+    lot_ids = [
+        request(api_client, 'post', '/api/lots/', {
+            'pet': factories.PetFactory.create(owner=user_account, breed=constants.Breeds.CAT).id,
+            'price': price,
+        })['id']
+        for price in ('10.00', '20.00', '30.00')
+    ]
+    bid_ids = [
+        request(bidder_client, 'post', '/api/bids/', {'lot': lot_id, 'price': price})['id']
+        for lot_id, price in zip(lot_ids, ('5.00', '7.00', '3.00'))
+    ]
+    request(bidder_client, 'delete', f'/api/bids/{bid_ids[2]}/')
+    request(api_client, 'post', f'/api/bids/{bid_ids[0]}/accept/')
+    request(api_client, 'post', f'/api/lots/{lot_ids[1]}/close/')
+
+    data = request(api_client, 'get', '/api/market-stats/')
+    assert data == {
+        'breeds': [{
+            'breed': 'cat',
+            'open_lots': 1,
+            'average_price': '30.00',
+            'open_bids': 0,
+            'sold_lots': 1,
+            'average_winning_bid': '5.00',
+        }],
+        'daily': [{
+            'date': str(timezone.localdate()),
+            'lots_created': 3,
+            'bids_placed': 2,
+            'sales': 1,
+            'sales_amount': '5.00',
+        }],
+    }
+
+    call_command('rebuild_market_stats', chunk_size=2, stdout=StringIO())
+    assert request(api_client, 'get', '/api/market-stats/') == data
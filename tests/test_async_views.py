@@ -0,0 +1,133 @@
+import asyncio
+import time
+from base64 import b64encode
+
+import pytest
+from asgiref.sync import async_to_sync, sync_to_async
+from django.test import AsyncClient
+
+from auction.api.events import BID_PLACED, lot_events
+from auction.core import models
+from auction.core.constants import LotStatuses
+from tests import factories
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def marketplace(user_account):
+    factories.PetFactory.create_batch(3, owner=user_account)
+    lots = factories.LotFactory.create_batch(3, status=LotStatuses.OPEN)
+    factories.LotFactory.create(status=LotStatuses.CLOSED)
+    for lot in lots:
+        factories.BidFactory.create_batch(3, lot=lot)
+    return lots
+
+
+@pytest.mark.parametrize('url', [
+    '/api/{prefix}pets/',
+    '/api/{prefix}lots/',
+    '/api/{prefix}bids/',
+    '/api/{prefix}lots/{lot_id}/bids/',
+])
+def test_async_views_return_the_same_output(api_client, user_account, marketplace, url):
+    api_client.force_authenticate(user=user_account.user)
+    lot_id = marketplace[0].id
+    expected = api_client.get(url.format(prefix='', lot_id=lot_id), {'page_size': 2})
+    response = api_client.get(url.format(prefix='async/', lot_id=lot_id), {'page_size': 2})
+    assert response.status_code == 200
+    assert response['Content-Type'] == 'application/json'
+    assert response.json()['results'] == expected.json()['results']
+    assert response.get('ETag') == expected.get('ETag')
+    if expected.has_header('ETag'):
+        not_modified = api_client.get(
+            url.format(prefix='async/', lot_id=marketplace[0].id),
+            HTTP_IF_NONE_MATCH=expected['ETag'],
+        )
+        assert not_modified.status_code == 304
+
+    next_page = api_client.get(response.json()['next'])
+    expected_next_page = api_client.get(expected.json()['next'])
+    assert next_page.json()['results'] == expected_next_page.json()['results']
+
+
+def test_async_views_authenticate_with_basic_auth(user_account, marketplace):
+    client = AsyncClient()
+    response = async_to_sync(client.get)('/api/async/pets/')
+    assert response.status_code == 401
+    assert response['WWW-Authenticate'] == 'Basic realm="api"'
+
+    credentials = b64encode(f'{user_account.user.username}:password'.encode()).decode()
+    # async client of Django 4.1 sends extra arguments as plain header names
+    response = async_to_sync(client.get)(
+        '/api/async/pets/', authorization=f'Basic {credentials}'
+    )
+    assert response.status_code == 200
+    assert len(response.json()['results']) == 3
+
+
+def test_async_views_require_useraccount(api_client):
+    api_client.force_authenticate(user=factories.UserFactory.create())
+    response = api_client.get('/api/async/lots/')
+    assert response.status_code == 403
+
+
+def test_async_lot_bids_of_missing_lot(api_client, user_account):
+    api_client.force_authenticate(user=user_account.user)
+    response = api_client.get('/api/async/lots/0/bids/')
+    assert response.status_code == 404
+    assert response.json() == {'detail': 'Not found.'}
+
+
+def test_async_views_reject_writes(api_client, user_account):
+    api_client.force_authenticate(user=user_account.user)
+    response = api_client.post('/api/async/pets/', {'name': 'Tom'})
+    assert response.status_code == 405
+
+
+@pytest.mark.django_db(transaction=True)
+def test_lot_events_are_streamed_without_blocking_event_loop(user_account, settings, asgi_get):
+    settings.LOT_EVENTS_POLL_INTERVAL = 1
+    settings.LOT_EVENTS_STREAM_DURATION = 3
+    lot = factories.LotFactory.create(status=LotStatuses.OPEN)
+    token, key = models.AuthToken.issue(user_account.user)
+    headers = {'Authorization': f'Token {key}'}
+
+    async def watch():
+        stream = asyncio.ensure_future(asgi_get(f'/api/lots/{lot.id}/events/', headers))
+        await asyncio.sleep(0.2)
+        # other requests are served while the stream waits for events
+        started = time.perf_counter()
+        response = await asgi_get('/api/async/pets/', headers)
+        assert response.status_code == 200
+        assert time.perf_counter() - started < 0.5
+        assert not stream.done()
+        await sync_to_async(lot_events.append)(lot.pk, 2, BID_PLACED, {'id': 1})
+        return await stream
+
+    response = async_to_sync(watch)()
+    assert response.status_code == 200
+    assert response.headers['Content-Type'] == 'text/event-stream'
+    assert response.content.decode() == (
+        'retry: 1000\nid: 1\n\n'
+        'id: 2\nevent: bid_placed\ndata: {"id": 1}\n\n'
+    )
+
+
+@pytest.mark.django_db(transaction=True)
+def test_export_is_streamed_by_asgi_server(user_account, settings, asgi_get):
+    # rows are fetched in several batches
+    settings.EXPORT_CHUNK_SIZE = 2
+    pets = factories.PetFactory.create_batch(5)
+    user_account.user.is_staff = True
+    user_account.user.save()
+    token, key = models.AuthToken.issue(user_account.user)
+
+    response = async_to_sync(asgi_get)(
+        '/api/export/pets/', {'Authorization': f'Token {key}'}
+    )
+    assert response.status_code == 200
+    assert response.headers['Content-Type'].startswith('text/csv')
+    header, *rows = response.content.decode().splitlines()
+    assert header.startswith('id,')
+    assert [int(row.split(',')[0]) for row in rows] == [pet.id for pet in pets]
@@ -0,0 +1,280 @@
+import json
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from auction.core import models
+from auction.core.constants import LotStatuses
+from tests import factories
+
+pytestmark = pytest.mark.django_db
+
+
+def test_reconcile_reserved_funds_repairs_drift(user_account):
+    lot = factories.LotFactory.create(status=LotStatuses.OPEN)
+    closed_lot = factories.LotFactory.create(status=LotStatuses.CLOSED)
+    factories.BidFactory.create(lot=lot, author=user_account, price=Decimal('10.00'))
+    factories.BidFactory.create(lot=closed_lot, author=user_account, price=Decimal('5.00'))
+    models.UserAccount.objects.filter(pk=user_account.pk).update(
+        reserved_amount=Decimal('99.00')
+    )
+    call_command('reconcile_reserved_funds', chunk_size=1)
+    user_account.refresh_from_db()
+    assert user_account.reserved_amount == Decimal('10.00')
+
+
+def test_reconcile_reserved_funds_dry_run(user_account):
+    models.UserAccount.objects.filter(pk=user_account.pk).update(
+        reserved_amount=Decimal('99.00')
+    )
+    call_command('reconcile_reserved_funds', dry_run=True)
+    user_account.refresh_from_db()
+    assert user_account.reserved_amount == Decimal('99.00')
+
+
+def test_seed_marketplace():
+    call_command(
+        'seed_marketplace', users=20, pets_per_user=3, bids_per_lot=4,
+        balance=Decimal('50.00'), seed=1, batch_size=7,
+    )
+    assert models.UserAccount.objects.count() == 20
+    assert models.Pet.objects.count() == 60
+    assert models.Lot.objects.exists()
+    assert models.Bid.objects.exists()
+    assert not models.Bid.objects.filter(author=F('lot__author')).exists()
+    assert sum(models.BreedStats.objects.values_list('open_lots', flat=True)) == (
+        models.Lot.objects.filter(status=LotStatuses.OPEN).count()
+    )
+    for account in models.UserAccount.objects.all():
+        open_bids_sum = account.bids.filter(
+            lot__status=LotStatuses.OPEN
+        ).aggregate(price_sum=Sum('price'))['price_sum'] or Decimal('0.00')
+        assert account.reserved_amount == open_bids_sum
+        assert account.available_balance >= 0
+
+
+def test_seed_marketplace_is_deterministic():
+    def seeded_prices(prefix):
+        call_command('seed_marketplace', users=10, seed=42, username_prefix=prefix)
+        return list(models.Bid.objects.filter(
+            author__user__username__startswith=prefix
+        ).order_by('id').values_list('price', flat=True))
+
+    assert seeded_prices('first') == seeded_prices('second')
+
+
+@pytest.mark.django_db(transaction=True)
+def test_replay_workload(tmp_path):
+    report_path = tmp_path / 'report.json'
+    call_command(
+        'replay_workload', requests=60, concurrency=3, users=4, seed=1,
+        mix='create_pet=3,create_lot=3,list_lots=2,place_bid=4,delete_bid=1,accept=1,close=1',
+        json_path=str(report_path), stdout=StringIO(),
+    )
+    report = json.loads(report_path.read_text())
+    assert report['requests'] + sum(
+        stats['skipped'] for stats in report['operations'].values()
+    ) == 60
+    for operation, stats in report['operations'].items():
+        assert not stats['errors'], operation
+        assert all(int(code) < 500 for code in stats['status_codes']), operation
+    assert report['operations']['create_pet']['status_codes'] == {
+        '201': report['operations']['create_pet']['count']
+    }
+    # funds reserved by bids which are still open match the reserved amounts
+    for account in models.UserAccount.objects.all():
+        reserved = models.Bid.objects.filter(
+            author=account, lot__status=LotStatuses.OPEN
+        ).aggregate(total=Sum('price'))['total'] or Decimal('0.00')
+        assert account.reserved_amount == reserved
+
+
+def test_replay_workload_rejects_unknown_operation():
+    with pytest.raises(CommandError):
+        call_command('replay_workload', mix='list_lots=1,fly=2')
+
+
+def test_export_data_csv():
+    open_lot = factories.LotFactory.create(status=LotStatuses.OPEN, price=Decimal('12.50'))
+    factories.LotFactory.create(status=LotStatuses.CLOSED)
+    stdout = StringIO()
+    call_command('export_data', 'lots', status='open', stdout=stdout)
+    lines = stdout.getvalue().splitlines()
+    assert lines[0] == 'id,pet,pet_name,breed,author,price,status,created_at'
+    assert len(lines) == 2
+    assert lines[1].startswith(
+        f'{open_lot.id},{open_lot.pet_id},{open_lot.pet.name},{open_lot.pet.breed},'
+        f'{open_lot.author.user.username},12.50,open,'
+    )
+
+
+def test_export_data_jsonl(tmp_path):
+    bids = factories.BidFactory.create_batch(3)
+    output = tmp_path / 'bids.jsonl'
+    call_command(
+        'export_data', 'bids', file_format='jsonl', date_from='2000-01-01',
+        chunk_size=2, output=str(output), stdout=StringIO(),
+    )
+    rows = [json.loads(line) for line in output.read_text().splitlines()]
+    assert [row['id'] for row in rows] == [bid.id for bid in bids]
+    assert rows[0]['price'] == str(bids[0].price)
+
+    call_command(
+        'export_data', 'bids', date_to='2000-01-01', output=str(output), stdout=StringIO()
+    )
+    assert len(output.read_text().splitlines()) == 1
+
+
+def test_export_data_rejects_invalid_filters():
+    with pytest.raises(CommandError):
+        call_command('export_data', 'accounts', status='open')
+    with pytest.raises(CommandError):
+        call_command('export_data', 'lots', date_from='yesterday')
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_provision_users_csv(tmp_path, settings, workers):
+    settings.PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+    existing = factories.UserAccountFactory.create()
+    path = tmp_path / 'users.csv'
+    path.write_text(
+        'username,password,balance\n'
+        'alice,secret1,50.00\n'
+        'bob,secret2,\n'
+        f'{existing.user.username},secret3,10.00\n'
+        'alice,secret4,10.00\n'
+        ',secret5,\n'
+    )
+    stderr = StringIO()
+    call_command('provision_users', str(path), workers=workers, batch_size=2, stderr=stderr)
+
+    alice = models.UserAccount.objects.select_related('user').get(user__username='alice')
+    bob = models.UserAccount.objects.select_related('user').get(user__username='bob')
+    assert alice.balance == Decimal('50.00')
+    assert bob.balance == settings.DEFAULT_USER_BALANCE
+    assert alice.user.check_password('secret1')
+    assert bob.user.check_password('secret2')
+    assert models.UserAccount.objects.count() == 3
+    assert 'Line 6' in stderr.getvalue()
+
+
+def test_provision_users_jsonl(tmp_path):
+    path = tmp_path / 'users.jsonl'
+    path.write_text(
+        '{"username": "carol", "password": "secret"}\n'
+        'not json\n'
+    )
+    stderr = StringIO()
+    call_command('provision_users', str(path), workers=1, balance=Decimal('7.00'), stderr=stderr)
+    account = models.UserAccount.objects.get(user__username='carol')
+    assert account.balance == Decimal('7.00')
+    assert 'Line 2: Invalid record' in stderr.getvalue()
+
+
+def test_archive_lots_moves_old_closed_lots():
+    old = timezone.now() - timedelta(days=100)
+    archived = factories.LotFactory.create_batch(3, status=LotStatuses.CLOSED)
+    for lot in archived:
+        factories.BidFactory.create_batch(2, lot=lot)
+    recent = factories.LotFactory.create(status=LotStatuses.CLOSED)
+    old_open = factories.LotFactory.create(status=LotStatuses.OPEN)
+    recently_closed = factories.LotFactory.create(
+        status=LotStatuses.CLOSED, closed_at=timezone.now()
+    )
+    models.Lot.objects.exclude(pk=recent.pk).update(created_at=old)
+    models.Lot.objects.filter(pk=archived[0].pk).update(closed_at=old)
+
+    out = StringIO()
+    call_command('archive_lots', older_than=90, chunk_size=2, stdout=out)
+
+    assert 'Archived 3 lots and 6 bids' in out.getvalue()
+    assert set(models.Lot.objects.values_list('pk', flat=True)) == {
+        recent.pk, old_open.pk, recently_closed.pk
+    }
+    assert set(models.ArchivedLot.objects.values_list('pk', flat=True)) == {
+        lot.pk for lot in archived
+    }
+    assert not models.Bid.objects.exists()
+    archived_lot = models.ArchivedLot.objects.get(pk=archived[0].pk)
+    assert archived_lot.price == archived[0].price
+    assert archived_lot.created_at == old
+    assert archived_lot.bids.count() == 2
+
+
+def test_archive_lots_limit():
+    factories.LotFactory.create_batch(3, status=LotStatuses.CLOSED)
+    call_command('archive_lots', older_than=0, limit=2, stdout=StringIO())
+    assert models.ArchivedLot.objects.count() == 2
+    assert models.Lot.objects.count() == 1
+
+
+def test_expire_lots_closes_ended_lots(user_account):
+    ended = timezone.now() - timedelta(minutes=1)
+    expired = factories.LotFactory.create_batch(3, status=LotStatuses.OPEN, ends_at=ended)
+    running = factories.LotFactory.create(
+        status=LotStatuses.OPEN, ends_at=timezone.now() + timedelta(days=1)
+    )
+    endless = factories.LotFactory.create(status=LotStatuses.OPEN)
+    factories.BidFactory.create(lot=expired[0], author=user_account, price=Decimal('10.00'))
+
+    out = StringIO()
+    call_command('expire_lots', batch_size=2, stdout=out)
+
+    assert 'Closed 3 lots, settled 0' in out.getvalue()
+    assert set(models.Lot.objects.filter(status=LotStatuses.OPEN).values_list(
+        'pk', flat=True
+    )) == {running.pk, endless.pk}
+    user_account.refresh_from_db()
+    assert user_account.reserved_amount == Decimal('0.00')
+
+
+def test_expire_lots_settles_highest_bid():
+    lot = factories.LotFactory.create(
+        status=LotStatuses.OPEN, ends_at=timezone.now() - timedelta(minutes=1)
+    )
+    loser, winner = factories.UserAccountFactory.create_batch(2, balance=Decimal('100.00'))
+    factories.BidFactory.create(lot=lot, author=loser, price=Decimal('20.00'))
+    factories.BidFactory.create(lot=lot, author=winner, price=Decimal('30.00'))
+    author_balance = lot.author.balance
+
+    call_command('expire_lots', settle=True, stdout=StringIO())
+
+    for instance in (lot, lot.pet, lot.author, winner, loser):
+        instance.refresh_from_db()
+    assert lot.is_closed
+    assert lot.pet.owner_id == winner.pk
+    assert lot.author.balance == author_balance + Decimal('30.00')
+    assert winner.balance == Decimal('70.00')
+    assert winner.reserved_amount == Decimal('0.00')
+    assert loser.balance == Decimal('100.00')
+    assert loser.reserved_amount == Decimal('0.00')
+
+
+def test_rebuild_market_stats_includes_archive():
+    open_lot = factories.LotFactory.create(
+        status=LotStatuses.OPEN, price=Decimal('10.00'), pet__breed='cat'
+    )
+    factories.BidFactory.create(lot=open_lot)
+    sold = factories.LotFactory.create(
+        status=LotStatuses.CLOSED, pet__breed='cat',
+        closed_at=timezone.now(), sold_price=Decimal('4.00'),
+    )
+    factories.BidFactory.create(lot=sold, price=Decimal('4.00'))
+    models.ArchivedLot.archive([sold.pk])
+    models.BreedStats.objects.create(breed='hedgehog', open_lots=5)
+
+    call_command('rebuild_market_stats', chunk_size=1, stdout=StringIO())
+
+    cat = models.BreedStats.objects.get()
+    assert (cat.breed, cat.open_lots, cat.open_lots_price, cat.open_bids) == (
+        'cat', 1, Decimal('10.00'), 1
+    )
+    assert (cat.sold_lots, cat.sold_price) == (1, Decimal('4.00'))
+    daily = models.DailyStats.objects.get()
+    assert (daily.lots_created, daily.bids_placed, daily.sales) == (2, 2, 1)
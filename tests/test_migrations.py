@@ -0,0 +1,59 @@
+from decimal import Decimal
+
+import pytest
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+
+
+@pytest.fixture
+def migrate():
+    """
+    Migrates core app to given migration and returns historical apps,
+    the database is migrated back to the latest state afterwards
+    """
+    executor = MigrationExecutor(connection)
+    latest = executor.loader.graph.leaf_nodes('core')
+
+    def migrate_to(name):
+        executor.loader.build_graph()
+        executor.migrate([('core', name)])
+        return executor.loader.project_state([('core', name)]).apps
+
+    yield migrate_to
+    executor.loader.build_graph()
+    executor.migrate(latest)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_constraints_migration_removes_duplicates(migrate):
+    apps = migrate('0003_keyset_pagination_indexes')
+    User = apps.get_model('auth', 'User')
+    UserAccount = apps.get_model('core', 'UserAccount')
+    Pet = apps.get_model('core', 'Pet')
+    Lot = apps.get_model('core', 'Lot')
+    Bid = apps.get_model('core', 'Bid')
+
+    seller, bidder = [
+        UserAccount.objects.create(
+            user=User.objects.create(username=username), balance=Decimal('100.00'),
+            reserved_amount=reserved,
+        )
+        for username, reserved in (('seller', Decimal('0.00')), ('bidder', Decimal('18.00')))
+    ]
+    pet = Pet.objects.create(owner=seller, breed='cat', name='Tom')
+    old_lot, new_lot = [
+        Lot.objects.create(pet=pet, author=seller, price=Decimal('1.00'), status=0)
+        for _ in range(2)
+    ]
+    Bid.objects.create(lot=old_lot, author=bidder, price=Decimal('3.00'))
+    Bid.objects.create(lot=new_lot, author=bidder, price=Decimal('5.00'))
+    highest = Bid.objects.create(lot=new_lot, author=bidder, price=Decimal('7.00'))
+    Bid.objects.create(lot=new_lot, author=bidder, price=Decimal('3.00'))
+
+    apps = migrate('0004_bid_lot_constraints')
+    Lot = apps.get_model('core', 'Lot')
+    Bid = apps.get_model('core', 'Bid')
+    UserAccount = apps.get_model('core', 'UserAccount')
+    assert dict(Lot.objects.values_list('pk', 'status')) == {old_lot.pk: 1, new_lot.pk: 0}
+    assert list(Bid.objects.filter(lot=new_lot.pk).values_list('pk', flat=True)) == [highest.pk]
+    assert UserAccount.objects.get(pk=bidder.pk).reserved_amount == Decimal('7.00')
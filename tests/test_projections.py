@@ -0,0 +1,57 @@
+from datetime import timedelta
+from decimal import Decimal
+
+import pytest
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from auction.api import projections, serializers
+from auction.core import models
+from auction.core.constants import LotStatuses
+from tests import factories
+
+pytestmark = pytest.mark.django_db
+
+
+def render(data):
+    return JSONRenderer().render(data)
+
+
+@pytest.fixture
+def bids():
+    lot = factories.LotFactory.create(
+        status=LotStatuses.OPEN, price=Decimal('5.1'), ends_at=timezone.now() + timedelta(days=1)
+    )
+    bids = [
+        factories.BidFactory.create(lot=lot, price=Decimal('0.01')),
+        factories.BidFactory.create(lot=lot, price=Decimal('12345678.90')),
+        factories.BidFactory.create(),
+    ]
+    models.Lot.objects.update(**models.Lot.bid_summary())
+    return bids
+
+
+def test_pet_projection_matches_serializer(bids):
+    queryset = models.Pet.objects.order_by('id')
+    assert render(projections.pet.represent_many(projections.pet.values(queryset))) == render(
+        serializers.PetSerializer(queryset, many=True).data
+    )
+
+
+def test_lot_projection_matches_serializer(bids):
+    queryset = models.Lot.objects.order_by('id')
+    projection = projections.lot_display
+    assert render(projection.represent_many(projection.values(queryset))) == render(
+        serializers.LotDisplaySerializer(queryset, many=True).data
+    )
+
+
+def test_bid_projections_match_serializers(bids):
+    queryset = models.Bid.objects.order_by('id')
+    for projection, serializer_class in (
+        (projections.bid_short_display, serializers.BidShortDisplaySerializer),
+        (projections.bid_long_display, serializers.BidLongDisplaySerializer),
+    ):
+        assert render(projection.represent_many(projection.values(queryset))) == render(
+            serializer_class(queryset, many=True).data
+        )
@@ -0,0 +1,29 @@
+import pytest
+
+from auction.core import models
+from auction.core.querycount import QueryRecorder, query_shape
+from tests import factories
+
+pytestmark = pytest.mark.django_db
+
+
+def test_query_shape_collapses_in_parameters():
+    assert query_shape('SELECT 1 WHERE id IN (%s, %s, %s)') == query_shape(
+        'SELECT 1 WHERE id IN (%s)'
+    )
+
+
+def test_repeated_queries_are_reported_as_n_plus_one():
+    factories.PetFactory.create_batch(3)
+    with QueryRecorder() as recorder:
+        for pet in models.Pet.objects.all():
+            str(pet.owner)
+    assert recorder.count == 7
+    assert sorted(recorder.n_plus_one_suspects(threshold=3).values()) == [3, 3]
+
+
+def test_query_count_header(api_client, user_account, settings):
+    settings.MIDDLEWARE = ['auction.core.querycount.QueryCountMiddleware'] + settings.MIDDLEWARE
+    api_client.force_authenticate(user=user_account.user)
+    response = api_client.get('/api/pets/')
+    assert int(response['X-Query-Count']) > 0